@@ -145,6 +145,18 @@ def health():
 # 注册路由
 app.include_router(api_router)
 
+# 服务关闭时释放共享 LLM 客户端的连接池
+try:
+    from tools.shared.llm_client import close_llm_client, get_llm_client
+    app.add_event_handler("shutdown", close_llm_client)
+
+    @app.get("/api/llm/stats")
+    def llm_stats():
+        """LLM 客户端统计（并发名额、相同请求合并比例）"""
+        return get_llm_client().stats()
+except ImportError as e:
+    print(f"⚠️ 无法导入共享 LLM 客户端: {e}")
+
 # 动态注册工具路由
 for tool_name, router in routers.items():
     print(f"注册工具路由: {tool_name}")
@@ -0,0 +1,471 @@
+"""
+智能问数全链路基准
+基于合成工作簿（benchmarks.workbooks）测量：
+- processor: excel_processor.main
+- executor:  code_executor.run_generated_code 执行典型 pandas 查询
+- analyze:   /api/analyze（TestClient）
+- ask:       /api/generate-code + /api/execute-code（LLM 由离线替身返回固定代码）
+
+每个用例在独立子进程中运行（独立的临时目录与上传存储，峰值 RSS 互不影响），记录：
+首次耗时 cold_ms、后续重复耗时中位数 warm_ms、峰值 RSS、一次额外运行的 tracemalloc 峰值分配。
+结果可保存为基准文件，之后的运行与其对比，超出容差即判定为性能回退（退出码 1）
+
+基准是本机的绝对耗时，不提交到仓库（benchmarks/baselines/ 已忽略）：先在改动前的代码上生成本地基准，
+改动后再运行对比。基准记录了机器与 Python/pandas 等版本，环境不一致时跳过对比
+
+用法（在 server 目录下）：
+    python -m benchmarks.askdata_suite --save-baseline      # 改动前：生成本地基准
+    python -m benchmarks.askdata_suite                      # 改动后：与本地基准对比
+    python -m benchmarks.askdata_suite --cases 'processor/*' --repeat 5
+"""
+import argparse
+import asyncio
+import contextlib
+import fnmatch
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from benchmarks.workbooks import SPECS, get_workbook
+
+BASELINE_FILE = Path(__file__).parent / "baselines" / "askdata.json"
+DEFAULT_WORKBOOK_DIR = Path(tempfile.gettempdir()) / "profile-page" / "bench-workbooks"
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# 对比基准时参与判断的指标，以及低于该差值时视为噪声的绝对阈值
+COMPARED_METRICS = {
+    "cold_ms": 20.0,
+    "warm_ms": 10.0,
+    "peak_rss_mb": 16.0,
+    "child_peak_rss_mb": 16.0,
+    "alloc_peak_mb": 8.0,
+}
+DEFAULT_TOLERANCE = 0.25
+
+# 典型查询：列名与 Sheet 名对应 query_20k 工作簿（见 benchmarks.workbooks.column_names）
+QUERY_WORKBOOK = "query_20k"
+QUERY_SCRIPTS = {
+    "group_sum": '''import pandas as pd
+
+def main(code: str) -> dict:
+    df = pd.read_excel({path!r}, sheet_name="Sheet_1", keep_default_na=False, na_filter=False)
+    results = df.groupby("category_3")["float_2"].sum().round(2).to_dict()
+    return {{"results": results, "errorMessage": None}}
+''',
+    "filter_top": '''import pandas as pd
+
+def main(code: str) -> dict:
+    df = pd.read_excel({path!r}, sheet_name="Sheet_1", keep_default_na=False, na_filter=False)
+    top = df[df["bool_5"] == "Yes"].nlargest(10, "int_1")
+    return {{"results": top.to_dict(orient="records"), "errorMessage": None}}
+''',
+    "pivot_month": '''import pandas as pd
+
+def main(code: str) -> dict:
+    df = pd.read_excel({path!r}, sheet_name="Sheet_2", keep_default_na=False, na_filter=False)
+    df["month"] = pd.to_datetime(df["date_4"]).dt.month
+    table = df.pivot_table(index="category_8", columns="month", values="float_7", aggfunc="sum")
+    return {{"results": table.round(2).to_dict(), "errorMessage": None}}
+''',
+    "concat_sheets": '''import pandas as pd
+
+def main(code: str) -> dict:
+    sheets = pd.read_excel({path!r}, sheet_name=None, keep_default_na=False, na_filter=False)
+    df = pd.concat(sheets.values(), ignore_index=True)
+    results = df.groupby("category_8")["int_6"].agg(["count", "mean"]).round(2).to_dict()
+    return {{"results": results, "errorMessage": None}}
+''',
+}
+ASK_SCRIPT = "group_sum"
+
+
+class StubLLMClient:
+    """离线 LLM 替身：与 LLMClient 接口一致，固定返回给定内容，不发起网络请求"""
+
+    def __init__(self, content: str, chunk_size: int = 64):
+        self.content = content
+        self.chunk_size = chunk_size
+        self.calls = 0
+
+    async def chat_completion(self, coalesce: bool = True, **kwargs: Any) -> Any:
+        self.calls += 1
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    async def stream_chat_completion(self, **kwargs: Any) -> AsyncIterator[Any]:
+        self.calls += 1
+        for start in range(0, len(self.content), self.chunk_size):
+            await asyncio.sleep(0)
+            delta = SimpleNamespace(content=self.content[start:start + self.chunk_size])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+    def stats(self) -> Dict[str, Any]:
+        return {"stub": True, "calls": self.calls}
+
+    async def aclose(self) -> None:
+        return None
+
+
+def install_stub_llm(content: str) -> StubLLMClient:
+    """替换共享 LLM 客户端单例"""
+    from tools.shared import llm_client
+
+    stub = StubLLMClient(content)
+    llm_client._llm_client = stub
+    return stub
+
+
+def _check_result(result: Dict[str, Any], label: str) -> None:
+    if result.get("errorMessage"):
+        raise RuntimeError(f"{label} 失败: {result['errorMessage']}")
+
+
+def _check_response(response: Any, label: str) -> Dict[str, Any]:
+    if response.status_code != 200:
+        raise RuntimeError(f"{label} 返回 {response.status_code}: {response.text[:200]}")
+    return response.json()
+
+
+# ---------- 用例：yield 一个 run(i) 函数，i 为本次运行的序号 ----------
+@contextlib.contextmanager
+def processor_case(path: Path, variant: Optional[str]) -> Iterator[Callable[[int], None]]:
+    from tools.askdata.excel_processor import main as process_excel
+
+    params = {"file_path": [{"file_path": str(path), "file_name": path.name, "file_type": "xlsx"}]}
+
+    def run(i: int) -> None:
+        _check_result(process_excel(params), "excel_processor.main")
+
+    yield run
+
+
+@contextlib.contextmanager
+def executor_case(path: Path, variant: Optional[str]) -> Iterator[Callable[[int], None]]:
+    """首次执行需解析工作簿，之后的重复执行命中工作簿缓存，与服务中同一会话的连续提问一致"""
+    from tools.askdata.code_executor import run_generated_code
+
+    code = QUERY_SCRIPTS[variant].format(path=str(path))
+
+    def run(i: int) -> None:
+        _check_result(run_generated_code(code), f"run_generated_code({variant})")
+
+    yield run
+
+
+@contextlib.contextmanager
+def _test_client() -> Iterator[Any]:
+    from fastapi.testclient import TestClient
+
+    from app import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@contextlib.contextmanager
+def analyze_case(path: Path, variant: Optional[str]) -> Iterator[Callable[[int], None]]:
+    """
+    默认每次使用不同的文件名上传，使解析结果缓存不命中（文件内容仍去重，只保存一次）
+    variant 为 "dedup" 时每次上传同名同内容文件，测量重复上传命中缓存的耗时
+    """
+    content = path.read_bytes()
+    with _test_client() as client:
+
+        def run(i: int) -> None:
+            name = path.name if variant == "dedup" else f"{path.stem}_{i}.xlsx"
+            response = client.post("/api/analyze", files={"file": (name, content, XLSX_MIME)})
+            _check_response(response, "/api/analyze")
+
+        yield run
+
+
+@contextlib.contextmanager
+def ask_case(path: Path, variant: Optional[str]) -> Iterator[Callable[[int], None]]:
+    """上传解析不计时；每次运行生成代码（离线替身）并执行，执行结果缓存关闭"""
+    with _test_client() as client:
+        response = client.post(
+            "/api/analyze", files={"file": (path.name, path.read_bytes(), XLSX_MIME)}
+        )
+        analysis = _check_response(response, "/api/analyze")
+        stored_path = analysis["stored_file_path"]
+        install_stub_llm(QUERY_SCRIPTS[variant].format(path=stored_path))
+
+        def run(i: int) -> None:
+            generated = _check_response(
+                client.post(
+                    "/api/generate-code",
+                    json={
+                        "question": "各地区的 float_2 合计是多少",
+                        "file_path": stored_path,
+                        "sheets": analysis.get("sheets"),
+                        "sidecar_paths": analysis.get("sidecar_paths"),
+                    },
+                ),
+                "/api/generate-code",
+            )
+            execution = _check_response(
+                client.post(
+                    "/api/execute-code", json={"code": generated["code"], "use_cache": False}
+                ),
+                "/api/execute-code",
+            )
+            _check_result(execution, "/api/execute-code")
+
+        yield run
+
+
+CASE_KINDS = {
+    "processor": processor_case,
+    "executor": executor_case,
+    "analyze": analyze_case,
+    "ask": ask_case,
+}
+
+
+def list_cases() -> Dict[str, Tuple[str, str, Optional[str]]]:
+    """用例名 -> (类型, 工作簿名, 变体)"""
+    cases: Dict[str, Tuple[str, str, Optional[str]]] = {}
+    for name in SPECS:
+        cases[f"processor/{name}"] = ("processor", name, None)
+    for script in QUERY_SCRIPTS:
+        cases[f"executor/{script}"] = ("executor", QUERY_WORKBOOK, script)
+    for name in SPECS:
+        cases[f"analyze/{name}"] = ("analyze", name, None)
+    cases["analyze/basic_5k-dedup"] = ("analyze", "basic_5k", "dedup")
+    cases[f"ask/{ASK_SCRIPT}"] = ("ask", QUERY_WORKBOOK, ASK_SCRIPT)
+    return cases
+
+
+# ---------- 测量 ----------
+def _maxrss_mb(who: int) -> float:
+    rss = resource.getrusage(who).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def measure_case(case: str, workbook_dir: Path, repeat: int) -> Dict[str, Any]:
+    """在当前进程中运行单个用例并返回指标"""
+    kind, workbook, variant = list_cases()[case]
+    path = get_workbook(workbook, workbook_dir)
+    warnings.filterwarnings("ignore", category=UserWarning)
+
+    with CASE_KINDS[kind](path, variant) as run:
+        start = time.perf_counter()
+        run(0)
+        cold_ms = (time.perf_counter() - start) * 1000
+
+        warm = []
+        for i in range(1, repeat + 1):
+            start = time.perf_counter()
+            run(i)
+            warm.append((time.perf_counter() - start) * 1000)
+        peak_rss_mb = _maxrss_mb(resource.RUSAGE_SELF)
+
+        # 分配统计单独运行一次，避免 tracemalloc 的开销计入耗时
+        tracemalloc.start()
+        try:
+            run(repeat + 1)
+            retained, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "case": case,
+        "cold_ms": round(cold_ms, 1),
+        "warm_ms": round(statistics.median(warm), 1) if warm else None,
+        "peak_rss_mb": peak_rss_mb,
+        # 解析进程、执行进程等已退出子进程中的最大峰值 RSS
+        "child_peak_rss_mb": _maxrss_mb(resource.RUSAGE_CHILDREN),
+        "alloc_peak_mb": round(peak / (1024 * 1024), 1),
+        "alloc_retained_mb": round(retained / (1024 * 1024), 1),
+    }
+
+
+def run_case_subprocess(case: str, workbook_dir: Path, repeat: int) -> Dict[str, Any]:
+    """在独立子进程中运行用例：独立的临时目录（上传存储、缓存）与独立的峰值 RSS"""
+    server_dir = Path(__file__).parent.parent
+    with tempfile.TemporaryDirectory(prefix="askdata-bench-") as tmp:
+        output = Path(tmp) / "result.json"
+        env = dict(os.environ)
+        env.update({
+            "TMPDIR": tmp,
+            # 不在启动时预处理示例工作簿，避免后台任务干扰计时
+            "ASKDATA_PRECOMPUTE_EXAMPLE": "0",
+        })
+        completed = subprocess.run(
+            [
+                sys.executable, "-m", "benchmarks.askdata_suite",
+                "--run-case", case,
+                "--output", str(output),
+                "--workbook-dir", str(workbook_dir),
+                "--repeat", str(repeat),
+            ],
+            cwd=server_dir,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if completed.returncode != 0 or not output.exists():
+            return {"case": case, "error": completed.stderr.strip()[-500:]}
+        return json.loads(output.read_text(encoding="utf-8"))
+
+
+# ---------- 基准对比 ----------
+BENCHMARKED_PACKAGES = ("pandas", "numpy", "openpyxl", "pyarrow")
+
+
+def environment_info() -> Dict[str, Any]:
+    """机器与依赖版本；与基准中记录的不一致时耗时不可比"""
+    from importlib.metadata import PackageNotFoundError, version
+
+    packages = {}
+    for name in BENCHMARKED_PACKAGES:
+        try:
+            packages[name] = version(name)
+        except PackageNotFoundError:
+            packages[name] = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "packages": packages,
+    }
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_baseline(path: Path, results: List[Dict[str, Any]], repeat: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    baseline = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "repeat": repeat,
+        "environment": environment_info(),
+        "results": {r["case"]: r for r in results if "error" not in r},
+    }
+    path.write_text(json.dumps(baseline, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def find_regressions(
+    results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """返回超出容差（且超出噪声阈值）的指标说明"""
+    regressions = []
+    for result in results:
+        previous = baseline["results"].get(result["case"])
+        if previous is None or "error" in result:
+            continue
+        for metric, noise in COMPARED_METRICS.items():
+            old, new = previous.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + tolerance) and new - old > noise:
+                regressions.append(f"{result['case']} {metric}: {old} -> {new}")
+    return regressions
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    print(
+        f"{'用例':<28}{'cold ms':>10}{'warm ms':>10}{'RSS MB':>9}"
+        f"{'子进程 MB':>10}{'分配峰值 MB':>12}"
+    )
+    for r in results:
+        if "error" in r:
+            print(f"{r['case']:<28}  失败: {r['error'].splitlines()[-1] if r['error'] else ''}")
+            continue
+        warm = f"{r['warm_ms']:.1f}" if r["warm_ms"] is not None else "-"
+        print(
+            f"{r['case']:<28}{r['cold_ms']:>10.1f}{warm:>10}{r['peak_rss_mb']:>9.1f}"
+            f"{r['child_peak_rss_mb']:>10.1f}{r['alloc_peak_mb']:>12.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--cases", nargs="*", default=["*"], help="用例名通配符，如 'analyze/*'")
+    parser.add_argument("--repeat", type=int, default=3, help="首次运行之后的重复次数")
+    parser.add_argument("--workbook-dir", type=Path, default=DEFAULT_WORKBOOK_DIR)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基准")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--list", action="store_true", help="列出全部用例")
+    # 子进程内部参数
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    parser.add_argument("--output", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        result = measure_case(args.run_case, args.workbook_dir, args.repeat)
+        args.output.write_text(json.dumps(result), encoding="utf-8")
+        return
+
+    all_cases = list_cases()
+    if args.list:
+        print("\n".join(all_cases))
+        return
+
+    selected = [c for c in all_cases if any(fnmatch.fnmatch(c, p) for p in args.cases)]
+    if not selected:
+        parser.error(f"没有匹配的用例: {args.cases}")
+
+    # 先在父进程中生成工作簿，子进程直接复用
+    args.workbook_dir.mkdir(parents=True, exist_ok=True)
+    for name in sorted({all_cases[c][1] for c in selected}):
+        get_workbook(name, args.workbook_dir)
+
+    results = []
+    for case in selected:
+        print(f"运行 {case} ...", file=sys.stderr)
+        results.append(run_case_subprocess(case, args.workbook_dir, args.repeat))
+    print_table(results)
+
+    failed = [r["case"] for r in results if "error" in r]
+    if args.save_baseline:
+        save_baseline(args.baseline, results, args.repeat)
+        print(f"已保存基准: {args.baseline}")
+        sys.exit(1 if failed else 0)
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"未找到基准文件 {args.baseline}，使用 --save-baseline 生成")
+        sys.exit(1 if failed else 0)
+    environment = environment_info()
+    if baseline.get("environment") != environment:
+        changed = sorted(
+            key
+            for key in set(environment) | set(baseline.get("environment") or {})
+            if environment.get(key) != (baseline.get("environment") or {}).get(key)
+        )
+        print(
+            f"基准文件在不同环境中生成（不一致: {', '.join(changed)}），跳过对比；"
+            "请在本机使用 --save-baseline 重新生成基准"
+        )
+        sys.exit(1 if failed else 0)
+
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"性能回退 {line}")
+    if not regressions:
+        print(f"与基准相比无回退（容差 {args.tolerance:.0%}）")
+    sys.exit(1 if regressions or failed else 0)
+
+
+if __name__ == "__main__":
+    main()
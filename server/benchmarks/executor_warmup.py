@@ -0,0 +1,97 @@
+"""
+生成代码执行延迟基准：冷启动 vs 预热进程池
+- cold: 每次查询新建 spawn 进程（导入 pandas、解析 Excel 后执行）
+- warm: forkserver 进程池已就绪且预加载会话工作簿，仅执行查询本身
+
+用法（在 server 目录下）：
+    python -m benchmarks.executor_warmup --repeat 5
+"""
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+from tools.askdata.execution_pool import ExecutionPool
+from tools.askdata.sidecar import convert_sidecars, plan_sidecars
+
+EXAMPLE_FILE = Path(__file__).parent.parent / "tools" / "askdata" / "resources" / "industrial_production_demo.xlsx"
+SHEET_NAME = "Daily_Production"
+
+QUERY_TEMPLATE = '''import pandas as pd
+
+def main(code: str) -> dict:
+    df = pd.read_excel(
+        {path!r},
+        sheet_name={sheet!r},
+        keep_default_na=False,
+        na_filter=False
+    )
+    results = df.groupby(df.columns[1]).size().to_dict()
+    return {{"results": results, "errorMessage": None}}
+'''
+
+
+def prepare_workbook(directory: str) -> Path:
+    """复制示例工作簿并生成列式副本，模拟一次 /api/analyze 之后的会话"""
+    path = Path(directory) / EXAMPLE_FILE.name
+    shutil.copy(EXAMPLE_FILE, path)
+    plan_sidecars(path, [SHEET_NAME])
+    convert_sidecars(path)
+    return path
+
+
+def time_cold(code: str, repeat: int):
+    """每次新建 spawn 进程执行，返回 (每次耗时列表, 进程启动耗时列表)（毫秒）"""
+    latencies, startups = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pool = ExecutionPool(workers=1, start_method="spawn")
+        pool.start()
+        execution = pool.run(code)
+        latencies.append((time.perf_counter() - start) * 1000)
+        startups.append(pool.stats()["startup_ms"]["last"])
+        pool.shutdown()
+        assert execution["errorMessage"] is None, execution
+    return latencies, startups
+
+
+def time_warm(code: str, path: Path, repeat: int):
+    """预热进程池（forkserver + 预加载工作簿）中执行，返回 (每次耗时列表, 进程启动耗时)（毫秒）"""
+    pool = ExecutionPool(workers=1)
+    pool.start()
+    pool.preload(path)
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        execution = pool.run(code)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert execution["errorMessage"] is None, execution
+    stats = pool.stats()
+    pool.shutdown()
+    return latencies, [stats["startup_ms"]["last"]], stats["start_method"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", category=UserWarning)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = prepare_workbook(directory)
+        code = QUERY_TEMPLATE.format(path=str(path), sheet=SHEET_NAME)
+
+        cold, cold_startup = time_cold(code, args.repeat)
+        warm, warm_startup, method = time_warm(code, path, args.repeat)
+
+    print(f"查询: {SHEET_NAME} 分组计数，重复 {args.repeat} 次（中位数）")
+    print(f"{'cold (spawn)':>20}: 执行 {statistics.median(cold):8.1f} ms，进程启动 {statistics.median(cold_startup):8.1f} ms")
+    print(f"{'warm (' + method + ')':>20}: 执行 {statistics.median(warm):8.1f} ms，进程启动 {statistics.median(warm_startup):8.1f} ms")
+    print(f"加速比: {statistics.median(cold) / statistics.median(warm):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+基准用合成工作簿
+按 行数 × 列数 × Sheet 数 × 列类型组合 生成 .xlsx，可选两级合并表头与周期性空行
+"""
+import datetime
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple
+
+import numpy as np
+from openpyxl import Workbook
+
+# 列类型按顺序循环使用
+DTYPE_MIX = ["int", "float", "category", "date", "bool", "mixed", "sparse"]
+
+CATEGORIES = ["North", "South", "East", "West", "Central"]
+BASE_DATE = datetime.date(2024, 1, 1)
+
+
+class WorkbookSpec(NamedTuple):
+    name: str
+    rows: int
+    cols: int
+    sheets: int = 1
+    dtypes: List[str] = DTYPE_MIX
+    # 两级表头：第一行每 3 列合并为一个分组标题
+    merged_header: bool = False
+    # 每隔多少行插入一个空行，0 表示不插入
+    blank_every: int = 0
+    seed: int = 0
+
+
+def _column_values(kind: str, rows: int, rng: np.random.Generator) -> List[Any]:
+    if kind == "int":
+        return rng.integers(0, 10_000, rows).tolist()
+    if kind == "float":
+        return np.round(rng.random(rows) * 1000, 2).tolist()
+    if kind == "category":
+        return [CATEGORIES[i] for i in rng.integers(0, len(CATEGORIES), rows)]
+    if kind == "date":
+        return [BASE_DATE + datetime.timedelta(days=int(d)) for d in rng.integers(0, 365, rows)]
+    if kind == "bool":
+        return ["Yes" if v else "No" for v in rng.random(rows) < 0.5]
+    if kind == "mixed":
+        return [int(v) if v % 3 else f"N/A-{v}" for v in rng.integers(0, 1000, rows)]
+    if kind == "sparse":
+        return [round(float(v), 2) if v < 0.2 else None for v in rng.random(rows)]
+    raise ValueError(f"不支持的列类型: {kind}")
+
+
+def column_names(spec: WorkbookSpec) -> List[str]:
+    return [f"{spec.dtypes[j % len(spec.dtypes)]}_{j + 1}" for j in range(spec.cols)]
+
+
+def sheet_names(spec: WorkbookSpec) -> List[str]:
+    return [f"Sheet_{i + 1}" for i in range(spec.sheets)]
+
+
+def write_workbook(spec: WorkbookSpec, directory: Path) -> Path:
+    """生成工作簿并返回路径（同名文件已存在时直接复用）"""
+    path = Path(directory) / f"{spec.name}.xlsx"
+    if path.exists():
+        return path
+
+    rng = np.random.default_rng(spec.seed)
+    headers = column_names(spec)
+    wb = Workbook()
+    wb.remove(wb.active)
+    for sheet_name in sheet_names(spec):
+        ws = wb.create_sheet(sheet_name)
+        if spec.merged_header:
+            for start in range(0, spec.cols, 3):
+                end = min(start + 3, spec.cols)
+                ws.cell(row=1, column=start + 1, value=f"分组{start // 3 + 1}")
+                if end - start > 1:
+                    ws.merge_cells(start_row=1, start_column=start + 1, end_row=1, end_column=end)
+            for j, header in enumerate(headers):
+                ws.cell(row=2, column=j + 1, value=header)
+        else:
+            ws.append(headers)
+
+        columns = [
+            _column_values(spec.dtypes[j % len(spec.dtypes)], spec.rows, rng)
+            for j in range(spec.cols)
+        ]
+        for i, row in enumerate(zip(*columns)):
+            if spec.blank_every and i and i % spec.blank_every == 0:
+                ws.append([])
+            ws.append(list(row))
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    wb.save(tmp_path)
+    tmp_path.replace(path)
+    return path
+
+
+SPECS: Dict[str, WorkbookSpec] = {
+    spec.name: spec
+    for spec in [
+        WorkbookSpec("basic_5k", rows=5_000, cols=12),
+        WorkbookSpec("wide_2k", rows=2_000, cols=60),
+        WorkbookSpec("many_sheets", rows=200, cols=8, sheets=30),
+        WorkbookSpec("merged_blank", rows=2_000, cols=12, sheets=3, merged_header=True, blank_every=50),
+        WorkbookSpec("query_20k", rows=20_000, cols=8, sheets=2, dtypes=DTYPE_MIX[:5]),
+    ]
+}
+
+
+def get_workbook(name: str, directory: Path) -> Path:
+    return write_workbook(SPECS[name], directory)
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# 测试从 server 目录导入 tools.*，与服务运行时一致
+SERVER_DIR = Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
@@ -0,0 +1,91 @@
+"""
+解析与列式副本准备：相同文件的并发请求只执行一次，已就绪的副本不再重新登记、转换
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from tools.askdata import analyze_jobs, sidecar
+from tools.askdata.analyze_jobs import AnalyzeJobManager
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / ("0" * 64 + ".xlsx")
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({"a": [1, 2, 3]}).to_excel(writer, sheet_name="S1", index=False)
+        pd.DataFrame({"b": ["x", "y"]}).to_excel(writer, sheet_name="S2", index=False)
+    return path
+
+
+@pytest.fixture
+def manager():
+    manager = AnalyzeJobManager(workers=2)
+    # 解析任务在工作进程内按全局变量复用已打开的文件，线程池替身只能有一个线程
+    manager._executor = ThreadPoolExecutor(max_workers=1)
+    yield manager
+    manager.shutdown()
+
+
+def manifest_of(path):
+    return json.loads((sidecar.sidecar_dir(path) / sidecar.MANIFEST_NAME).read_text(encoding="utf-8"))
+
+
+def test_concurrent_analyze_profiles_once(workbook, manager, monkeypatch):
+    calls = []
+    original = manager.profile
+
+    async def counting_profile(*args):
+        calls.append(args)
+        await asyncio.sleep(0.05)
+        return await original(*args)
+
+    monkeypatch.setattr(manager, "profile", counting_profile)
+
+    async def run():
+        return await asyncio.gather(
+            *(manager.analyze(workbook, "data.xlsx", ".xlsx") for _ in range(5))
+        )
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(response == results[0][0] for response, _ in results)
+    assert all(convert for _, convert in results)
+
+
+def test_ready_manifest_is_not_reset_or_reconverted(workbook, manager, monkeypatch):
+    sidecar.plan_sidecars(workbook, ["S1", "S2"])
+    sidecar.convert_sidecars(workbook)
+    ready = manifest_of(workbook)
+    assert {info["status"] for info in ready["sheets"].values()} == {sidecar.STATUS_READY}
+
+    # 同一内容以另一个文件名上传：重新解析，但副本清单保持已就绪
+    response, convert = asyncio.run(manager.analyze(workbook, "other.xlsx", ".xlsx"))
+    assert manifest_of(workbook) == ready
+    assert convert is False
+
+    monkeypatch.setattr(sidecar.pd, "read_excel", None)
+    assert sidecar.convert_sidecars(workbook) == ready
+
+
+def test_concurrent_prepare_converts_once(workbook, manager, monkeypatch):
+    sidecar.plan_sidecars(workbook, ["S1", "S2"])
+    conversions = []
+
+    def counting_convert(path):
+        conversions.append(path)
+        return sidecar.convert_sidecars(path)
+
+    monkeypatch.setattr(analyze_jobs, "convert_sidecars", counting_convert)
+    monkeypatch.setattr(analyze_jobs, "preload_workbook", lambda path: None)
+
+    async def run():
+        await asyncio.gather(*(manager.prepare_workbook(workbook) for _ in range(5)))
+
+    asyncio.run(run())
+    assert len(conversions) == 1
+    assert not sidecar.needs_conversion(workbook)
+    assert not list(sidecar.sidecar_dir(workbook).glob("*.tmp"))
@@ -0,0 +1,94 @@
+"""
+执行结果缓存：按执行时实际读取的文件失效
+"""
+import asyncio
+import os
+
+import pandas as pd
+import pytest
+
+from tools.askdata.code_executor import ExecutionMemo, run_generated_code
+from tools.askdata import execution_pool
+
+CODE = '''import os
+import pandas as pd
+
+def main(code: str) -> dict:
+    path = os.path.join({directory!r}, "data" + ".xlsx")
+    df = pd.read_excel(path)
+    return {{"results": int(df["value"].sum()), "errorMessage": None}}
+'''
+
+
+@pytest.fixture
+def memo(monkeypatch):
+    memo = ExecutionMemo(max_entries=16, ttl=600)
+    monkeypatch.setattr(execution_pool, "get_execution_memo", lambda: memo)
+    monkeypatch.setenv("ASKDATA_EXECUTOR", "inline")
+    return memo
+
+
+def write_values(path, values):
+    pd.DataFrame({"value": values}).to_excel(path, index=False)
+    # 保证修改时间变化，与真实上传的文件替换一致
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def execute(code):
+    return asyncio.run(execution_pool.execute_generated_code(code))
+
+
+def test_dynamic_path_invalidates_on_change(tmp_path, memo):
+    path = tmp_path / "data.xlsx"
+    write_values(path, [1, 2, 3])
+    code = CODE.format(directory=str(tmp_path))
+
+    assert execute(code)["result"]["results"] == 6
+    assert execute(code)["result"]["results"] == 6
+    assert memo.stats()["hits"] == 1
+
+    write_values(path, [10, 20])
+    assert execute(code)["result"]["results"] == 30
+    assert memo.stats()["hits"] == 1
+
+
+def test_files_read_recorded(tmp_path):
+    path = tmp_path / "data.xlsx"
+    write_values(path, [1])
+    # 第二次执行命中工作簿缓存，不再打开文件，仍需登记
+    for _ in range(2):
+        execution = run_generated_code(CODE.format(directory=str(tmp_path)))
+        assert [entry[0] for entry in execution["files_read"]] == [str(path)]
+
+
+def test_writes_and_no_reads_are_not_cached(tmp_path, memo):
+    target = tmp_path / "out.txt"
+    writer = f'''def main(code: str) -> dict:
+    with open({str(target)!r}, "w") as f:
+        f.write("x")
+    return {{"results": 1, "errorMessage": None}}
+'''
+    plain = '''def main(code: str) -> dict:
+    return {"results": 1, "errorMessage": None}
+'''
+    for code in (writer, writer, plain, plain):
+        assert "files_read" not in execute(code)
+    assert memo.stats()["entries"] == 0
+
+
+def test_content_addressed_upload_digest_comes_from_file_name(tmp_path, monkeypatch):
+    from tools.askdata import workbook_cache
+
+    digest = "ab" * 32
+    path = tmp_path / f"{digest}.xlsx"
+    write_values(path, [1, 2])
+    other = tmp_path / "data.xlsx"
+    write_values(other, [1, 2])
+
+    hashed = []
+    monkeypatch.setattr(workbook_cache, "hash_file", lambda p: hashed.append(p) or "h")
+    cache = workbook_cache.WorkbookCache(budget_bytes=1024 * 1024)
+    assert cache.digest_for(path) == digest
+    assert cache.digest_for(other) == "h"
+    assert hashed == [str(other)]
@@ -0,0 +1,579 @@
+"""
+excel_processor 回归测试：数据区域截断（连续空行）、schema/preview 引擎一致性、通用类型推断、流式读取
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.askdata.excel_processor import (
+    empty_row_mask,
+    extract_data_section,
+    find_empty_run,
+)
+
+
+def legacy_data_end(df_raw: pd.DataFrame, data_start: int, max_empty_rows: int = 3) -> int:
+    """向量化之前的逐行逐单元格实现，作为对照"""
+    data_end = len(df_raw)
+    empty_row_count = 0
+    for i in range(data_start, len(df_raw)):
+        is_empty = True
+        for cell in df_raw.iloc[i]:
+            if not pd.isna(cell):
+                if str(cell).strip():
+                    is_empty = False
+                    break
+        if is_empty:
+            empty_row_count += 1
+            if empty_row_count >= max_empty_rows:
+                data_end = i
+                break
+        else:
+            empty_row_count = 0
+    return data_end
+
+
+def legacy_extract(df_raw: pd.DataFrame, header_row: int) -> pd.DataFrame:
+    if header_row + 1 >= len(df_raw):
+        return pd.DataFrame()
+    data_start = header_row + 1
+    data_end = legacy_data_end(df_raw, data_start)
+    if data_start < data_end:
+        return df_raw.iloc[data_start:data_end].copy().reset_index(drop=True)
+    return pd.DataFrame()
+
+
+def assert_same_section(df_raw: pd.DataFrame, header_row: int = 0) -> None:
+    expected = legacy_extract(df_raw, header_row)
+    actual = extract_data_section(df_raw, header_row)
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+HEADER = ["名称", "数量", "日期"]
+
+
+def sheet(rows):
+    return pd.DataFrame([HEADER] + rows)
+
+
+def test_all_blank_rows_cut_after_third():
+    df_raw = sheet(
+        [
+            ["a", 1, "2024-01-01"],
+            [None, None, None],
+            [np.nan, np.nan, np.nan],
+            [None, np.nan, pd.NaT],
+            ["b", 2, "2024-01-02"],
+        ]
+    )
+    assert extract_data_section(df_raw, 0).shape[0] == 3
+    assert_same_section(df_raw)
+
+
+def test_whitespace_only_cells_are_blank():
+    df_raw = sheet(
+        [
+            ["a", 1, "x"],
+            ["   ", "\t", None],
+            ["　", " \n ", ""],
+            ["", "", ""],
+            ["b", 2, "y"],
+        ]
+    )
+    mask = empty_row_mask(df_raw.iloc[1:])
+    assert mask.tolist() == [False, True, True, True, False]
+    assert_same_section(df_raw)
+
+
+def test_nan_and_empty_string_both_blank():
+    df_raw = sheet(
+        [
+            ["a", 1, "x"],
+            [np.nan, "", None],
+            ["", np.nan, ""],
+            [None, None, ""],
+        ]
+    )
+    assert empty_row_mask(df_raw.iloc[1:]).tolist() == [False, True, True, True]
+    assert_same_section(df_raw)
+
+
+def test_zero_and_false_are_not_blank():
+    df_raw = sheet(
+        [
+            [0, None, None],
+            [None, False, None],
+            [None, None, 0.0],
+        ]
+    )
+    assert not empty_row_mask(df_raw.iloc[1:]).any()
+    assert_same_section(df_raw)
+
+
+def test_blank_run_shorter_than_threshold_is_kept():
+    df_raw = sheet(
+        [
+            ["a", 1, "x"],
+            [None, None, None],
+            ["", " ", None],
+            ["b", 2, "y"],
+        ]
+    )
+    assert extract_data_section(df_raw, 0).shape[0] == 4
+    assert_same_section(df_raw)
+
+
+def test_trailing_blank_run_at_threshold():
+    rows = [["a", 1, "x"], ["b", 2, "y"]] + [[None, "", " "]] * 3
+    df_raw = sheet(rows)
+    assert extract_data_section(df_raw, 0).shape[0] == 4
+    assert_same_section(df_raw)
+
+
+def test_trailing_blank_run_below_threshold():
+    rows = [["a", 1, "x"], ["b", 2, "y"]] + [[None, "", " "]] * 2
+    df_raw = sheet(rows)
+    assert extract_data_section(df_raw, 0).shape[0] == 4
+    assert_same_section(df_raw)
+
+
+def test_header_without_data_rows():
+    assert extract_data_section(sheet([]), 0).empty
+    assert_same_section(sheet([[None, None, None]] * 3))
+
+
+def test_numeric_and_datetime_columns():
+    df_raw = pd.DataFrame(
+        {
+            "a": [1.0, np.nan, np.nan, np.nan, 5.0],
+            "b": pd.to_datetime(["2024-01-01", None, None, None, "2024-01-05"]),
+        }
+    )
+    assert find_empty_run(empty_row_mask(df_raw), 3) == 3
+    assert_same_section(df_raw)
+
+
+@pytest.mark.parametrize(
+    "row_empty, run_length, expected",
+    [
+        ([], 3, None),
+        ([True, True], 3, None),
+        ([True, True, True], 3, 2),
+        ([False, True, True, False, True, True, True], 3, 6),
+        ([True, True, True, True], 3, 2),
+        ([False, False], 0, None),
+    ],
+)
+def test_find_empty_run(row_empty, run_length, expected):
+    assert find_empty_run(np.array(row_empty, dtype=bool), run_length) == expected
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_matches_legacy_loop_on_random_sheets(seed):
+    rng = np.random.default_rng(seed)
+    blanks = [None, np.nan, "", " ", "\t", "　", pd.NaT]
+    values = ["a", "  b ", 0, 1.5, False, "0"]
+    rows = []
+    for _ in range(int(rng.integers(1, 40))):
+        blank_row = rng.random() < 0.5
+        row = []
+        for _ in range(4):
+            pool = blanks if blank_row or rng.random() < 0.6 else values
+            row.append(pool[int(rng.integers(len(pool)))])
+        rows.append(row)
+    df_raw = pd.DataFrame([["h1", "h2", "h3", "h4"]] + rows)
+    assert_same_section(df_raw, 0)
+
+
+# ---------- schema/preview：向量化引擎与逐值实现一致 ----------
+import datetime  # noqa: E402
+import json  # noqa: E402
+
+from tools.askdata.excel_processor import (  # noqa: E402
+    build_schema_and_preview,
+    build_schema_and_preview_vectorized,
+)
+
+
+def engine_outputs(df, original_headers=None, **kwargs):
+    headers = list(df.columns) if original_headers is None else original_headers
+    # NaN != NaN，按 JSON 文本比较
+    return [
+        json.dumps(build(df, headers, **kwargs), sort_keys=True, ensure_ascii=False, default=str)
+        for build in (build_schema_and_preview, build_schema_and_preview_vectorized)
+    ]
+
+
+ENGINE_FRAMES = {
+    "mixed_object": pd.DataFrame(
+        {"a": [1, "1", 1.0, True, "x", None, 2.5, "", " ", 1, "x", 0, False, 0.0]}
+    ),
+    "nan_and_none": pd.DataFrame(
+        {
+            "f": [1.5, np.nan, 2.0, np.nan, 3.25, None, 4.0, np.nan, 1.5, 2.0, 7.0, 8.0],
+            "o": ["a", None, np.nan, "b", None, "a", np.nan, "", "c", None, "d", "e"],
+            "all_null": [None] * 6 + [np.nan] * 6,
+        }
+    ),
+    "booleans": pd.DataFrame(
+        {
+            "b": [True, False] * 6,
+            "bt": ["yes", "no", "是", "否", "True", "false"] * 2,
+            "bo": [True, None, False, np.nan, True, "", False, True, None, False, True, True],
+        }
+    ),
+    "dates": pd.DataFrame(
+        {
+            "dt": pd.date_range("2024-01-01", periods=12, freq="D"),
+            "dt_nat": [pd.Timestamp("2024-03-01"), pd.NaT] * 6,
+            "dt_text": ["2024-01-01", "2024/02/03", "n/a", ""] * 3,
+            "mixed": [datetime.datetime(2024, 1, 2), "x", 3, None] * 3,
+        }
+    ),
+    "numbers": pd.DataFrame(
+        {
+            "i": list(range(12)),
+            "f": [0.1 * i for i in range(12)],
+            "text_num": ["1", "2.5", "x", ""] * 3,
+            "big": [10**15 + i for i in range(12)],
+        }
+    ),
+}
+
+
+@pytest.mark.parametrize("name", sorted(ENGINE_FRAMES))
+@pytest.mark.parametrize("mode", ["full", "sample"])
+def test_vectorized_engine_matches_legacy(name, mode):
+    legacy, vectorized = engine_outputs(ENGINE_FRAMES[name], type_inference=mode, sample_size=4)
+    assert vectorized == legacy
+
+
+def test_vectorized_engine_matches_legacy_with_duplicate_headers():
+    df = pd.DataFrame({"amount": [1, 2, None], "amount_1": ["x", None, "y"], "Column_3": [None] * 3})
+    legacy, vectorized = engine_outputs(df, ["amount", "amount", None])
+    assert vectorized == legacy
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_vectorized_engine_matches_legacy_on_random_frames(seed):
+    rng = np.random.default_rng(seed)
+    pool = [
+        None, np.nan, "", " ", "a", "b c", "1", "2.5", "yes", "否", True, False, 0, 1, 1.0,
+        2.5, 17, pd.Timestamp("2024-01-02"), "2024-05-06",
+    ]
+    rows = int(rng.integers(1, 40))
+    columns = {}
+    for j in range(int(rng.integers(1, 6))):
+        choices = rng.choice(len(pool), size=int(rng.integers(1, 5)), replace=False)
+        columns[f"c{j}"] = [pool[int(choices[k])] for k in rng.integers(len(choices), size=rows)]
+    legacy, vectorized = engine_outputs(pd.DataFrame(columns))
+    assert vectorized == legacy
+
+
+# ---------- 通用类型推断：抽样模式 ----------
+from tools.askdata import excel_processor  # noqa: E402
+from tools.askdata.excel_processor import (  # noqa: E402
+    infer_general_type,
+    infer_general_type_sampled,
+)
+
+
+def text_column(size: int = 10000):
+    return pd.Series([f"name_{i % 97}" for i in range(size)], dtype=object)
+
+
+@pytest.fixture
+def parsed_lengths(monkeypatch):
+    """记录传给 to_numeric / to_datetime 的取值个数"""
+    lengths = []
+    for name in ("to_numeric", "to_datetime"):
+        original = getattr(pd, name)
+
+        def recording(arg, *args, _original=original, **kwargs):
+            lengths.append(len(arg))
+            return _original(arg, *args, **kwargs)
+
+        monkeypatch.setattr(excel_processor.pd, name, recording)
+    return lengths
+
+
+def test_sampled_inference_trusts_clean_string_sample(parsed_lengths):
+    series = text_column()
+    series.iloc[5003] = "123"
+    assert infer_general_type_sampled(series, 2000) == ("string", False)
+    # 字符串列只解析样本，不扫描整列
+    assert parsed_lengths and max(parsed_lengths) <= 2000
+
+
+def test_sampled_inference_trusts_clean_boolean_and_datetime_samples():
+    series = pd.Series(["yes", "no"] * 5000, dtype=object)
+    assert infer_general_type_sampled(series, 2000) == ("boolean", False)
+    series = pd.Series(["2024-01-01", "2024-02-03"] * 5000, dtype=object)
+    assert infer_general_type_sampled(series, 2000) == ("datetime", False)
+
+
+def test_sampled_inference_numeric_sample_is_final():
+    series = text_column()
+    series.iloc[0] = "7"
+    assert infer_general_type_sampled(series, 2000) == ("numeric", False)
+
+
+def test_sampled_inference_escalates_partial_datetime_sample():
+    series = pd.Series(["2024-01-01", "n/a"] * 5000, dtype=object)
+    assert infer_general_type_sampled(series, 2000) == ("datetime", True)
+    series.iloc[5003] = "42"
+    assert infer_general_type(series) == "numeric"
+    assert infer_general_type_sampled(series, 2000) == ("numeric", True)
+
+
+def test_sampled_inference_escalation_count_ignores_string_columns():
+    size = 10000
+    df = pd.DataFrame(
+        {
+            "name": text_column(size),
+            "flag": ["yes", "no"] * (size // 2),
+            "when": ["2024-01-01", "n/a"] * (size // 2),
+            "amount": [str(i) for i in range(size)],
+        }
+    )
+    result = build_schema_and_preview_vectorized(df, list(df.columns), "sample", 2000)
+    types = [column["general_type"] for column in result["schema"]]
+    assert types == ["string", "boolean", "datetime", "numeric"]
+    assert result["summary"]["type_inference"]["escalated_columns"] == 1
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_sampled_inference_matches_full_without_rare_values(seed):
+    rng = np.random.default_rng(seed)
+    size = int(rng.integers(100, 6000))
+    pools = [
+        ["a", "b c", " ", "", None],
+        ["yes", "no", "是", "否", None],
+        ["2024-01-01", "2024-02-03", None],
+        ["1", "2.5", "x", None],
+    ]
+    pool = pools[seed % len(pools)]
+    series = pd.Series([pool[i] for i in rng.integers(len(pool), size=size)], dtype=object)
+    assert infer_general_type_sampled(series, 500)[0] == infer_general_type(series)
+
+
+# ---------- 流式读取与 pandas 读取结果一致 ----------
+import random  # noqa: E402
+
+from openpyxl import Workbook  # noqa: E402
+
+from tools.askdata.excel_processor import main as process_excel  # noqa: E402
+
+
+def write_workbook(path, rows):
+    wb = Workbook()
+    ws = wb.active
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def profile_both(path, **params):
+    outputs = []
+    for reader in ("pandas", "streaming"):
+        result = process_excel(
+            {
+                "file_path": [{"file_path": str(path), "file_name": "t.xlsx"}],
+                "reader": reader,
+                **params,
+            }
+        )
+        outputs.append(json.dumps(result, sort_keys=True, ensure_ascii=False, default=str))
+    return outputs
+
+
+def random_cell(rng):
+    return rng.choice(
+        [
+            None, rng.randint(-5, 100), 1.5, 9.0, 86.0, "a", "b c", " ", "",
+            "1", "2.5", "True", "false", "是", True, False, 0, 1,
+            datetime.datetime(2024, 1, rng.randint(1, 28)),
+        ]
+    )
+
+
+def random_rows(seed):
+    rng = random.Random(seed)
+    width = rng.randint(1, 5)
+    numeric_columns = [rng.random() < 0.3 for _ in range(width)]
+    rows = []
+    for _ in range(rng.randint(1, 25)):
+        if rng.random() < 0.12:
+            rows.append([None] * width)
+            continue
+        rows.append(
+            [
+                rng.choice([rng.randint(0, 99), 1.5, 9.0, 86.0]) if numeric else random_cell(rng)
+                for numeric in numeric_columns
+            ]
+        )
+    return rows
+
+
+def test_streaming_integral_float_header(tmp_path):
+    # 各列均为数值且含浮点列时，pandas 读取的表头行为浮点数
+    path = tmp_path / "t.xlsx"
+    write_workbook(path, [[69, 1.5, 9], [42, 77, 32], [1.5, 25, 46]])
+    pandas_out, streaming_out = profile_both(path)
+    assert '"original_header": "9.0"' in pandas_out
+    assert streaming_out == pandas_out
+
+
+def test_streaming_zero_one_unified_with_header(tmp_path):
+    path = tmp_path / "t.xlsx"
+    write_workbook(path, [[True, 0], ["h", False], [1, "a"], [0, 1]])
+    pandas_out, streaming_out = profile_both(path)
+    assert streaming_out == pandas_out
+
+
+def test_streaming_type_inference_sees_rare_values(tmp_path):
+    path = tmp_path / "t.xlsx"
+    rows = [["name", "when"]] + [[f"n{i % 50}", "2024-01-02"] for i in range(6000)]
+    rows[4500] = ["123", "42"]
+    write_workbook(path, rows)
+    pandas_out, streaming_out = profile_both(path, type_inference="full")
+    assert '"general_type": "string"' not in pandas_out
+    assert streaming_out == pandas_out
+
+
+STREAMING_SHEETS = {
+    "mixed_types": [
+        ["mixed", "num_text", "with_dates", "int_float"],
+        [1, "1", datetime.datetime(2024, 1, 2), 1],
+        ["x", "2.5", "2024-01-03", 2.5],
+        [2.5, "x", "n/a", 3],
+        [True, "", 7, 4.0],
+        [None, " 3 ", "", 5],
+        [datetime.datetime(2024, 5, 6), "1e3", None, 6],
+        ["", "-4", datetime.datetime(2024, 1, 2), 7],
+    ],
+    "bool_like": [
+        ["b", "bool_text", "yes_no", "zero_one", "mixed_bool"],
+        [True, "TRUE", "yes", 0, True],
+        [False, "false", "否", 1, "True"],
+        [True, "True", "是", 1, 0],
+        [None, "FALSE", "no", 0, "no"],
+        [False, "", "", None, 1],
+    ],
+    "bool_header": [
+        [True, False, "h"],
+        [1, 0, False],
+        [0, "a", True],
+        ["x", 1, 0],
+    ],
+    "bool_text_with_bools": [
+        ["flag", "other"],
+        ["True", True],
+        [False, "false"],
+        ["FALSE", False],
+    ],
+}
+
+
+@pytest.mark.parametrize("name", sorted(STREAMING_SHEETS))
+def test_streaming_matches_pandas_on_tricky_sheets(tmp_path, name):
+    path = tmp_path / "t.xlsx"
+    write_workbook(path, STREAMING_SHEETS[name])
+    pandas_out, streaming_out = profile_both(path)
+    assert streaming_out == pandas_out
+
+
+def test_streaming_sample_mode_reports_escalations(tmp_path):
+    path = tmp_path / "t.xlsx"
+    rows = [["name", "when"]] + [
+        [f"n{i % 50}", "2024-01-02" if i % 2 else "n/a"] for i in range(6000)
+    ]
+    rows[4500][1] = "42"
+    write_workbook(path, rows)
+    pandas_out, streaming_out = profile_both(path, type_inference="sample", inference_sample_size=500)
+    assert '"escalated_columns": 1' in pandas_out
+    assert streaming_out == pandas_out
+
+
+def test_streaming_sample_mode_parses_only_samples_of_string_columns(tmp_path, parsed_lengths):
+    path = tmp_path / "t.xlsx"
+    write_workbook(path, [["name"]] + [[f"n{i % 50}"] for i in range(10000)])
+    process_excel(
+        {
+            "file_path": [{"file_path": str(path), "file_name": "t.xlsx"}],
+            "reader": "streaming",
+            "type_inference": "sample",
+            "inference_sample_size": 500,
+        }
+    )
+    assert parsed_lengths and max(parsed_lengths) <= 500
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_streaming_matches_pandas_on_random_workbooks(tmp_path, seed):
+    path = tmp_path / "t.xlsx"
+    write_workbook(path, random_rows(seed))
+    pandas_out, streaming_out = profile_both(path)
+    assert streaming_out == pandas_out
+
+
+# ---------------------------------------------------------------------------
+# 并行解析：复用模块级进程池，文件由工作进程打开并列出 Sheet
+# ---------------------------------------------------------------------------
+
+from concurrent.futures import ThreadPoolExecutor  # noqa: E402
+
+
+@pytest.fixture
+def parallel_files(tmp_path):
+    files = []
+    for index in range(2):
+        path = tmp_path / f"book{index}.xlsx"
+        with pd.ExcelWriter(path) as writer:
+            pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", None]}).to_excel(
+                writer, sheet_name="S1", index=False
+            )
+            pd.DataFrame({"c": [True, False]}).to_excel(writer, sheet_name="S2", index=False)
+        files.append({"file_path": str(path), "file_name": path.name})
+    broken = tmp_path / "broken.xlsx"
+    broken.write_bytes(b"not a workbook")
+    files.append({"file_path": str(broken), "file_name": broken.name})
+    return files
+
+
+@pytest.fixture
+def profile_pool():
+    yield
+    excel_processor.shutdown_profile_pool()
+
+
+def test_parallel_reuses_pool_and_skips_opening_in_parent(parallel_files, profile_pool, monkeypatch):
+    serial = process_excel({"file_path": parallel_files, "max_workers": 1})
+
+    def fail_open(self):
+        raise AssertionError("parent process must not open workbooks in parallel mode")
+
+    monkeypatch.setattr(excel_processor.WorkbookSource, "open", fail_open)
+    first = process_excel({"file_path": parallel_files, "max_workers": 2})
+    pool = excel_processor.get_profile_pool(2)
+    second = process_excel({"file_path": parallel_files, "max_workers": 2})
+
+    assert excel_processor.get_profile_pool(2) is pool
+    assert first == serial and second == serial
+
+
+def test_parallel_uses_given_executor(parallel_files):
+    serial = process_excel({"file_path": parallel_files, "max_workers": 1})
+    calls = []
+
+    class RecordingExecutor(ThreadPoolExecutor):
+        def submit(self, fn, *args, **kwargs):
+            calls.append(fn.__name__)
+            return super().submit(fn, *args, **kwargs)
+
+    with RecordingExecutor(max_workers=1) as executor:
+        result = process_excel({"file_path": parallel_files}, executor)
+
+    assert result == serial
+    assert calls.count("_list_sheets_in_worker") == 3
+    assert calls.count("_profile_sheet_in_worker") == 4
@@ -0,0 +1,57 @@
+import json
+
+from tools.askdata.sheet_context import (
+    LEVEL_TRUNCATED,
+    MAX_TRUNCATED_COLUMNS,
+    build_sheet_context,
+    measure_sheet_context,
+)
+
+
+def wide_sheets(columns=60, sheets=1):
+    def profile(prefix):
+        schema = [
+            {
+                "column_name": f"{prefix}_col_{i}",
+                "general_type": "numeric",
+                "sample_values": [i, i + 1, i + 2],
+            }
+            for i in range(columns)
+        ]
+        schema[-1]["column_name"] = "revenue"
+        preview = [{c["column_name"]: 1 for c in schema} for _ in range(3)]
+        return {"summary": {"total_rows": 3, "total_columns": columns}, "schema": schema, "preview": preview}
+
+    return {"a.xlsx": {"file_path": "/tmp/a.xlsx", "sheets": {f"S{n}": profile(f"s{n}") for n in range(sheets)}}}
+
+
+def test_wide_sheet_keeps_relevant_columns_instead_of_dropping_sheet():
+    sheets = wide_sheets()
+    text, stats = build_sheet_context(sheets, "total revenue", budget_tokens=300)
+    context = json.loads(text)
+
+    assert "omitted_sheets" not in context
+    sheet = context["a.xlsx"]["sheets"]["S0"]
+    names = [c["column_name"] for c in sheet["schema"]]
+    assert len(names) == MAX_TRUNCATED_COLUMNS
+    assert "revenue" in names
+    assert sheet["omitted_columns"] == 60 - MAX_TRUNCATED_COLUMNS
+    assert set(sheet["preview"][0]) == set(names)
+    assert stats["levels"]["a.xlsx/S0"]["level"] == LEVEL_TRUNCATED
+
+
+def test_sheet_dropped_only_when_truncated_form_does_not_fit():
+    text, stats = build_sheet_context(wide_sheets(sheets=3), "revenue", budget_tokens=400)
+    context = json.loads(text)
+    assert len(context["a.xlsx"]["sheets"]) + len(context["omitted_sheets"]) == 3
+    assert context["a.xlsx"]["sheets"]
+
+
+def test_small_budget_upgrades_to_all_columns_when_it_fits():
+    _, stats = build_sheet_context(wide_sheets(columns=5), "revenue", budget_tokens=3000)
+    assert stats["levels"]["a.xlsx/S0"]["level"] == "full"
+
+
+def test_measurement_reports_heuristic_token_estimate():
+    result = measure_sheet_context(wide_sheets(), "revenue", budget_tokens=300)
+    assert "启发式" in result["token_estimate"]
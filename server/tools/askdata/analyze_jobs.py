@@ -0,0 +1,241 @@
+"""
+Excel 解析任务
+解析与列式副本转换在独立进程池中运行，不占用服务进程的事件循环与内存；
+异步模式下 /api/analyze/jobs 立即返回任务 ID，客户端通过状态接口获取解析结果
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+from uuid import uuid4
+
+from tools.askdata.excel_processor import main as process_excel
+from tools.askdata.execution_pool import preload_workbook
+from tools.askdata.file_upload import build_response_with_path
+from tools.askdata.sidecar import convert_sidecars, needs_conversion, plan_sidecars
+from tools.askdata.upload_store import UploadStore, get_upload_store
+
+# 解析进程数、已结束任务的保留时间（秒）
+ANALYZE_WORKERS_ENV = "ASKDATA_ANALYZE_WORKERS"
+ANALYZE_JOB_TTL_ENV = "ASKDATA_ANALYZE_JOB_TTL"
+DEFAULT_ANALYZE_WORKERS = 1
+DEFAULT_ANALYZE_JOB_TTL = 3600.0
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+
+
+class AnalysisError(RuntimeError):
+    """Excel 解析失败（如无可解析的 Sheet）"""
+
+
+def build_profile_params(stored_path: Path, file_name: str, suffix: str) -> Dict[str, Any]:
+    return {
+        "file_path": [
+            {
+                "file_path": str(stored_path),
+                "file_name": file_name,
+                "file_type": suffix.lstrip("."),
+            }
+        ]
+    }
+
+
+def plan_result_sidecars(result: Dict[str, Any], stored_path: Path) -> Dict[str, str]:
+    """登记解析成功的 Sheet 的 Feather 列式副本，返回 {Sheet 名: 副本路径}"""
+    sheet_names = [
+        sheet_name
+        for file_bucket in result["sheets"].values()
+        for sheet_name in file_bucket["sheets"]
+    ]
+    return plan_sidecars(stored_path, sheet_names)
+
+
+class AnalyzeJob:
+    def __init__(self, file_name: str, stored_path: Path):
+        self.job_id = uuid4().hex
+        self.file_name = file_name
+        self.stored_path = stored_path
+        self.status = STATUS_QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        data: Dict[str, Any] = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "file_name": self.file_name,
+            "created_at": self.created_at,
+            "elapsed_ms": round((end - self.created_at) * 1000, 1),
+        }
+        if self.started_at is not None:
+            data["profile_ms"] = round((end - self.started_at) * 1000, 1)
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+
+class AnalyzeJobManager:
+    """解析进程池与任务状态（任务状态仅保存在当前服务进程内）"""
+
+    def __init__(self, workers: Optional[int] = None, ttl: Optional[float] = None):
+        self.workers = workers or int(os.getenv(ANALYZE_WORKERS_ENV, DEFAULT_ANALYZE_WORKERS))
+        self.ttl = ttl or float(os.getenv(ANALYZE_JOB_TTL_ENV, DEFAULT_ANALYZE_JOB_TTL))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: Dict[str, AnalyzeJob] = {}
+        # 持有后台任务引用，避免被垃圾回收
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        # 进行中的解析与副本准备（按内容哈希命名的文件路径），相同文件的并发请求共用同一任务
+        self._inflight: Dict[Tuple[str, ...], "asyncio.Future[Any]"] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # 服务进程含多个线程，使用 spawn 避免 fork 复制锁状态
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    async def _single_flight(
+        self, key: Tuple[str, ...], start: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """key 对应的任务进行中时等待其结果，否则启动新任务（调用方取消不影响共享任务）"""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(start())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def profile(self, stored_path: Path, file_name: str, suffix: str) -> Dict[str, Any]:
+        """
+        在解析进程池中解析 Excel，失败时抛出 AnalysisError
+        当前进程只校验参数与组装结果，打开文件、列出与解析各 Sheet 均由进程池完成
+        """
+        result = await asyncio.to_thread(
+            process_excel, build_profile_params(stored_path, file_name, suffix), self.executor
+        )
+        if "errorMessage" in result:
+            raise AnalysisError(result["errorMessage"])
+        return result
+
+    async def prepare_workbook(self, stored_path: Path, convert: bool = True) -> None:
+        """
+        在解析进程中转换列式副本，副本就绪后预加载到代码执行进程
+        （重复上传时副本已存在，只需预加载）；同一文件正在准备时等待该任务完成
+        """
+        await self._single_flight(
+            ("prepare", str(stored_path)), lambda: self._prepare_workbook(stored_path, convert)
+        )
+
+    async def _prepare_workbook(self, stored_path: Path, convert: bool) -> None:
+        if convert:
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(self.executor, convert_sidecars, stored_path)
+            except Exception as exc:
+                # 解析进程异常退出等情况：副本保持未就绪，读取方回退为读取 Excel
+                print(f"⚠️  [Sidecar] 转换任务失败: {stored_path}: {exc}")
+        await asyncio.to_thread(preload_workbook, stored_path)
+
+    async def analyze(
+        self, stored_path: Path, file_name: str, suffix: str
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        返回 (/api/analyze 响应, 是否需要转换列式副本)
+        相同内容、相同文件名的上传直接返回缓存的解析结果，同时到达的请求共用一次解析
+        """
+        store = get_upload_store(stored_path.parent)
+        cached = store.load_analysis(stored_path, file_name)
+        if cached is None:
+            cached = await self._single_flight(
+                ("analyze", str(stored_path), file_name),
+                lambda: self._analyze(store, stored_path, file_name, suffix),
+            )
+        return cached, needs_conversion(stored_path)
+
+    async def _analyze(
+        self, store: UploadStore, stored_path: Path, file_name: str, suffix: str
+    ) -> Dict[str, Any]:
+        result = await self.profile(stored_path, file_name, suffix)
+        sidecar_paths = plan_result_sidecars(result, stored_path)
+        response = build_response_with_path(result, stored_path, sidecar_paths)
+        store.save_analysis(stored_path, file_name, response)
+        return response
+
+    def submit(self, stored_path: Path, file_name: str, suffix: str) -> AnalyzeJob:
+        """登记解析任务并在后台执行，立即返回任务"""
+        self._prune()
+        job = AnalyzeJob(file_name, stored_path)
+        self._jobs[job.job_id] = job
+        task = asyncio.get_running_loop().create_task(self._run(job, suffix))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: AnalyzeJob, suffix: str) -> None:
+        job.status = STATUS_RUNNING
+        job.started_at = time.time()
+        try:
+            job.result, convert = await self.analyze(job.stored_path, job.file_name, suffix)
+            job.status = STATUS_SUCCEEDED
+        except Exception as exc:
+            job.error = str(exc)
+            job.status = STATUS_FAILED
+            return
+        finally:
+            job.finished_at = time.time()
+        await self.prepare_workbook(job.stored_path, convert)
+
+    def get(self, job_id: str) -> Optional[AnalyzeJob]:
+        return self._jobs.get(job_id)
+
+    def _prune(self) -> None:
+        """清理超过保留时间的已结束任务"""
+        now = time.time()
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# 全局实例
+_analyze_job_manager: Optional[AnalyzeJobManager] = None
+
+
+def get_analyze_job_manager() -> AnalyzeJobManager:
+    """获取解析任务管理器单例"""
+    global _analyze_job_manager
+    if _analyze_job_manager is None:
+        _analyze_job_manager = AnalyzeJobManager()
+    return _analyze_job_manager
+
+
+def shutdown_analyze_jobs() -> None:
+    if _analyze_job_manager is not None:
+        _analyze_job_manager.shutdown()
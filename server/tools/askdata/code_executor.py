@@ -1,10 +1,26 @@
 """
 代码执行通用功能
 """
+import builtins
 import contextlib
+import copy
+import hashlib
 import io
 import json
-from typing import Any, Dict
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.askdata.file_access import record_file_reads
+from tools.askdata.workbook_cache import get_workbook_cache
+
+# 执行结果缓存：最多条目数与有效期（秒）
+EXEC_MEMO_SIZE_ENV = "ASKDATA_EXEC_MEMO_SIZE"
+EXEC_MEMO_TTL_ENV = "ASKDATA_EXEC_MEMO_TTL"
+DEFAULT_EXEC_MEMO_SIZE = 256
+DEFAULT_EXEC_MEMO_TTL = 600.0
 
 
 def sanitize_result(value: Any) -> Any:
@@ -17,6 +33,25 @@ def sanitize_result(value: Any) -> Any:
         return value
 
 
+def build_exec_builtins() -> Dict[str, Any]:
+    """
+    构建生成代码使用的内置函数表
+    其中 import pandas 返回带工作簿缓存的 pandas 代理，使 pd.read_excel 在多次执行间复用解析结果
+    """
+    exec_builtins = dict(vars(builtins))
+    original_import = builtins.__import__
+    pandas_module = get_workbook_cache().pandas_module
+
+    def cached_import(name, globals=None, locals=None, fromlist=(), level=0):
+        module = original_import(name, globals, locals, fromlist, level)
+        if name == "pandas" and level == 0:
+            return pandas_module
+        return module
+
+    exec_builtins["__import__"] = cached_import
+    return exec_builtins
+
+
 def run_generated_code(code: str) -> Dict[str, Any]:
     """
     执行生成的代码
@@ -29,15 +64,16 @@ def run_generated_code(code: str) -> Dict[str, Any]:
         - result: 执行结果
         - stdout: 标准输出
         - errorMessage: 错误信息（如果有）
+        - files_read: 成功时为本次读取的文件 [(路径, mtime_ns, size)]，写过文件时为 None（供执行结果缓存使用）
     """
     exec_globals: Dict[str, Any] = {
-        "__builtins__": __builtins__,
+        "__builtins__": build_exec_builtins(),
         "__name__": "__generated__",
     }
     output_buffer = io.StringIO()
 
     try:
-        with contextlib.redirect_stdout(output_buffer):
+        with record_file_reads() as reads, contextlib.redirect_stdout(output_buffer):
             exec(code, exec_globals)
             main_func = exec_globals.get("main")
             if not callable(main_func):
@@ -47,6 +83,7 @@ def run_generated_code(code: str) -> Dict[str, Any]:
             "result": sanitize_result(raw_result),
             "stdout": output_buffer.getvalue(),
             "errorMessage": None,
+            "files_read": reads.dependencies(),
         }
     except Exception as exc:
         return {
@@ -55,3 +92,123 @@ def run_generated_code(code: str) -> Dict[str, Any]:
             "errorMessage": f"{type(exc).__name__}: {exc}",
         }
 
+
+
+def normalize_code(code: str) -> str:
+    """统一换行符并去除行尾空白与首尾空行，使仅有空白差异的代码命中同一缓存"""
+    lines = [line.rstrip() for line in code.replace("\r\n", "\n").split("\n")]
+    return "\n".join(lines).strip("\n")
+
+
+class ExecutionMemo:
+    """
+    执行结果缓存
+    缓存键为规范化代码，条目记录该次执行实际读取的文件及其内容哈希，任一文件内容变化后条目失效；
+    按 TTL 与条目数 LRU 淘汰。get/put 可能需要计算文件哈希，应在线程中调用
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_entries = max_entries or int(
+            os.getenv(EXEC_MEMO_SIZE_ENV, DEFAULT_EXEC_MEMO_SIZE)
+        )
+        self.ttl = ttl or float(os.getenv(EXEC_MEMO_TTL_ENV, DEFAULT_EXEC_MEMO_TTL))
+        # 缓存键 -> (写入时间, 执行结果, [(文件路径, 内容哈希)])
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any], List[Tuple[str, str]]]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, code: str) -> str:
+        """计算缓存键（规范化代码的哈希，不读取文件）"""
+        return hashlib.sha256(normalize_code(code).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _files_unchanged(files: List[Tuple[str, str]]) -> bool:
+        """文件哈希复用工作簿缓存中按 mtime/size 记录的结果，文件未变化时无需重新读取"""
+        cache = get_workbook_cache()
+        try:
+            return all(cache.digest_for(path) == digest for path, digest in files)
+        except OSError:
+            return False
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and (
+            time.monotonic() - entry[0] > self.ttl or not self._files_unchanged(entry[2])
+        ):
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                    self.evictions += 1
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+
+    def put(
+        self,
+        key: str,
+        execution: Dict[str, Any],
+        files_read: Optional[List[Tuple[str, int, int]]],
+    ) -> None:
+        """
+        只缓存成功且读取过文件的执行结果（超时、取消、异常、写过文件或未读取文件的不缓存）
+        files_read 为执行时记录的 [(路径, mtime_ns, size)]，执行后文件已变化时不缓存
+        """
+        if execution.get("errorMessage") is not None or not files_read:
+            return
+        cache = get_workbook_cache()
+        files = []
+        try:
+            for path, mtime_ns, size in files_read:
+                st = os.stat(path)
+                if (st.st_mtime_ns, st.st_size) != (mtime_ns, size):
+                    return
+                files.append((path, cache.digest_for(path)))
+        except OSError:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), copy.deepcopy(execution), files)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+                "evictions": self.evictions,
+            }
+
+
+# 全局实例
+_execution_memo: Optional[ExecutionMemo] = None
+
+
+def get_execution_memo() -> ExecutionMemo:
+    """获取执行结果缓存单例"""
+    global _execution_memo
+    if _execution_memo is None:
+        _execution_memo = ExecutionMemo()
+    return _execution_memo
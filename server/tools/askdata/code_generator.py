@@ -1,8 +1,8 @@
 import json
-import os
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-from openai import OpenAI
+from tools.askdata.sheet_context import build_sheet_context
+from tools.shared.llm_client import get_llm_client
 
 SYSTEM_PROMPT_TEMPLATE = """=== 一、角色设定 ===
 你是一位精通数据分析与计算的专家，擅长使用 Python Pandas 处理 Excel 数据。
@@ -15,6 +15,7 @@ SYSTEM_PROMPT_TEMPLATE = """=== 一、角色设定 ===
 - "用户问题"：{{#input_21eac.user_input#}}
 - 针对每个数据表的每个Sheet页的 "表格信息-表结构（字段名、数据类型）"、"表格信息-数据预览（前5行示例）":   {{#code_a8be4.sheets#}}
 - "Excel文件路径"：{{#input_ae04e.file_path#}}
+- "各Sheet页列式副本路径（Feather）"：{{sidecar_paths}}
 
 === 四、输出限制 ===
 直接输出代码时，从 import pandas as pd 开始直接输出，严禁从 ```python 开始，或将代码嵌套入代码块中输出
@@ -39,6 +40,7 @@ df_safe = df.replace([np.inf, -np.inf], np.nan).where(pd.notnull(df), None)
 7.应该避免的常见错误：
      "name 'XXX' is not defined"
      "module 'pandas' has no attribute 'isinf'"
+8.如"各Sheet页列式副本路径"中提供了所需Sheet页的路径，使用 pd.read_feather(副本路径) 读取该Sheet页（结果与 pd.read_excel 一致且更快），否则使用 pd.read_excel
 
 === 六、代码模版 ===
 import pandas as pd
@@ -80,17 +82,10 @@ class CodeGenerationError(RuntimeError):
     """Raised when the model response is missing or invalid."""
 
 
-def _ensure_api_key() -> str:
-    api_key = os.getenv("DASHSCOPE_API_KEY")
-    if not api_key:
-        raise EnvironmentError("DASHSCOPE_API_KEY 未配置，无法调用模型接口")
-    return api_key
-
-
-def _format_sheets(sheets: Optional[Dict[str, Any]]) -> str:
-    if not sheets:
-        return "（无解析到的表格信息）"
-    return json.dumps(sheets, ensure_ascii=False, indent=2)
+def _format_sidecar_paths(sidecar_paths: Optional[Dict[str, str]]) -> str:
+    if not sidecar_paths:
+        return "（无）"
+    return json.dumps(sidecar_paths, ensure_ascii=False, indent=2)
 
 
 def build_prompts(
@@ -100,8 +95,11 @@ def build_prompts(
     history: Optional[str] = None,
     custom_system_prompt: Optional[str] = None,
     custom_user_prompt: Optional[str] = None,
+    sidecar_paths: Optional[Dict[str, str]] = None,
 ) -> Dict[str, str]:
-    sheet_text = _format_sheets(sheets)
+    # 按与问题的相关度压缩表格信息，控制提示词 token 数
+    sheet_text, _ = build_sheet_context(sheets, user_question)
+    sidecar_text = _format_sidecar_paths(sidecar_paths)
     
     # 使用自定义提示词或默认提示词
     system_template = custom_system_prompt or SYSTEM_PROMPT_TEMPLATE
@@ -112,6 +110,7 @@ def build_prompts(
         system_template.replace("{{user_question}}", user_question or "")
         .replace("{{sheets}}", sheet_text)
         .replace("{{file_path}}", file_path or "")
+        .replace("{{sidecar_paths}}", sidecar_text)
         .replace("{{#input_21eac.user_input#}}", user_question or "")
         .replace("{{#code_a8be4.sheets#}}", sheet_text)
         .replace("{{#input_ae04e.file_path#}}", file_path or "")
@@ -127,7 +126,32 @@ def build_prompts(
     return {"system": system_prompt, "user": user_prompt}
 
 
-def generate_python_code(
+def _build_messages(prompts: Dict[str, str]) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": prompts["system"]},
+        {"role": "user", "content": prompts["user"]},
+    ]
+
+
+async def _stream_text(model: str, temperature: float, prompts: Dict[str, str]) -> AsyncIterator[str]:
+    """逐块产出模型增量文本；调用方提前结束迭代时关闭上游流"""
+    chunks = get_llm_client().stream_chat_completion(
+        model=model,
+        temperature=temperature,
+        messages=_build_messages(prompts),
+    )
+    try:
+        async for chunk in chunks:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta and delta.content:
+                yield delta.content
+    finally:
+        await chunks.aclose()
+
+
+async def generate_python_code(
     user_question: str,
     sheets: Optional[Dict[str, Any]],
     file_path: str,
@@ -136,6 +160,7 @@ def generate_python_code(
     temperature: float = 0.1,
     custom_system_prompt: Optional[str] = None,
     custom_user_prompt: Optional[str] = None,
+    sidecar_paths: Optional[Dict[str, str]] = None,
 ) -> str:
     prompts = build_prompts(
         user_question,
@@ -144,20 +169,13 @@ def generate_python_code(
         history,
         custom_system_prompt,
         custom_user_prompt,
-    )
-    api_key = _ensure_api_key()
-    client = OpenAI(
-        api_key=api_key,
-        base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
+        sidecar_paths,
     )
 
-    completion = client.chat.completions.create(
+    completion = await get_llm_client().chat_completion(
         model=model,
         temperature=temperature,
-        messages=[
-            {"role": "system", "content": prompts["system"]},
-            {"role": "user", "content": prompts["user"]},
-        ],
+        messages=_build_messages(prompts),
     )
 
     if not completion.choices:
@@ -171,20 +189,37 @@ def generate_python_code(
     return content
 
 
-def summarize_execution(
+async def stream_python_code(
     user_question: str,
-    execution_result: Any,
+    sheets: Optional[Dict[str, Any]],
+    file_path: str,
+    history: Optional[str] = None,
     model: str = "qwen-plus",
-    temperature: float = 0.2,
+    temperature: float = 0.1,
     custom_system_prompt: Optional[str] = None,
     custom_user_prompt: Optional[str] = None,
-) -> str:
-    api_key = _ensure_api_key()
-    client = OpenAI(
-        api_key=api_key,
-        base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
+    sidecar_paths: Optional[Dict[str, str]] = None,
+) -> AsyncIterator[str]:
+    """generate_python_code 的流式版本，逐块产出生成的代码文本"""
+    prompts = build_prompts(
+        user_question,
+        sheets,
+        file_path,
+        history,
+        custom_system_prompt,
+        custom_user_prompt,
+        sidecar_paths,
     )
+    async for delta in _stream_text(model, temperature, prompts):
+        yield delta
+
 
+def build_summary_prompts(
+    user_question: str,
+    execution_result: Any,
+    custom_system_prompt: Optional[str] = None,
+    custom_user_prompt: Optional[str] = None,
+) -> Dict[str, str]:
     # 使用自定义提示词或默认提示词
     system_prompt = custom_system_prompt or "你是一名资深数据分析师，擅长把 Pandas 结果用 Markdown 方式简洁描述。"
     
@@ -200,13 +235,25 @@ def summarize_execution(
 - 执行结果（JSON 格式）：{json.dumps(execution_result, ensure_ascii=False)}
 """
 
-    completion = client.chat.completions.create(
+    return {"system": system_prompt, "user": user_prompt}
+
+
+async def summarize_execution(
+    user_question: str,
+    execution_result: Any,
+    model: str = "qwen-plus",
+    temperature: float = 0.2,
+    custom_system_prompt: Optional[str] = None,
+    custom_user_prompt: Optional[str] = None,
+) -> str:
+    prompts = build_summary_prompts(
+        user_question, execution_result, custom_system_prompt, custom_user_prompt
+    )
+
+    completion = await get_llm_client().chat_completion(
         model=model,
         temperature=temperature,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
+        messages=_build_messages(prompts),
     )
 
     if not completion.choices:
@@ -218,3 +265,18 @@ def summarize_execution(
 
     return content
 
+
+async def stream_summary(
+    user_question: str,
+    execution_result: Any,
+    model: str = "qwen-plus",
+    temperature: float = 0.2,
+    custom_system_prompt: Optional[str] = None,
+    custom_user_prompt: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """summarize_execution 的流式版本，逐块产出 Markdown 总结文本"""
+    prompts = build_summary_prompts(
+        user_question, execution_result, custom_system_prompt, custom_user_prompt
+    )
+    async for delta in _stream_text(model, temperature, prompts):
+        yield delta
@@ -0,0 +1,59 @@
+"""
+内置示例工作簿
+服务启动时预先把示例文件放入上传存储并完成解析与列式副本转换：
+用户下载示例后再上传（内容与文件名相同）直接命中解析结果缓存，也可通过专用接口免上传获取解析结果
+"""
+import asyncio
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from tools.askdata.analyze_jobs import get_analyze_job_manager
+from tools.askdata.file_upload import UPLOAD_DIR
+from tools.askdata.upload_store import get_upload_store
+
+EXAMPLE_FILE_NAME = "industrial_production_demo.xlsx"
+EXAMPLE_FILE_PATH = Path(__file__).parent / "resources" / EXAMPLE_FILE_NAME
+
+# 设为 0 时不在启动时预处理（首次请求示例解析结果时再处理）
+PRECOMPUTE_EXAMPLE_ENV = "ASKDATA_PRECOMPUTE_EXAMPLE"
+
+_example_task: Optional["asyncio.Task[Dict[str, Any]]"] = None
+_prepare_task: Optional["asyncio.Task[None]"] = None
+
+
+async def _analyze_example() -> Dict[str, Any]:
+    global _prepare_task
+    store = get_upload_store(UPLOAD_DIR / "askdata")
+    stored_path = await asyncio.to_thread(store.add_file, EXAMPLE_FILE_PATH, True)
+    manager = get_analyze_job_manager()
+    response, convert = await manager.analyze(stored_path, EXAMPLE_FILE_NAME, stored_path.suffix)
+    # 解析结果就绪即可返回，列式副本转换与预加载继续在后台进行
+    _prepare_task = asyncio.get_running_loop().create_task(
+        manager.prepare_workbook(stored_path, convert)
+    )
+    print(f"✓ 示例工作簿已预处理: {stored_path}")
+    return response
+
+
+def _ensure_task() -> "asyncio.Task[Dict[str, Any]]":
+    global _example_task
+    # 失败的任务（如启动时解析进程异常）在下次请求时重试
+    if _example_task is None or (
+        _example_task.done()
+        and (_example_task.cancelled() or _example_task.exception() is not None)
+    ):
+        _example_task = asyncio.get_running_loop().create_task(_analyze_example())
+    return _example_task
+
+
+async def start_example_precompute() -> None:
+    """服务启动时在后台预处理示例工作簿，不阻塞启动"""
+    if os.getenv(PRECOMPUTE_EXAMPLE_ENV, "1") == "0" or not EXAMPLE_FILE_PATH.exists():
+        return
+    _ensure_task()
+
+
+async def get_example_analysis() -> Dict[str, Any]:
+    """获取示例工作簿的 /api/analyze 结果（预处理进行中时等待其完成）"""
+    return await asyncio.shield(_ensure_task())
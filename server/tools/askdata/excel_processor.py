@@ -1,282 +1,1394 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Tuple
+from typing import Callable, Dict, Iterable, List, Any, Optional, Set, Tuple
+import multiprocessing
+import os
 import re
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
 from datetime import date, datetime
 
 
-def main(params: dict) -> dict:
+# ---------- 工具方法 ----------
+def _infer_file_name(fpath: str, fallback: str) -> str:
+    """推断文件名"""
+    if not fpath:
+        return fallback
+    parts = str(fpath).replace("\\", "/").split("/")
+    return parts[-1] if parts else fallback
+
+
+def to_native(value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return value.isoformat()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def detect_header_row(
+    df_raw: pd.DataFrame, max_check_rows: int = 10
+) -> Tuple[int, List[str]]:
     """
-    读取多个 .xlsx 文件的所有 Sheet，智能处理复杂结构（合并单元格、多级标题等）
-    安全版本：移除所有可能被识别为危险的函数
+    智能检测表头行 - 简化版本，默认第一行为表头
+    返回: (表头行索引, 清洗后的列名列表)
     """
-    try:
-        file_info_list = params.get("file_path")
-        if not file_info_list or not isinstance(file_info_list, list):
-            return {"errorMessage": "参数 'file_path' 为空或不存在。"}
+    # 默认使用第一行作为表头
+    best_row_idx = 0
+
+    # 安全地构建headers列表
+    best_headers = []
+    for j, cell in enumerate(df_raw.iloc[0]):
+        if pd.isna(cell):
+            best_headers.append(f"Column_{j+1}")
+        else:
+            best_headers.append(str(cell))
 
-        # ---------- 工具方法 ----------
-        def _infer_file_name(fpath: str, fallback: str) -> str:
-            """推断文件名"""
-            if not fpath:
-                return fallback
-            parts = str(fpath).replace("\\", "/").split("/")
-            return parts[-1] if parts else fallback
-
-        def to_native(value: Any) -> Any:
-            if value is None:
-                return None
-            if isinstance(value, (pd.Timestamp, pd.Timedelta)):
-                return value.isoformat()
-            if isinstance(value, (datetime, date)):
-                return value.isoformat()
-            if isinstance(value, np.generic):
-                return value.item()
-            return value
-
-        def detect_header_row(
-            df_raw: pd.DataFrame, max_check_rows: int = 10
-        ) -> Tuple[int, List[str]]:
-            """
-            智能检测表头行 - 简化版本，默认第一行为表头
-            返回: (表头行索引, 清洗后的列名列表)
-            """
-            # 默认使用第一行作为表头
-            best_row_idx = 0
-
-            # 安全地构建headers列表
-            best_headers = []
-            for j, cell in enumerate(df_raw.iloc[0]):
-                if pd.isna(cell):
-                    best_headers.append(f"Column_{j+1}")
-                else:
-                    best_headers.append(str(cell))
+    return best_row_idx, best_headers
 
-            return best_row_idx, best_headers
 
-        def clean_headers(headers: List[str]) -> List[str]:
-            """清洗列名"""
-            cleaned = []
-            used_names = set()
+def clean_headers(headers: List[str]) -> List[str]:
+    """清洗列名"""
+    cleaned = []
+    used_names = set()
 
-            for i, header in enumerate(headers):
-                if pd.isna(header) or not header or header == "None":
-                    base_name = f"Column_{i+1}"
+    for i, header in enumerate(headers):
+        if pd.isna(header) or not header or header == "None":
+            base_name = f"Column_{i+1}"
+        else:
+            # 移除特殊字符和多余空格，但保留原始格式
+            header_str = str(header).strip()
+            # 不再移除标点符号，保持原始格式
+            cleaned_str = re.sub(r"\s+", " ", header_str).strip()
+            base_name = cleaned_str if cleaned_str else f"Column_{i+1}"
+
+        # 确保列名唯一
+        final_name = base_name
+        counter = 1
+        while final_name in used_names:
+            final_name = f"{base_name}_{counter}"
+            counter += 1
+
+        cleaned.append(final_name)
+        used_names.add(final_name)
+
+    return cleaned
+
+
+def empty_row_mask(df: pd.DataFrame) -> np.ndarray:
+    """
+    逐行判断是否为空行：单元格为 NaN/None 或 str(cell).strip() 为空视为空白
+    按列推进，只对尚未确认非空的行继续检查；仅对象列需要做字符串去空白判断
+    """
+    row_nonblank = np.zeros(len(df), dtype=bool)
+    for col_idx in range(df.shape[1]):
+        pending = np.flatnonzero(~row_nonblank)
+        if not len(pending):
+            break
+        values = pd.Series(df.iloc[:, col_idx].to_numpy()[pending])
+        filled = values.notna()
+        if values.dtype == object:
+            filled &= values.astype(str).str.strip() != ""
+        row_nonblank[pending] = filled.to_numpy(dtype=bool)
+    return ~row_nonblank
+
+
+def find_empty_run(row_empty: np.ndarray, run_length: int) -> Optional[int]:
+    """
+    返回第一段连续 run_length 个空行中最后一行的位置，不存在时返回 None
+    """
+    if run_length <= 0 or len(row_empty) < run_length:
+        return None
+    counts = np.cumsum(row_empty, dtype=np.int64)
+    window = counts[run_length - 1 :] - np.concatenate(
+        ([0], counts[: len(counts) - run_length])
+    )
+    hits = np.flatnonzero(window == run_length)
+    return int(hits[0]) + run_length - 1 if len(hits) else None
+
+
+def extract_data_section(df_raw: pd.DataFrame, header_row: int) -> pd.DataFrame:
+    """
+    提取数据区域，处理可能的子标题和空行
+    """
+    if header_row + 1 >= len(df_raw):
+        return pd.DataFrame()
+
+    # 从表头下一行开始提取数据
+    data_start = header_row + 1
+
+    # 寻找数据结束位置（连续多行空行）
+    max_empty_rows = 3
+    row_empty = empty_row_mask(df_raw.iloc[data_start:])
+    run_end = find_empty_run(row_empty, max_empty_rows)
+    data_end = len(df_raw) if run_end is None else data_start + run_end
+
+    # 提取数据区域
+    if data_start < data_end:
+        data_df = (
+            df_raw.iloc[data_start:data_end].copy().reset_index(drop=True)
+        )
+        return data_df
+    else:
+        return pd.DataFrame()
+
+
+# 布尔类型可识别的取值（小写）
+BOOLEAN_LITERALS = ["true", "false", "1", "0", "是", "否", "yes", "no"]
+
+# 通用类型推断模式：full 全量扫描；sample 按分层样本推断，仅样本结论不明确时在其余行上复核
+TYPE_INFERENCE_MODES = ("full", "sample")
+DEFAULT_TYPE_INFERENCE = "full"
+DEFAULT_INFERENCE_SAMPLE_SIZE = 2000
+
+
+def infer_general_type(series: pd.Series) -> str:
+    """
+    推断列的通用类型：numeric / datetime / boolean / string
+    """
+    try:
+        # 检查是否为数值类型
+        numeric_check = pd.to_numeric(series, errors="coerce")
+        if not numeric_check.isna().all():
+            return "numeric"
+        else:
+            # 检查是否为日期类型
+            date_check = pd.to_datetime(series, errors="coerce")
+            if not date_check.isna().all():
+                return "datetime"
+            else:
+                # 检查是否为布尔类型
+                bool_values = (
+                    series.dropna()
+                    .astype(str)
+                    .str.lower()
+                    .isin(BOOLEAN_LITERALS)
+                )
+                if bool_values.all() and len(bool_values) > 0:
+                    return "boolean"
                 else:
-                    # 移除特殊字符和多余空格，但保留原始格式
-                    header_str = str(header).strip()
-                    # 不再移除标点符号，保持原始格式
-                    cleaned_str = re.sub(r"\s+", " ", header_str).strip()
-                    base_name = cleaned_str if cleaned_str else f"Column_{i+1}"
-
-                # 确保列名唯一
-                final_name = base_name
-                counter = 1
-                while final_name in used_names:
-                    final_name = f"{base_name}_{counter}"
-                    counter += 1
-
-                cleaned.append(final_name)
-                used_names.add(final_name)
-
-            return cleaned
-
-        def extract_data_section(df_raw: pd.DataFrame, header_row: int) -> pd.DataFrame:
-            """
-            提取数据区域，处理可能的子标题和空行
-            """
-            if header_row + 1 >= len(df_raw):
-                return pd.DataFrame()
-
-            # 从表头下一行开始提取数据
-            data_start = header_row + 1
-
-            # 寻找数据结束位置（连续多行空行）
-            data_end = len(df_raw)
-            empty_row_count = 0
-            max_empty_rows = 3
-
-            for i in range(data_start, len(df_raw)):
-                row = df_raw.iloc[i]
-                # 检查是否为空行
-                is_empty = True
-                for cell in row:
-                    if not pd.isna(cell):
-                        cell_str = str(cell).strip()
-                        if cell_str:
-                            is_empty = False
-                            break
-
-                if is_empty:
-                    empty_row_count += 1
-                    if empty_row_count >= max_empty_rows:
-                        data_end = i
+                    return "string"
+    except Exception:
+        return "string"
+
+
+def stratified_sample(series: pd.Series, sample_size: int, seed: int = 0) -> pd.Series:
+    """
+    分层抽样：头部、尾部各取约 1/3，其余从中间随机抽取，保持原有行序
+    """
+    total = len(series)
+    if total <= sample_size:
+        return series
+
+    edge = sample_size // 3
+    head_positions = np.arange(edge)
+    tail_positions = np.arange(total - edge, total)
+    middle_count = sample_size - 2 * edge
+    rng = np.random.default_rng(seed)
+    middle_positions = rng.choice(
+        np.arange(edge, total - edge), size=middle_count, replace=False
+    )
+    positions = np.sort(
+        np.concatenate([head_positions, middle_positions, tail_positions])
+    )
+    return series.iloc[positions]
+
+
+def sample_is_ambiguous(sample: pd.Series, gen_type: str) -> bool:
+    """
+    样本结论是否不明确：样本推断为日期，但非空值中只有一部分能解析为日期
+    （混有文本的日期列，样本外的行更可能出现数值）
+    数值结论在全量推断中也成立；字符串/布尔样本中没有任何可解析的值，视为明确的否定结论
+    """
+    if gen_type != "datetime":
+        return False
+    values = sample.dropna()
+    try:
+        return bool(pd.to_datetime(values, errors="coerce").isna().any())
+    except Exception:
+        return True
+
+
+def infer_general_type_sampled(
+    series: pd.Series, sample_size: int = DEFAULT_INFERENCE_SAMPLE_SIZE
+) -> Tuple[str, bool]:
+    """
+    基于分层样本推断通用类型，返回 (通用类型, 是否对样本外的行做了复核)
+
+    样本命中数值时与全量推断一致，直接返回；样本结论明确时直接采用，不扫描样本外的行，
+    因此只出现在样本外的罕见值可能被忽略（与 full 模式结果不同）；
+    样本结论不明确（见 sample_is_ambiguous）时在样本外的行上复核是否存在数值
+    """
+    if len(series) <= sample_size:
+        return infer_general_type(series), False
+
+    positions = stratified_sample(pd.Series(np.arange(len(series))), sample_size).to_numpy()
+    sample = series.iloc[positions]
+    gen_type = infer_general_type(sample)
+    if not sample_is_ambiguous(sample, gen_type):
+        return gen_type, False
+
+    rest_mask = np.ones(len(series), dtype=bool)
+    rest_mask[positions] = False
+    try:
+        if pd.to_numeric(series.iloc[np.flatnonzero(rest_mask)], errors="coerce").notna().any():
+            return "numeric", True
+    except Exception:
+        # 与全量推断一致：解析异常时视为字符串
+        return "string", True
+    return gen_type, True
+
+
+def resolve_general_type(
+    series: pd.Series,
+    mode: str = "full",
+    sample_size: int = DEFAULT_INFERENCE_SAMPLE_SIZE,
+) -> Tuple[str, bool]:
+    """按推断模式计算通用类型，返回 (通用类型, 是否对样本外的行做了复核)"""
+    if mode == "sample":
+        return infer_general_type_sampled(series, sample_size)
+    return infer_general_type(series), False
+
+
+def combine_general_types(types: Iterable[str]) -> str:
+    """
+    合并同一列各批取值的通用类型，与对整列调用 infer_general_type 的结论一致：
+    任意一批可解析为数值/日期即确定类型，所有批次均为布尔时才为布尔
+    """
+    types = set(types)
+    for gen_type in ("numeric", "datetime"):
+        if gen_type in types:
+            return gen_type
+    return "boolean" if types == {"boolean"} else "string"
+
+
+def assess_data_quality(null_count: int, total_rows: int) -> str:
+    """根据空值占比评估数据质量"""
+    data_quality = "good"
+    if null_count / total_rows > 0.5:
+        data_quality = "poor"
+    elif null_count / total_rows > 0.2:
+        data_quality = "fair"
+    return data_quality
+
+
+def build_schema_and_preview(
+    df: pd.DataFrame,
+    original_headers: List[str],
+    type_inference: str = "full",
+    sample_size: int = DEFAULT_INFERENCE_SAMPLE_SIZE,
+) -> Dict[str, Any]:
+    """
+    构建数据模式和预览
+    """
+    if df.empty:
+        return {"schema": [], "preview": []}
+
+    # 安全地替换NaN值为None
+    df_cleaned = df.copy()
+    for col in df_cleaned.columns:
+        df_cleaned[col] = df_cleaned[col].apply(
+            lambda x: None if pd.isna(x) else x
+        )
+
+    schema = []
+    total_rows = len(df_cleaned)
+    escalated_columns = 0
+
+    for col_idx, col_name in enumerate(df_cleaned.columns):
+        series = df_cleaned[col_name]
+        original_header = (
+            original_headers[col_idx]
+            if col_idx < len(original_headers)
+            else col_name
+        )
+
+        # 统计信息
+        non_null_count = series.notna().sum()
+        null_count = total_rows - non_null_count
+        dtype_str = str(series.dtype)
+
+        # 推断通用类型（安全方式）
+        gen_type, escalated = resolve_general_type(
+            series, type_inference, sample_size
+        )
+        escalated_columns += int(escalated)
+
+        # 样本值（安全方式）
+        sample_values = []
+        seen_values = set()
+
+        for val in series:
+            native_val = to_native(val)
+            if native_val is not None and str(native_val).strip():
+                val_str = str(native_val)
+                if val_str not in seen_values:
+                    sample_values.append(native_val)
+                    seen_values.add(val_str)
+                    if len(sample_values) >= 5:
                         break
+
+        # 唯一值计数
+        unique_count = len(seen_values)
+
+        # 数据质量评估
+        data_quality = assess_data_quality(null_count, total_rows)
+
+        # 关键修改：column_name 和 original_header 保持一致
+        schema.append(
+            {
+                "column_name": original_header,  # 使用 original_header 而不是 col_name
+                "original_header": original_header,
+                "dtype": dtype_str,
+                "general_type": gen_type,
+                "null_count": int(null_count),
+                "null_ratio": round(null_count / total_rows, 3)
+                if total_rows > 0
+                else 0,
+                "unique_count": int(unique_count),
+                "sample_values": sample_values,
+                "data_quality": data_quality,
+            }
+        )
+
+    # 生成预览数据（安全方式）
+    if total_rows > 0:
+        try:
+            head_indices = list(range(min(5, total_rows)))
+            tail_indices = list(range(max(0, total_rows - 5), total_rows))
+            preview_indices = list(
+                dict.fromkeys(head_indices + tail_indices)
+            )  # 去重保持顺序
+
+            preview_records = []
+            for idx in preview_indices:
+                if idx < total_rows:
+                    record = {}
+                    for col in df_cleaned.columns:
+                        record[col] = to_native(df_cleaned.iloc[idx][col])
+                    preview_records.append(record)
+
+            preview = preview_records
+        except Exception:
+            preview = []
+    else:
+        preview = []
+
+    return {
+        "schema": schema,
+        "preview": preview,
+        "summary": {
+            "total_rows": total_rows,
+            "total_columns": len(df_cleaned.columns),
+            "type_inference": {
+                "mode": type_inference,
+                "sample_size": sample_size,
+                "escalated_columns": escalated_columns,
+            },
+        },
+    }
+
+
+# 样本值提取时逐批扩大的扫描窗口（行数）
+SAMPLE_SCAN_BLOCK = 64
+# 混合类型的对象列中 1 / 1.0 / True 等值相等但字符串不同，不能按值预去重
+MIXED_INFERRED_TYPES = {"mixed", "mixed-integer", "mixed-integer-float"}
+
+
+def _normalize_column(series: pd.Series) -> pd.Series:
+    """
+    列级别的空值归一化，与逐单元格 apply(None if isna) 的结果一致：
+    先推断对象列的真实类型，仍为 object 的列再把 NaN 替换为 None
+    """
+    if not series.notna().any():
+        return pd.Series([None] * len(series), index=series.index, dtype=object)
+    converted = series.infer_objects()
+    if converted.dtype == object:
+        converted = converted.where(converted.notna(), None)
+    return converted
+
+
+def _sample_key(value: Any) -> str:
+    """样本值去重键，None 视为空白"""
+    native_val = to_native(value)
+    return "" if native_val is None else str(native_val)
+
+
+def _extract_sample_values(series: pd.Series, limit: int = 5) -> List[Any]:
+    """
+    按出现顺序提取前 limit 个非空白且去重的样本值
+    先按值整列 drop_duplicates，再以递增窗口生成字符串键，避免对整列逐值遍历
+    """
+    if (
+        series.dtype != object
+        or pd.api.types.infer_dtype(series, skipna=True) not in MIXED_INFERRED_TYPES
+    ):
+        series = series.drop_duplicates()
+
+    sample_values: List[Any] = []
+    seen_values = set()
+    start = 0
+    block = SAMPLE_SCAN_BLOCK
+
+    while start < len(series) and len(sample_values) < limit:
+        window = series.iloc[start : start + block].reset_index(drop=True)
+        keys = window.map(_sample_key)
+        keys = keys[keys.str.strip() != ""].drop_duplicates()
+        for pos, key in zip(keys.index, keys):
+            if key in seen_values:
+                continue
+            sample_values.append(to_native(window.loc[pos]))
+            seen_values.add(key)
+            if len(sample_values) >= limit:
+                break
+        start += block
+        block *= 2
+
+    return sample_values
+
+
+def build_column_schema(
+    original_header: Any,
+    dtype_str: str,
+    gen_type: str,
+    null_count: int,
+    total_rows: int,
+    sample_values: List[Any],
+) -> Dict[str, Any]:
+    """组装单列的 schema 条目（column_name 与 original_header 保持一致）"""
+    return {
+        "column_name": original_header,
+        "original_header": original_header,
+        "dtype": dtype_str,
+        "general_type": gen_type,
+        "null_count": int(null_count),
+        "null_ratio": round(null_count / total_rows, 3) if total_rows > 0 else 0,
+        "unique_count": len(sample_values),
+        "sample_values": sample_values,
+        "data_quality": assess_data_quality(null_count, total_rows),
+    }
+
+
+def preview_positions(total_rows: int, size: int = 5) -> List[int]:
+    """预览行位置：头尾各 size 行，去重保持顺序"""
+    head_positions = list(range(min(size, total_rows)))
+    tail_positions = list(range(max(0, total_rows - size), total_rows))
+    return list(dict.fromkeys(head_positions + tail_positions))
+
+
+def records_to_preview(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """将预览行整体转换为可 JSON 序列化的记录列表"""
+    return [
+        {col: to_native(val) for col, val in record.items()}
+        for record in df.to_dict("records")
+    ]
+
+
+def build_schema_and_preview_vectorized(
+    df: pd.DataFrame,
+    original_headers: List[str],
+    type_inference: str = "full",
+    sample_size: int = DEFAULT_INFERENCE_SAMPLE_SIZE,
+) -> Dict[str, Any]:
+    """
+    构建数据模式和预览（列向量化版本）
+    输出结构与 build_schema_and_preview 完全一致
+    """
+    if df.empty:
+        return {"schema": [], "preview": []}
+
+    df_cleaned = pd.DataFrame(
+        {col: _normalize_column(df[col]) for col in df.columns},
+        index=df.index,
+    )
+
+    total_rows = len(df_cleaned)
+    null_counts = df_cleaned.isna().sum()
+
+    schema = []
+    escalated_columns = 0
+    for col_idx, col_name in enumerate(df_cleaned.columns):
+        series = df_cleaned[col_name]
+        original_header = (
+            original_headers[col_idx]
+            if col_idx < len(original_headers)
+            else col_name
+        )
+
+        null_count = int(null_counts.iloc[col_idx])
+        sample_values = _extract_sample_values(series)
+        gen_type, escalated = resolve_general_type(
+            series, type_inference, sample_size
+        )
+        escalated_columns += int(escalated)
+
+        schema.append(
+            build_column_schema(
+                original_header,
+                str(series.dtype),
+                gen_type,
+                null_count,
+                total_rows,
+                sample_values,
+            )
+        )
+
+    # 头尾各 5 行，一次切片后整体转换
+    try:
+        preview = records_to_preview(
+            df_cleaned.iloc[preview_positions(total_rows)]
+        )
+    except Exception:
+        preview = []
+
+    return {
+        "schema": schema,
+        "preview": preview,
+        "summary": {
+            "total_rows": total_rows,
+            "total_columns": len(df_cleaned.columns),
+            "type_inference": {
+                "mode": type_inference,
+                "sample_size": sample_size,
+                "escalated_columns": escalated_columns,
+            },
+        },
+    }
+
+
+# 可选的 schema/preview 构建引擎
+PROFILE_ENGINES = {
+    "vectorized": build_schema_and_preview_vectorized,
+    "legacy": build_schema_and_preview,
+}
+DEFAULT_PROFILE_ENGINE = "vectorized"
+
+
+# ---------- 单 Sheet 解析 ----------
+# 单个 Sheet 的解析状态
+SHEET_OK = "ok"
+SHEET_EMPTY = "empty"
+SHEET_NO_DATA = "no_data"
+
+
+def profile_sheet(
+    excel: pd.ExcelFile,
+    sheet_name: Any,
+    build_profile: Callable[..., Dict[str, Any]],
+    type_inference: str,
+    sample_size: int,
+) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    使用 pandas 完整读取单个 Sheet 并构建模式和预览
+    返回 (解析状态, schema/preview 结果)
+    """
+    # 读取原始数据（不自动识别表头）
+    df_raw = pd.read_excel(
+        excel,
+        sheet_name=sheet_name,
+        header=None,
+        keep_default_na=False,
+        na_filter=False,
+    )
+
+    if df_raw.empty:
+        return SHEET_EMPTY, None
+
+    # 智能检测表头 - 现在默认第一行为表头
+    header_row_idx, original_headers = detect_header_row(df_raw)
+    cleaned_headers = clean_headers(original_headers)
+
+    # 提取数据区域
+    data_df = extract_data_section(df_raw, header_row_idx)
+
+    if data_df.empty:
+        return SHEET_NO_DATA, None
+
+    # 设置清洗后的列名
+    if len(data_df.columns) == len(cleaned_headers):
+        data_df.columns = cleaned_headers
+
+    # 构建模式和预览
+    sp = build_profile(data_df, original_headers, type_inference, sample_size)
+    return SHEET_OK, sp
+
+
+# ---------- 流式读取（openpyxl read_only） ----------
+# 超过该大小（字节）的文件在 reader="auto" 时使用流式读取
+STREAMING_SIZE_THRESHOLD = 20 * 1024 * 1024
+READER_MODES = ("auto", "pandas", "streaming")
+DEFAULT_READER = "auto"
+
+
+def _convert_stream_cell(cell: Any) -> Any:
+    """单元格取值转换，与 pandas 的 openpyxl 读取器保持一致"""
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+    if cell.value is None:
+        return ""
+    elif cell.data_type == TYPE_ERROR:
+        return np.nan
+    elif cell.data_type == TYPE_NUMERIC:
+        val = int(cell.value)
+        if val == cell.value:
+            return val
+        return float(cell.value)
+    return cell.value
+
+
+def _is_blank_cell(value: Any) -> bool:
+    """与 extract_data_section 相同的空白判定"""
+    return pd.isna(value) or not str(value).strip()
+
+
+def _kind_key(value: Any) -> Any:
+    """用于还原列 dtype 的取值类别，NaN 单独归为一类"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "null"
+    return type(value)
+
+
+# 纯数值文本（pandas 解析时会被转换为数值）
+_INT_TEXT = re.compile(r"^[+-]?\d+$")
+_FLOAT_TEXT = re.compile(r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$")
+# 整列（含表头）可被 pandas 转为数值时的目标类型，按优先级排序
+_RAW_NUMERIC_RANK = {"bool": 0, "int": 1, "float": 2}
+# pandas 解析时整列可识别为布尔的文本
+_TRUE_TEXT = {"True", "TRUE", "true"}
+_FALSE_TEXT = {"False", "FALSE", "false"}
+
+
+def _raw_numeric_kind(value: Any) -> Optional[str]:
+    """单元格在 pandas 整列数值转换中的类别，无法转换时返回 None"""
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str):
+        if value in _TRUE_TEXT or value in _FALSE_TEXT:
+            return "booltext"
+        if _INT_TEXT.match(value):
+            return "int"
+        if _FLOAT_TEXT.match(value):
+            return "float"
+    return None
+
+
+def _convert_raw_numeric(value: Any, raw_kind: Optional[str]) -> Any:
+    """按整列数值转换的目标类型转换单个取值"""
+    if raw_kind == "booltext":
+        return value if isinstance(value, bool) else value in _TRUE_TEXT
+    if raw_kind == "float":
+        return float(value)
+    if raw_kind == "int":
+        return int(value)
+    return value
+
+
+# 流式解析中逐批推断通用类型的取值个数；抽样模式下每批至少为样本行数的若干倍，使抽样能减少解析量
+TYPE_CHECK_BATCH = 4096
+SAMPLE_BATCH_FACTOR = 4
+
+
+class StreamingColumn:
+    """
+    流式累计单列的统计信息，内存占用与行数无关：
+    - 每种取值类别保留一个代表值，用于还原 pandas 推断出的 dtype
+    - 按出现顺序保留少量去重候选值，用于样本值
+    - 非空取值逐批交给 resolve_general_type 推断，再由 combine_general_types 合并
+      （full 模式与整列推断一致；sample 模式在每批内抽样）
+    """
+
+    def __init__(
+        self,
+        numeric_candidate: bool = True,
+        type_inference: str = DEFAULT_TYPE_INFERENCE,
+        sample_size: int = DEFAULT_INFERENCE_SAMPLE_SIZE,
+    ):
+        # 原始列（含表头）全部为数值时 pandas 会整列转换为数值类型
+        self.raw_kind: Optional[str] = "bool" if numeric_candidate else None
+        self.null_count = 0
+        self.kind_examples: Dict[Any, Any] = {}
+        self.int_bounds: Optional[Tuple[int, int]] = None
+        self._zero_one: Dict[Any, Any] = {}
+
+        self.candidates: List[Any] = []
+        self._candidate_keys = set()
+        self._coarse_keys = set()
+
+        self.type_inference = type_inference
+        self.sample_size = sample_size
+        self._batch_size = TYPE_CHECK_BATCH
+        if type_inference == "sample":
+            self._batch_size = max(TYPE_CHECK_BATCH, SAMPLE_BATCH_FACTOR * sample_size)
+        # 各批的通用类型；任意一批为数值即确定类型，之后不再收集
+        self.batch_types: Set[str] = set()
+        self.escalated = False
+        self._type_batch: List[Any] = []
+
+    def add(self, value: Any) -> Any:
+        """累计一个单元格取值，返回与 pandas 读取结果一致的规范值"""
+        value = self._canonical(value)
+        kind = _kind_key(value)
+        if kind == "null":
+            self.null_count += 1
+
+        if kind not in self.kind_examples:
+            self.kind_examples[kind] = value
+        if kind is int:
+            low, high = self.int_bounds or (value, value)
+            self.int_bounds = (min(low, value), max(high, value))
+
+        self._collect_candidate(value, kind)
+        if kind != "null" and "numeric" not in self.batch_types:
+            self._type_batch.append(value)
+            if len(self._type_batch) >= self._batch_size:
+                self._check_types()
+        return value
+
+    def observe_header(self, value: Any) -> None:
+        """表头单元格属于原始表格的同一列，参与 0/1 与 False/True 的统一"""
+        self._canonical(value)
+
+    def _canonical(self, value: Any) -> Any:
+        # pandas 解析对象列时，相等的 0/1 与 False/True 会统一为列中首次出现的值
+        if isinstance(value, (bool, int)) and value in (0, 1):
+            return self._zero_one.setdefault(value, value)
+        return value
+
+    def add_blank(self, count: int) -> None:
+        """补齐此前行中不存在的单元格（pandas 以空字符串填充）"""
+        for _ in range(count):
+            self.add("")
+
+    def observe_raw(self, value: Any) -> None:
+        """记录原始表格（含表头及截断后的行）中的单元格，用于判断整列数值转换"""
+        if self.raw_kind is None:
+            return
+        kind = _raw_numeric_kind(value)
+        if kind is None:
+            self.raw_kind = None
+        elif "booltext" in (kind, self.raw_kind):
+            # 布尔文本只能与布尔值共存，整列转换为 bool
+            both_bool = {kind, self.raw_kind} <= {"bool", "booltext"}
+            self.raw_kind = "booltext" if both_bool else None
+        elif _RAW_NUMERIC_RANK[kind] > _RAW_NUMERIC_RANK[self.raw_kind]:
+            self.raw_kind = kind
+
+    def _collect_candidate(self, value: Any, kind: Any) -> None:
+        # 数值列转为 float64 时 1 与 1.0 会合并，候选值需覆盖到合并后的 5 个不同值
+        if len(self._coarse_keys) >= 5:
+            return
+        key = _sample_key(value)
+        if not key.strip() or (kind, key) in self._candidate_keys:
+            return
+        self._candidate_keys.add((kind, key))
+        self.candidates.append(value)
+        if kind == "null":
+            return
+        raw_kind = _raw_numeric_kind(value)
+        if raw_kind == "booltext":
+            self._coarse_keys.add(str(float(value in _TRUE_TEXT)))
+        elif raw_kind is not None:
+            self._coarse_keys.add(str(float(value)))
+        else:
+            self._coarse_keys.add(key)
+
+    def _check_types(self) -> None:
+        """按推断模式推断累计的一批取值的通用类型"""
+        batch = pd.Series(self._type_batch, dtype=object)
+        self._type_batch = []
+        gen_type, escalated = resolve_general_type(batch, self.type_inference, self.sample_size)
+        self.batch_types.add(gen_type)
+        self.escalated = self.escalated or escalated
+
+    def representatives(self) -> List[Any]:
+        """每种取值类别的代表值（整数额外保留上下界）"""
+        values = list(self.kind_examples.values())
+        if self.int_bounds:
+            values.extend(self.int_bounds)
+        return values
+
+    def coerce(self, values: List[Any]) -> pd.Series:
+        """按整列的 dtype 转换部分取值，结果与完整读取后再切片一致"""
+        reps = self.representatives()
+        series = pd.Series(
+            [_convert_raw_numeric(v, self.raw_kind) for v in list(values) + reps],
+            dtype=object,
+        )
+        return _normalize_column(series).iloc[: len(values)].reset_index(drop=True)
+
+    def dtype_str(self) -> str:
+        return str(self.coerce([]).dtype)
+
+    def general_type(self) -> str:
+        """整列的通用类型（full 模式与 infer_general_type 对完整列的结果一致）"""
+        if self.dtype_str() != "object":
+            # 非对象列中同类取值的解析结果相同，用每类的代表值即可判断
+            return infer_general_type(self.coerce(self.representatives()))
+        if self._type_batch:
+            self._check_types()
+        return combine_general_types(self.batch_types)
+
+
+def _stream_original_headers(
+    header_cells: List[Any], columns: List[StreamingColumn]
+) -> List[str]:
+    """
+    与 detect_header_row 相同：首行为表头，NaN 以 Column_N 代替
+    pandas 取首行（df_raw.iloc[0]）时，各列均为整数/浮点数且含浮点列的表格整行转换为浮点数
+    """
+    raw_kinds = {column.raw_kind for column in columns}
+    row_as_float = raw_kinds <= {"int", "float"} and "float" in raw_kinds
+    headers = []
+    for j, column in enumerate(columns):
+        cell = header_cells[j] if j < len(header_cells) else ""
+        cell = _convert_raw_numeric(cell, "float" if row_as_float else column.raw_kind)
+        headers.append(f"Column_{j+1}" if pd.isna(cell) else str(cell))
+    return headers
+
+
+def profile_sheet_streaming(
+    worksheet: Any, type_inference: str, sample_size: int
+) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    基于 openpyxl read_only 逐行迭代单个 Sheet，一次遍历得到 schema/preview/summary
+    行为与 profile_sheet 一致：首行为表头，连续 3 个空行处截断，末尾空行裁剪；
+    通用类型在遍历中逐批推断（full 模式与全量推断一致；sample 模式在每批内抽样，
+    样本与 pandas 读取时的整列分层样本不同，罕见值的取舍可能不同）
+    返回 (解析状态, schema/preview 结果)
+    """
+    max_empty_rows = 3
+    if getattr(worksheet, "reset_dimensions", None):
+        worksheet.reset_dimensions()
+
+    header_cells: Optional[List[Any]] = None
+    columns: List[StreamingColumn] = []
+    width = 0
+    any_data = False
+    total_rows = 0
+    head_rows: List[List[Any]] = []
+    tail_rows: deque = deque(maxlen=5)
+    # 待定空行：None 表示整行为空字符串（位于末尾时会被 pandas 裁剪）
+    pending: List[Optional[List[Any]]] = []
+    cut_candidate = False
+    cut_off = False
+    # 出现过整行空字符串的行，若其后仍有数据则属于原始表格
+    unconfirmed_empty_row = False
+
+    def widen(new_width: int) -> None:
+        nonlocal width
+        for j in range(width, new_width):
+            column = StreamingColumn(header_cells is None, type_inference, sample_size)
+            column.add_blank(total_rows)
+            columns.append(column)
+        width = max(width, new_width)
+
+    def commit(row: Optional[List[Any]]) -> None:
+        nonlocal total_rows
+        row = [
+            column.add(row[j] if row and j < len(row) else "")
+            for j, column in enumerate(columns)
+        ]
+        if len(head_rows) < 5:
+            head_rows.append(row)
+        tail_rows.append((total_rows, row))
+        total_rows += 1
+
+    for raw_row in worksheet.rows:
+        row = [_convert_stream_cell(cell) for cell in raw_row]
+        while row and row[-1] == "":
+            row.pop()
+        if row:
+            any_data = True
+            if len(row) > width:
+                widen(len(row))
+            for j, column in enumerate(columns):
+                if unconfirmed_empty_row or j >= len(row):
+                    column.raw_kind = None
+                else:
+                    column.observe_raw(row[j])
+            unconfirmed_empty_row = False
+        else:
+            unconfirmed_empty_row = True
+
+        if header_cells is None:
+            header_cells = row
+            for value, column in zip(row, columns):
+                column.observe_header(value)
+            continue
+        if cut_off:
+            continue
+
+        is_blank = all(_is_blank_cell(v) for v in row)
+        if cut_candidate:
+            # 第 3 个空行只有在其后仍有非空字符串行时才不会被 pandas 裁剪
+            if row:
+                cut_off = True
+                for blank in pending[: max_empty_rows - 1]:
+                    commit(blank)
+                pending = []
+            continue
+
+        if is_blank:
+            pending.append(row if row else None)
+            if len(pending) >= max_empty_rows:
+                if row:
+                    cut_off = True
+                    for blank in pending[: max_empty_rows - 1]:
+                        commit(blank)
+                    pending = []
                 else:
-                    empty_row_count = 0
+                    cut_candidate = True
+            continue
+
+        for blank in pending:
+            commit(blank)
+        pending = []
+        commit(row)
+
+    if not any_data:
+        return SHEET_EMPTY, None
+
+    # 末尾的待定空行：保留到最后一个未被裁剪的行为止
+    if pending:
+        keep = 0
+        for pos, blank in enumerate(pending[: max_empty_rows - 1]):
+            if blank is not None:
+                keep = pos + 1
+        for blank in pending[:keep]:
+            commit(blank)
+
+    if total_rows == 0:
+        return SHEET_NO_DATA, None
+
+    original_headers = _stream_original_headers(header_cells or [], columns)
+    cleaned_headers = clean_headers(original_headers)
+
+    schema = []
+    escalated_columns = 0
+    for col_idx, column in enumerate(columns):
+        sample_values = _extract_sample_values(column.coerce(column.candidates))
+        gen_type = column.general_type()
+        escalated_columns += int(column.escalated)
+        schema.append(
+            build_column_schema(
+                original_headers[col_idx],
+                column.dtype_str(),
+                gen_type,
+                column.null_count,
+                total_rows,
+                sample_values,
+            )
+        )
+
+    rows_by_position = {pos: row for pos, row in enumerate(head_rows)}
+    rows_by_position.update(dict(tail_rows))
+    positions = preview_positions(total_rows)
+    preview_df = pd.DataFrame(
+        {
+            cleaned_headers[j]: column.coerce(
+                [
+                    rows_by_position[pos][j]
+                    if j < len(rows_by_position[pos])
+                    else ""
+                    for pos in positions
+                ]
+            )
+            for j, column in enumerate(columns)
+        }
+    )
+    try:
+        preview = records_to_preview(preview_df)
+    except Exception:
+        preview = []
+
+    return SHEET_OK, {
+        "schema": schema,
+        "preview": preview,
+        "summary": {
+            "total_rows": total_rows,
+            "total_columns": width,
+            "type_inference": {
+                "mode": type_inference,
+                "sample_size": sample_size,
+                "escalated_columns": escalated_columns,
+            },
+        },
+    }
+
+
+def choose_reader(reader: str, fpath: str) -> str:
+    """reader="auto" 时按文件大小选择 pandas 或 streaming"""
+    if reader != "auto":
+        return reader
+    try:
+        size = os.path.getsize(fpath)
+    except OSError:
+        return "pandas"
+    return "streaming" if size >= STREAMING_SIZE_THRESHOLD else "pandas"
+
+
+# ---------- 工作簿读取句柄与并行执行 ----------
+# 并行解析的默认进程数（1 表示在当前进程内逐个 Sheet 顺序解析）
+PROFILE_WORKERS_ENV = "EXCEL_PROFILE_WORKERS"
+DEFAULT_PROFILE_WORKERS = 1
+
+
+class WorkbookSource:
+    """
+    单个 .xlsx 文件的读取句柄
+    按读取模式打开 openpyxl 流式工作簿或 pd.ExcelFile，并负责 Sheet 级回退到 pandas
+    """
+
+    def __init__(self, fpath: str, reader_mode: str):
+        self.fpath = fpath
+        self.reader_mode = reader_mode
+        self.workbook = None
+        self.excel: Optional[pd.ExcelFile] = None
+
+    def open(self) -> None:
+        """打开工作簿：流式模式优先使用 openpyxl 只读，失败时回退到 pandas（pandas 打开失败时抛出异常）"""
+        if self.reader_mode == "streaming":
+            try:
+                from openpyxl import load_workbook
 
-            # 提取数据区域
-            if data_start < data_end:
-                data_df = (
-                    df_raw.iloc[data_start:data_end].copy().reset_index(drop=True)
+                self.workbook = load_workbook(
+                    self.fpath, read_only=True, data_only=True, keep_links=False
                 )
-                return data_df
-            else:
-                return pd.DataFrame()
-
-        def build_schema_and_preview(
-            df: pd.DataFrame, original_headers: List[str]
-        ) -> Dict[str, Any]:
-            """
-            构建数据模式和预览
-            """
-            if df.empty:
-                return {"schema": [], "preview": []}
-
-            # 安全地替换NaN值为None
-            df_cleaned = df.copy()
-            for col in df_cleaned.columns:
-                df_cleaned[col] = df_cleaned[col].apply(
-                    lambda x: None if pd.isna(x) else x
+            except Exception:
+                self.workbook = None
+
+        if self.workbook is None:
+            self.excel = pd.ExcelFile(self.fpath)
+
+    def sheet_names(self) -> List[Any]:
+        if self.workbook is not None:
+            return [ws.title for ws in self.workbook.worksheets]
+        return list(self.excel.sheet_names)
+
+    def profile(
+        self,
+        sheet_name: Any,
+        build_profile: Callable[..., Dict[str, Any]],
+        type_inference: str,
+        sample_size: int,
+    ) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """解析单个 Sheet，流式解析失败时回退到 pandas"""
+        status = None
+        if self.workbook is not None:
+            try:
+                status, sp = profile_sheet_streaming(
+                    self.workbook[sheet_name], type_inference, sample_size
                 )
+            except Exception:
+                status = None
+        if status is None:
+            if self.excel is None:
+                self.excel = pd.ExcelFile(self.fpath)
+            status, sp = profile_sheet(
+                self.excel, sheet_name, build_profile, type_inference, sample_size
+            )
+        return status, sp
+
+    def close(self) -> None:
+        if self.workbook is not None:
+            self.workbook.close()
+            self.workbook = None
+        if self.excel is not None:
+            self.excel.close()
+            self.excel = None
+
+
+def run_sheet_task(
+    source: WorkbookSource,
+    sheet_name: Any,
+    engine_name: str,
+    type_inference: str,
+    sample_size: int,
+) -> Tuple[Optional[str], Optional[Dict[str, Any]], Optional[str]]:
+    """
+    解析单个 Sheet 并捕获异常
+    返回 (解析状态, schema/preview 结果, 错误信息)
+    """
+    try:
+        status, sp = source.profile(
+            sheet_name, PROFILE_ENGINES[engine_name], type_inference, sample_size
+        )
+        return status, sp, None
+    except Exception as e:
+        return None, None, str(e).strip()[:100]  # 限制错误信息长度
 
-            schema = []
-            total_rows = len(df_cleaned)
 
-            for col_idx, col_name in enumerate(df_cleaned.columns):
-                series = df_cleaned[col_name]
-                original_header = (
-                    original_headers[col_idx]
-                    if col_idx < len(original_headers)
-                    else col_name
-                )
+# 工作进程内复用最近打开的文件，列出 Sheet 与同一文件的多个 Sheet 无需重复打开
+_worker_source: Optional[WorkbookSource] = None
 
-                # 统计信息
-                non_null_count = series.notna().sum()
-                null_count = total_rows - non_null_count
-                dtype_str = str(series.dtype)
 
-                # 推断通用类型（安全方式）
-                try:
-                    # 检查是否为数值类型
-                    numeric_check = pd.to_numeric(series, errors="coerce")
-                    if not numeric_check.isna().all():
-                        gen_type = "numeric"
-                    else:
-                        # 检查是否为日期类型
-                        date_check = pd.to_datetime(series, errors="coerce")
-                        if not date_check.isna().all():
-                            gen_type = "datetime"
-                        else:
-                            # 检查是否为布尔类型
-                            bool_values = (
-                                series.dropna()
-                                .astype(str)
-                                .str.lower()
-                                .isin(
-                                    [
-                                        "true",
-                                        "false",
-                                        "1",
-                                        "0",
-                                        "是",
-                                        "否",
-                                        "yes",
-                                        "no",
-                                    ]
-                                )
-                            )
-                            if bool_values.all() and len(bool_values) > 0:
-                                gen_type = "boolean"
-                            else:
-                                gen_type = "string"
-                except Exception:
-                    gen_type = "string"
-
-                # 样本值（安全方式）
-                sample_values = []
-                seen_values = set()
-
-                for val in series:
-                    native_val = to_native(val)
-                    if native_val is not None and str(native_val).strip():
-                        val_str = str(native_val)
-                        if val_str not in seen_values:
-                            sample_values.append(native_val)
-                            seen_values.add(val_str)
-                            if len(sample_values) >= 5:
-                                break
-
-                # 唯一值计数
-                unique_count = len(seen_values)
-
-                # 数据质量评估
-                data_quality = "good"
-                if null_count / total_rows > 0.5:
-                    data_quality = "poor"
-                elif null_count / total_rows > 0.2:
-                    data_quality = "fair"
-
-                # 关键修改：column_name 和 original_header 保持一致
-                schema.append(
-                    {
-                        "column_name": original_header,  # 使用 original_header 而不是 col_name
-                        "original_header": original_header,
-                        "dtype": dtype_str,
-                        "general_type": gen_type,
-                        "null_count": int(null_count),
-                        "null_ratio": round(null_count / total_rows, 3)
-                        if total_rows > 0
-                        else 0,
-                        "unique_count": int(unique_count),
-                        "sample_values": sample_values,
-                        "data_quality": data_quality,
-                    }
-                )
+def _open_in_worker(fpath: str, reader_mode: str) -> WorkbookSource:
+    """打开文件（或复用工作进程中已打开的同一文件），打开失败时抛出异常"""
+    global _worker_source
+    source = _worker_source
+    if source is None or source.fpath != fpath or source.reader_mode != reader_mode:
+        if source is not None:
+            source.close()
+            _worker_source = None
+        source = WorkbookSource(fpath, reader_mode)
+        source.open()
+        _worker_source = source
+    return source
+
+
+def _list_sheets_in_worker(fpath: str, reader_mode: str) -> Tuple[Optional[List[Any]], Optional[str]]:
+    """
+    进程池任务：在工作进程中打开文件并列出 Sheet 名（文件保持打开，供随后的 Sheet 任务复用）
+    返回 (Sheet 名列表, 打开失败的原因)；无法读取 Sheet 名时返回空列表
+    """
+    try:
+        source = _open_in_worker(fpath, reader_mode)
+    except Exception as e:
+        return None, str(e).strip()[:100]
+    try:
+        return source.sheet_names(), None
+    except Exception:
+        return [], None
+
+
+def _profile_sheet_in_worker(
+    fpath: str,
+    reader_mode: str,
+    sheet_name: Any,
+    engine_name: str,
+    type_inference: str,
+    sample_size: int,
+) -> Tuple[Optional[str], Optional[Dict[str, Any]], Optional[str]]:
+    """进程池任务：在工作进程中打开文件（或复用已打开的文件）并解析单个 Sheet"""
+    try:
+        source = _open_in_worker(fpath, reader_mode)
+    except Exception as e:
+        return None, None, str(e).strip()[:100]
+    return run_sheet_task(source, sheet_name, engine_name, type_inference, sample_size)
+
+
+# 未传入进程池时并行解析使用的模块级进程池，跨 main() 调用复用，进程数变化时重建
+_profile_pool: Optional[ProcessPoolExecutor] = None
+_profile_pool_workers = 0
+_profile_pool_lock = threading.Lock()
+
+
+def get_profile_pool(workers: int) -> ProcessPoolExecutor:
+    """获取解析进程池（调用方可能含多个线程，使用 spawn 避免 fork 复制锁状态）"""
+    global _profile_pool, _profile_pool_workers
+    with _profile_pool_lock:
+        if _profile_pool is not None and _profile_pool_workers != workers:
+            _profile_pool.shutdown(wait=False, cancel_futures=True)
+            _profile_pool = None
+        if _profile_pool is None:
+            _profile_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _profile_pool_workers = workers
+        return _profile_pool
+
+
+def shutdown_profile_pool() -> None:
+    global _profile_pool
+    with _profile_pool_lock:
+        if _profile_pool is not None:
+            _profile_pool.shutdown(wait=False, cancel_futures=True)
+            _profile_pool = None
 
-            # 生成预览数据（安全方式）
-            if total_rows > 0:
+
+def resolve_workers(value: Any) -> int:
+    """
+    解析并行进程数：未指定时读取环境变量 EXCEL_PROFILE_WORKERS，0 表示使用全部 CPU
+    非法值抛出 ValueError
+    """
+    if value is None or value == "":
+        value = os.getenv(PROFILE_WORKERS_ENV, DEFAULT_PROFILE_WORKERS)
+    workers = int(value)
+    if workers < 0:
+        raise ValueError(workers)
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def run_sheet_tasks_serial(
+    tasks: List[Tuple[str, str, Any]],
+    engine_name: str,
+    type_inference: str,
+    sample_size: int,
+) -> List[Tuple[Optional[str], Optional[Dict[str, Any]], Optional[str]]]:
+    """在当前进程内顺序解析多个 Sheet，连续的同一文件任务复用已打开的工作簿"""
+    results = []
+    source = None
+    try:
+        for fpath, reader_mode, sheet_name in tasks:
+            if source is None or source.fpath != fpath:
+                if source is not None:
+                    source.close()
+                source = WorkbookSource(fpath, reader_mode)
                 try:
-                    head_indices = list(range(min(5, total_rows)))
-                    tail_indices = list(range(max(0, total_rows - 5), total_rows))
-                    preview_indices = list(
-                        dict.fromkeys(head_indices + tail_indices)
-                    )  # 去重保持顺序
-
-                    preview_records = []
-                    for idx in preview_indices:
-                        if idx < total_rows:
-                            record = {}
-                            for col in df_cleaned.columns:
-                                record[col] = to_native(df_cleaned.iloc[idx][col])
-                            preview_records.append(record)
-
-                    preview = preview_records
-                except Exception:
-                    preview = []
-            else:
-                preview = []
-
-            return {
-                "schema": schema,
-                "preview": preview,
-                "summary": {
-                    "total_rows": total_rows,
-                    "total_columns": len(df_cleaned.columns),
-                },
-            }
+                    source.open()
+                except Exception as e:
+                    source = None
+                    results.append((None, None, str(e).strip()[:100]))
+                    continue
+            results.append(
+                run_sheet_task(source, sheet_name, engine_name, type_inference, sample_size)
+            )
+    finally:
+        if source is not None:
+            source.close()
+    return results
+
+
+def list_sheets_parallel(
+    files: List[Tuple[str, str]], pool: Executor
+) -> List[Tuple[Optional[List[Any]], Optional[str]]]:
+    """在进程池中打开文件并列出 Sheet 名，files 为 (文件路径, 读取模式) 列表，结果顺序一一对应"""
+    futures = [pool.submit(_list_sheets_in_worker, fpath, reader_mode) for fpath, reader_mode in files]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append((None, str(e).strip()[:100] or type(e).__name__))
+    return results
+
+
+def run_sheet_tasks_parallel(
+    tasks: List[Tuple[str, str, Any]],
+    pool: Executor,
+    engine_name: str,
+    type_inference: str,
+    sample_size: int,
+) -> List[Tuple[Optional[str], Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    使用进程池并行解析多个 Sheet（可跨文件）
+    tasks 为 (文件路径, 读取模式, Sheet 名) 列表，返回结果与 tasks 顺序一一对应
+    """
+    futures = [
+        pool.submit(
+            _profile_sheet_in_worker,
+            fpath,
+            reader_mode,
+            sheet_name,
+            engine_name,
+            type_inference,
+            sample_size,
+        )
+        for fpath, reader_mode, sheet_name in tasks
+    ]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append((None, None, str(e).strip()[:100] or type(e).__name__))
+    return results
+
+
+def _list_sheets_serial(fpath: str, reader_mode: str) -> Tuple[Optional[List[Any]], Optional[str]]:
+    """在当前进程打开文件并列出 Sheet 名，返回值与 _list_sheets_in_worker 相同"""
+    source = WorkbookSource(fpath, reader_mode)
+    try:
+        source.open()
+    except Exception as e:
+        return None, str(e).strip()[:100]
+    try:
+        return source.sheet_names(), None
+    except Exception:
+        return [], None
+    finally:
+        source.close()
+
+
+def _set_sheet_names(
+    entry: Dict[str, Any],
+    tasks: List[Tuple[str, str, Any]],
+    sheet_names: Optional[List[Any]],
+    error_msg: Optional[str],
+) -> bool:
+    """登记文件的 Sheet 任务；打开失败或没有 Sheet 时记录失败信息并返回 False"""
+    raw_name = entry["raw_name"]
+    if sheet_names is None:
+        entry["fail"] = f"**{raw_name}** 打开失败，原因为{error_msg}"
+        return False
+    if not sheet_names:
+        entry["fail"] = f"**{raw_name}** 文件读取失败，无法解析的.xlsx文件"
+        return False
+    entry["sheet_names"] = sheet_names
+    entry["task_start"] = len(tasks)
+    tasks.extend((entry["fpath"], entry["reader_mode"], name) for name in sheet_names)
+    return True
+
+
+def main(params: dict, executor: Optional[Executor] = None) -> dict:
+    """
+    读取多个 .xlsx 文件的所有 Sheet，智能处理复杂结构（合并单元格、多级标题等）
+    安全版本：移除所有可能被识别为危险的函数
 
-        # --------------------------------
+    可选参数：
+    - profile_engine: schema/preview 构建引擎，"vectorized"（默认）或 "legacy"
+    - type_inference: 通用类型推断模式，"full"（默认，全量）或 "sample"（按分层样本推断，结论不明确时复核其余行）
+    - inference_sample_size: 抽样推断的样本行数，默认 2000
+    - reader: "auto"（默认，按文件大小选择）、"pandas" 或 "streaming"（openpyxl 只读流式）
+    - max_workers: 并行解析的进程数，默认读取环境变量 EXCEL_PROFILE_WORKERS（默认 1，顺序解析），
+      0 表示使用全部 CPU；大于 1 时由模块级进程池（跨调用复用）打开文件、列出并解析各 Sheet，
+      结果顺序与顺序模式一致
+
+    executor: 调用方已有的进程池（如解析任务进程池）；传入时总是在其中打开文件与解析 Sheet，
+    当前进程只负责校验参数与组装结果，max_workers 不再生效
+    """
+    try:
+        file_info_list = params.get("file_path")
+        if not file_info_list or not isinstance(file_info_list, list):
+            return {"errorMessage": "参数 'file_path' 为空或不存在。"}
 
-        result = {}
-        name_counter = {}
-        success_notes = []
-        fail_notes = []
-        any_sheet_success = False
+        engine_name = params.get("profile_engine") or DEFAULT_PROFILE_ENGINE
+        if engine_name not in PROFILE_ENGINES:
+            return {"errorMessage": f"参数 'profile_engine' 不支持: {engine_name}"}
+
+        type_inference = params.get("type_inference") or DEFAULT_TYPE_INFERENCE
+        if type_inference not in TYPE_INFERENCE_MODES:
+            return {"errorMessage": f"参数 'type_inference' 不支持: {type_inference}"}
+        try:
+            sample_size = int(
+                params.get("inference_sample_size") or DEFAULT_INFERENCE_SAMPLE_SIZE
+            )
+        except (TypeError, ValueError):
+            sample_size = 0
+        if sample_size <= 0:
+            return {"errorMessage": "参数 'inference_sample_size' 必须为正整数"}
+
+        reader = params.get("reader") or DEFAULT_READER
+        if reader not in READER_MODES:
+            return {"errorMessage": f"参数 'reader' 不支持: {reader}"}
+
+        try:
+            workers = resolve_workers(params.get("max_workers"))
+        except (TypeError, ValueError):
+            return {"errorMessage": "参数 'max_workers' 必须为非负整数"}
+
+        parallel = executor is not None or workers > 1
+
+        # 第一阶段：按顺序校验文件，列出需要解析的 Sheet（并行模式下由工作进程打开文件并列出）
+        # 每个文件条目记录文件级失败信息或其 Sheet 任务区间，结果最终按条目顺序组装
+        entries = []
+        tasks = []
+        task_results = []
 
         for idx, finfo in enumerate(file_info_list):
             if not isinstance(finfo, dict):
-                fail_notes.append(f"文件条目 {idx+1} 格式不正确")
+                entries.append({"raw_name": None, "fail": f"文件条目 {idx+1} 格式不正确"})
                 continue
 
             fpath = str(finfo.get("file_path", "")).strip()
@@ -288,14 +1400,8 @@ def main(params: dict) -> dict:
                 if given_name
                 else _infer_file_name(fpath, f"file_{idx+1}.xlsx")
             )
-            display_key = raw_name
-
-            # 处理重复文件名
-            if display_key in result:
-                name_counter[display_key] = name_counter.get(display_key, 1) + 1
-                display_key = f"{display_key} ({name_counter[display_key]})"
-            else:
-                name_counter[display_key] = 1
+            entry = {"raw_name": raw_name, "fpath": fpath, "fail": None}
+            entries.append(entry)
 
             # 文件类型检查
             path_lower = fpath.lower()
@@ -305,92 +1411,124 @@ def main(params: dict) -> dict:
             is_xlsx = ext_ok and type_ok
 
             if not is_xlsx:
-                fail_notes.append(f"**{raw_name}** 文件非.xlsx文件，无法解析")
+                entry["fail"] = f"**{raw_name}** 文件非.xlsx文件，无法解析"
                 continue
 
             if not fpath:
-                fail_notes.append(f"**{raw_name}** 打开失败，原因为未提供有效的文件路径")
+                entry["fail"] = f"**{raw_name}** 打开失败，原因为未提供有效的文件路径"
                 continue
 
-            # 打开工作簿
+            # 大文件优先流式读取，失败时回退到 pandas
+            entry["reader_mode"] = choose_reader(reader, fpath)
+            if parallel:
+                continue
+
+            # 顺序模式：在当前进程打开工作簿，列出 Sheet 后直接复用逐 Sheet 解析
+            source = WorkbookSource(fpath, entry["reader_mode"])
             try:
-                excel = pd.ExcelFile(fpath)
+                source.open()
             except Exception as e:
-                error_msg = str(e).strip()[:100]  # 限制错误信息长度
-                fail_notes.append(f"**{raw_name}** 打开失败，原因为{error_msg}")
+                _set_sheet_names(entry, tasks, None, str(e).strip()[:100])  # 限制错误信息长度
                 continue
+            try:
+                try:
+                    sheet_names = source.sheet_names()
+                except Exception:
+                    sheet_names = []
+                if _set_sheet_names(entry, tasks, sheet_names, None):
+                    task_results.extend(
+                        run_sheet_task(source, name, engine_name, type_inference, sample_size)
+                        for name in sheet_names
+                    )
+            finally:
+                source.close()
 
-            # 读取 sheet_names
+        # 第二阶段：并行模式下由进程池打开文件、列出并解析全部 Sheet，结果按任务顺序返回
+        if parallel:
+            opened = [e for e in entries if e["raw_name"] is not None and not e["fail"]]
             try:
-                sheet_names = list(excel.sheet_names)
+                pool = executor if executor is not None else get_profile_pool(workers)
+                listed = list_sheets_parallel(
+                    [(e["fpath"], e["reader_mode"]) for e in opened], pool
+                )
+                for entry, (sheet_names, error_msg) in zip(opened, listed):
+                    _set_sheet_names(entry, tasks, sheet_names, error_msg)
+                task_results = run_sheet_tasks_parallel(
+                    tasks, pool, engine_name, type_inference, sample_size
+                ) if tasks else []
             except Exception:
-                fail_notes.append(f"**{raw_name}** 文件读取失败，无法解析的.xlsx文件")
+                # 进程池不可用时回退为在当前进程内顺序解析
+                if executor is None:
+                    shutdown_profile_pool()
+                tasks = []
+                for entry in opened:
+                    entry["fail"] = None
+                    sheet_names, error_msg = _list_sheets_serial(entry["fpath"], entry["reader_mode"])
+                    _set_sheet_names(entry, tasks, sheet_names, error_msg)
+                task_results = run_sheet_tasks_serial(
+                    tasks, engine_name, type_inference, sample_size
+                )
+
+        # 第三阶段：按文件、Sheet 的原始顺序组装结果与提示信息
+        result = {}
+        name_counter = {}
+        success_notes = []
+        fail_notes = []
+        any_sheet_success = False
+
+        for entry in entries:
+            raw_name = entry["raw_name"]
+            if raw_name is None:
+                fail_notes.append(entry["fail"])
                 continue
 
-            if not sheet_names:
-                fail_notes.append(f"**{raw_name}** 文件读取失败，无法解析的.xlsx文件")
+            display_key = raw_name
+
+            # 处理重复文件名
+            if display_key in result:
+                name_counter[display_key] = name_counter.get(display_key, 1) + 1
+                display_key = f"{display_key} ({name_counter[display_key]})"
+            else:
+                name_counter[display_key] = 1
+
+            if entry["fail"]:
+                fail_notes.append(entry["fail"])
                 continue
 
-            file_bucket = {"file_name": raw_name, "file_path": fpath, "sheets": {}}
+            file_bucket = {"file_name": raw_name, "file_path": entry["fpath"], "sheets": {}}
 
-            # 逐 Sheet 读取
-            for s_idx, sheet_name in enumerate(sheet_names, start=1):
+            start = entry["task_start"]
+            for offset, sheet_name in enumerate(entry["sheet_names"]):
                 sname_str = str(sheet_name)
-                try:
-                    # 读取原始数据（不自动识别表头）
-                    df_raw = pd.read_excel(
-                        excel,
-                        sheet_name=sheet_name,
-                        header=None,
-                        keep_default_na=False,
-                        na_filter=False,
+                status, sp, error_msg = task_results[start + offset]
+
+                if error_msg is not None:
+                    fail_notes.append(
+                        f"**{raw_name}** 文件 **{sname_str}** 页读取失败: {error_msg}"
                     )
+                    continue
 
-                    if df_raw.empty:
-                        fail_notes.append(
-                            f"**{raw_name}** 文件 **{sname_str}** 页为空"
-                        )
-                        continue
-
-                    # 智能检测表头 - 现在默认第一行为表头
-                    header_row_idx, original_headers = detect_header_row(df_raw)
-                    cleaned_headers = clean_headers(original_headers)
-
-                    # 提取数据区域
-                    data_df = extract_data_section(df_raw, header_row_idx)
-
-                    if data_df.empty:
-                        fail_notes.append(
-                            f"**{raw_name}** 文件 **{sname_str}** 页无有效数据"
-                        )
-                        continue
-
-                    # 设置清洗后的列名
-                    if len(data_df.columns) == len(cleaned_headers):
-                        data_df.columns = cleaned_headers
-
-                    # 构建模式和预览
-                    sp = build_schema_and_preview(data_df, original_headers)
-
-                    file_bucket["sheets"][sname_str] = sp
-
-                    # 记录成功状态
-                    if sp.get("preview") and len(sp.get("schema", [])) > 0:
-                        any_sheet_success = True
-                        data_summary = sp.get("summary", {})
-                        success_notes.append(
-                            f"**{raw_name}** 文件 **{sname_str}** 页读取成功 "
-                            f"({data_summary.get('total_rows', 0)}行{data_summary.get('total_columns', 0)}列)"
-                        )
-                    else:
-                        fail_notes.append(
-                            f"**{raw_name}** 文件 **{sname_str}** 页数据结构异常"
-                        )
+                if status == SHEET_EMPTY:
+                    fail_notes.append(f"**{raw_name}** 文件 **{sname_str}** 页为空")
+                    continue
 
-                except Exception as e:
-                    error_msg = str(e).strip()[:100]  # 限制错误信息长度
+                if status == SHEET_NO_DATA:
+                    fail_notes.append(f"**{raw_name}** 文件 **{sname_str}** 页无有效数据")
+                    continue
+
+                file_bucket["sheets"][sname_str] = sp
+
+                # 记录成功状态
+                if sp.get("preview") and len(sp.get("schema", [])) > 0:
+                    any_sheet_success = True
+                    data_summary = sp.get("summary", {})
+                    success_notes.append(
+                        f"**{raw_name}** 文件 **{sname_str}** 页读取成功 "
+                        f"({data_summary.get('total_rows', 0)}行{data_summary.get('total_columns', 0)}列)"
+                    )
+                else:
                     fail_notes.append(
-                        f"**{raw_name}** 文件 **{sname_str}** 页读取失败: {error_msg}"
+                        f"**{raw_name}** 文件 **{sname_str}** 页数据结构异常"
                     )
 
             if file_bucket["sheets"]:
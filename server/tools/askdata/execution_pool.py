@@ -0,0 +1,473 @@
+"""
+生成代码的进程池执行后端
+常驻工作进程执行代码，支持单任务超时、内存上限（RLIMIT_AS）、独立的标准输出捕获与取消。
+工作进程从预先导入 pandas/numpy 的模板进程（forkserver）派生，并预加载会话工作簿
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+from tools.askdata.code_executor import get_execution_memo, run_generated_code
+from tools.askdata.sidecar import preload_sidecars
+
+# 执行后端："process"（默认，进程池）或 "inline"（在当前进程内直接执行）
+EXECUTOR_BACKEND_ENV = "ASKDATA_EXECUTOR"
+EXEC_WORKERS_ENV = "ASKDATA_EXEC_WORKERS"
+EXEC_TIMEOUT_ENV = "ASKDATA_EXEC_TIMEOUT"
+EXEC_MEMORY_ENV = "ASKDATA_EXEC_MEMORY_MB"
+EXEC_START_METHOD_ENV = "ASKDATA_EXEC_START_METHOD"
+
+DEFAULT_EXECUTOR_BACKEND = "process"
+DEFAULT_EXEC_WORKERS = 2
+DEFAULT_EXEC_TIMEOUT = 60.0
+DEFAULT_EXEC_MEMORY_MB = 2048
+
+# 等待结果或空闲进程时检查取消标记的间隔（秒）
+POLL_INTERVAL = 0.1
+# 工作进程启动（导入 pandas 等）的最长等待时间（秒），不计入任务执行超时
+WORKER_START_TIMEOUT = 120.0
+
+# 模板进程预先导入的模块，派生出的工作进程无需再次导入
+WORKER_PRELOAD_MODULES = ["numpy", "pandas", "tools.askdata.code_executor"]
+# 新工作进程启动时预加载最近的会话工作簿数量
+PRELOAD_HISTORY = 4
+
+# 工作进程消息类型
+MSG_READY = "ready"
+MSG_EXEC = "exec"
+MSG_RESULT = "result"
+MSG_PRELOAD = "preload"
+MSG_PRELOADED = "preloaded"
+
+
+def _make_context(method: Optional[str] = None):
+    """
+    优先使用 forkserver：模板进程导入 pandas 等模块后按需 fork 出工作进程，
+    启动耗时仅为 fork；不支持时回退为 spawn
+    """
+    method = method or os.getenv(EXEC_START_METHOD_ENV)
+    if not method:
+        available = multiprocessing.get_all_start_methods()
+        method = "forkserver" if "forkserver" in available else "spawn"
+    ctx = multiprocessing.get_context(method)
+    if method == "forkserver":
+        ctx.set_forkserver_preload(WORKER_PRELOAD_MODULES)
+    return ctx
+
+
+def _preload_files(paths: List[str]) -> int:
+    """将会话工作簿的列式副本加载进工作进程缓存"""
+    loaded = 0
+    for path in paths:
+        try:
+            loaded += preload_sidecars(path)
+        except Exception as exc:
+            print(f"⚠️  [Executor] 预加载失败: {path}: {exc}")
+    return loaded
+
+
+def _worker_main(conn, memory_limit_bytes: int, preload_paths: List[str]) -> None:
+    """
+    工作进程主循环：
+    - (MSG_EXEC, job_id, code) 执行代码并回传 (MSG_RESULT, job_id, 执行结果)
+    - (MSG_PRELOAD, paths) 预加载工作簿并回传 (MSG_PRELOADED, Sheet 数)
+    每个进程独立捕获标准输出，收到 None 时退出
+    """
+    if memory_limit_bytes > 0:
+        try:
+            import resource
+
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+        except (ImportError, ValueError, OSError):
+            # 非 Linux 平台或权限不足时不限制内存
+            pass
+
+    _preload_files(preload_paths)
+    conn.send((MSG_READY, time.time()))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+
+        if message[0] == MSG_PRELOAD:
+            conn.send((MSG_PRELOADED, _preload_files(message[1])))
+            continue
+
+        _, job_id, code = message
+        execution = run_generated_code(code)
+        try:
+            conn.send((MSG_RESULT, job_id, execution))
+        except Exception as exc:
+            # 执行结果无法序列化时只回传错误信息
+            conn.send(
+                (
+                    MSG_RESULT,
+                    job_id,
+                    {
+                        "result": None,
+                        "stdout": execution.get("stdout", ""),
+                        "errorMessage": f"{type(exc).__name__}: {exc}",
+                    },
+                )
+            )
+
+
+def _error_result(message: str) -> Dict[str, Any]:
+    return {"result": None, "stdout": "", "errorMessage": message}
+
+
+class _Worker:
+    """单个常驻工作进程及其通信管道"""
+
+    def __init__(self, ctx, memory_limit_bytes: int, preload_paths: List[str]):
+        self.conn, child_conn = ctx.Pipe()
+        self.spawned_at = time.time()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, memory_limit_bytes, preload_paths),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        # 从创建到完成初始化的耗时（毫秒）
+        self.startup_ms: Optional[float] = None
+        self.startup_recorded = False
+
+    def check_ready(self, timeout: float = 0) -> Optional[bool]:
+        """
+        最多等待 timeout 秒的初始化消息
+        返回 True 已就绪，False 进程异常，None 仍在启动
+        """
+        if self.ready:
+            return True
+        try:
+            if not self.conn.poll(timeout):
+                return None
+            message = self.conn.recv()
+        except (EOFError, OSError):
+            return False
+        if message[0] != MSG_READY:
+            return False
+        self.ready = True
+        self.startup_ms = (message[1] - self.spawned_at) * 1000
+        return True
+
+    def wait_ready(self, should_stop) -> bool:
+        """等待进程完成初始化，返回是否就绪"""
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        while not self.ready:
+            if should_stop() or time.monotonic() >= deadline:
+                return False
+            if self.check_ready(POLL_INTERVAL) is False:
+                return False
+        return True
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=5)
+        self.conn.close()
+
+
+class ExecutionPool:
+    """
+    生成代码执行进程池
+    工作进程在启动时创建并常驻；任务超时、被取消或进程异常退出时终止该进程并补充新进程
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        memory_limit_mb: Optional[int] = None,
+        start_method: Optional[str] = None,
+    ):
+        self.workers = workers or int(os.getenv(EXEC_WORKERS_ENV, DEFAULT_EXEC_WORKERS))
+        self.timeout = timeout or float(os.getenv(EXEC_TIMEOUT_ENV, DEFAULT_EXEC_TIMEOUT))
+        if memory_limit_mb is None:
+            memory_limit_mb = int(os.getenv(EXEC_MEMORY_ENV, DEFAULT_EXEC_MEMORY_MB))
+        self.memory_limit_bytes = max(memory_limit_mb, 0) * 1024 * 1024
+
+        self._ctx = _make_context(start_method)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._cancelled: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+        self._preload_paths: "deque[str]" = deque(maxlen=PRELOAD_HISTORY)
+        self._startup_ms: "deque[float]" = deque(maxlen=100)
+        self._jobs = 0
+
+    def start(self) -> None:
+        """启动全部工作进程并等待其就绪（重复调用无副作用）"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        workers = [self._spawn() for _ in range(self.workers)]
+        for worker in workers:
+            if worker.wait_ready(lambda: self._closed):
+                self._record_startup(worker)
+            self._idle.put(worker)
+        startup = self.stats()["startup_ms"]
+        print(
+            f"✓ 代码执行进程就绪: {len(workers)} 个（{self._ctx.get_start_method()}），"
+            f"启动耗时 {startup['max']} ms"
+        )
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._ctx, self.memory_limit_bytes, list(self._preload_paths))
+
+    def _record_startup(self, worker: _Worker) -> None:
+        """记录进程启动耗时（每个进程只记录一次）"""
+        if worker.startup_ms is not None and not worker.startup_recorded:
+            worker.startup_recorded = True
+            with self._lock:
+                self._startup_ms.append(worker.startup_ms)
+
+    def preload(self, stored_path: Any) -> int:
+        """
+        让当前空闲的工作进程预加载会话工作簿（列式副本），返回完成预加载的进程数
+        不等待执行中或仍在启动的进程，避免占用进程拖慢排队的任务；
+        这些进程在首次读取时再加载，之后新建的工作进程在启动时自动预加载最近的会话工作簿
+        """
+        path = str(stored_path)
+        with self._lock:
+            if path not in self._preload_paths:
+                self._preload_paths.append(path)
+            started = self._started
+        if not started or self._closed:
+            return 0
+
+        sent = []
+        starting = []
+        for _ in range(self.workers):
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            state = worker.check_ready()
+            if state is None:
+                starting.append(worker)
+                continue
+            if not state:
+                self._release(worker, healthy=False)
+                continue
+            self._record_startup(worker)
+            try:
+                worker.conn.send((MSG_PRELOAD, [path]))
+            except (OSError, BrokenPipeError):
+                self._release(worker, healthy=False)
+                continue
+            sent.append(worker)
+        for worker in starting:
+            self._idle.put(worker)
+
+        # 先向全部空闲进程发送再逐个等待，每个进程完成后立即归还
+        done = 0
+        for worker in sent:
+            try:
+                healthy = worker.conn.recv()[0] == MSG_PRELOADED
+            except (EOFError, OSError):
+                healthy = False
+            done += int(healthy)
+            self._release(worker, healthy)
+        return done
+
+    def _release(self, worker: _Worker, healthy: bool) -> None:
+        """归还工作进程；异常进程终止后补充新进程"""
+        if healthy and worker.is_alive() and not self._closed:
+            self._idle.put(worker)
+            return
+        worker.kill()
+        if not self._closed:
+            self._idle.put(self._spawn())
+
+    def cancel(self, job_id: str) -> bool:
+        """取消排队中或执行中的任务，返回任务是否存在"""
+        with self._lock:
+            event = self._cancelled.get(job_id)
+        if event is None:
+            return False
+        event.set()
+        return True
+
+    def run(
+        self, code: str, job_id: Optional[str] = None, timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """阻塞执行代码，返回 {"result", "stdout", "errorMessage"}"""
+        self.start()
+        job_id = job_id or uuid4().hex
+        timeout = timeout or self.timeout
+        cancelled = threading.Event()
+        with self._lock:
+            self._cancelled[job_id] = cancelled
+
+        try:
+            # 等待空闲进程（排队时间不计入执行超时）
+            worker = None
+            while worker is None:
+                if cancelled.is_set():
+                    return _error_result("代码执行已取消")
+                try:
+                    worker = self._idle.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+
+            # 新进程需先完成初始化（启动耗时不计入执行超时）
+            if not worker.wait_ready(cancelled.is_set):
+                if cancelled.is_set():
+                    # 进程仍在正常启动，归还给后续任务
+                    self._release(worker, healthy=True)
+                    return _error_result("代码执行已取消")
+                self._release(worker, healthy=False)
+                return _error_result("执行进程启动失败，请重试")
+            self._record_startup(worker)
+
+            try:
+                worker.conn.send((MSG_EXEC, job_id, code))
+            except (OSError, BrokenPipeError):
+                self._release(worker, healthy=False)
+                return _error_result("执行进程不可用，请重试")
+
+            deadline = time.monotonic() + timeout
+            while True:
+                if cancelled.is_set():
+                    self._release(worker, healthy=False)
+                    return _error_result("代码执行已取消")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._release(worker, healthy=False)
+                    return _error_result(f"TimeoutError: 代码执行超时（超过 {timeout:g} 秒）")
+                try:
+                    if not worker.conn.poll(min(POLL_INTERVAL, remaining)):
+                        continue
+                    _, _, execution = worker.conn.recv()
+                except (EOFError, OSError):
+                    # 进程被系统终止（如超出内存上限）
+                    self._release(worker, healthy=False)
+                    return _error_result("执行进程异常退出，可能超出内存限制")
+                self._release(worker, healthy=True)
+                with self._lock:
+                    self._jobs += 1
+                return execution
+        finally:
+            with self._lock:
+                self._cancelled.pop(job_id, None)
+
+    async def run_async(
+        self, code: str, job_id: Optional[str] = None, timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """在线程中等待执行结果，不阻塞事件循环；协程被取消时同时取消任务"""
+        job_id = job_id or uuid4().hex
+        try:
+            return await asyncio.to_thread(self.run, code, job_id, timeout)
+        except asyncio.CancelledError:
+            self.cancel(job_id)
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """进程池统计：启动方式、工作进程启动耗时、已执行任务数与预加载的工作簿"""
+        with self._lock:
+            startup = list(self._startup_ms)
+            return {
+                "start_method": self._ctx.get_start_method(),
+                "workers": self.workers,
+                "idle_workers": self._idle.qsize(),
+                "jobs": self._jobs,
+                "startup_ms": {
+                    "last": round(startup[-1], 1) if startup else None,
+                    "avg": round(sum(startup) / len(startup), 1) if startup else None,
+                    "max": round(max(startup), 1) if startup else None,
+                    "samples": len(startup),
+                },
+                "preloaded_files": list(self._preload_paths),
+            }
+
+    def shutdown(self) -> None:
+        """停止全部工作进程"""
+        self._closed = True
+        with self._lock:
+            for event in self._cancelled.values():
+                event.set()
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.stop()
+
+
+# 全局实例
+_execution_pool: Optional[ExecutionPool] = None
+
+
+def get_execution_pool() -> ExecutionPool:
+    """获取执行进程池单例"""
+    global _execution_pool
+    if _execution_pool is None:
+        _execution_pool = ExecutionPool()
+    return _execution_pool
+
+
+def use_process_backend() -> bool:
+    return os.getenv(EXECUTOR_BACKEND_ENV, DEFAULT_EXECUTOR_BACKEND) == "process"
+
+
+def preload_workbook(stored_path: Any) -> None:
+    """会话工作簿的列式副本就绪后调用，预加载到执行进程中"""
+    if use_process_backend():
+        get_execution_pool().preload(stored_path)
+    else:
+        preload_sidecars(stored_path)
+
+
+async def execute_generated_code(
+    code: str, job_id: Optional[str] = None, use_cache: bool = True
+) -> Dict[str, Any]:
+    """
+    按配置的执行后端执行生成代码
+    use_cache 为 True 时，相同代码且上次执行读取的文件内容均未变化的重复执行直接返回缓存结果
+    """
+    memo = get_execution_memo()
+    key = memo.make_key(code) if use_cache else None
+    if key is not None:
+        # 校验缓存条目时可能需要计算文件哈希，在线程中进行，不阻塞事件循环
+        cached = await asyncio.to_thread(memo.get, key)
+        if cached is not None:
+            return cached
+
+    if use_process_backend():
+        execution = await get_execution_pool().run_async(code, job_id)
+    else:
+        execution = run_generated_code(code)
+
+    files_read = execution.pop("files_read", None)
+    if key is not None:
+        await asyncio.to_thread(memo.put, key, execution, files_read)
+    return execution
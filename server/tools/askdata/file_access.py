@@ -0,0 +1,102 @@
+"""
+生成代码执行期间读取的文件记录
+执行结果缓存按本次执行实际读取的文件判断结果是否仍然有效：
+Python 层面的文件打开通过审计钩子（open 事件）记录，工作簿缓存命中、pyarrow 读取等不经过 open 的访问由调用方显式登记
+"""
+import os
+import stat
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# 解释器与第三方库目录下的文件（模块导入、时区数据等）不作为执行结果的依赖
+_IGNORED_PREFIXES = tuple(
+    sorted({os.path.join(os.path.abspath(p), "") for p in (sys.prefix, sys.base_prefix, sys.exec_prefix)})
+)
+_IGNORED_SUFFIXES = (".py", ".pyc")
+_WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_APPEND | os.O_CREAT | os.O_TRUNC
+
+_state = threading.local()
+_hook_lock = threading.Lock()
+_hook_installed = False
+
+
+class FileReads:
+    """一次执行读取的文件：路径 -> 读取时的 (mtime_ns, size)；写过文件的执行结果不可缓存"""
+
+    def __init__(self):
+        self.files: Dict[str, Tuple[int, int]] = {}
+        self.wrote = False
+
+    def add(self, path: Any) -> None:
+        try:
+            key = os.path.abspath(os.fsdecode(path))
+        except (TypeError, ValueError):
+            return
+        if key in self.files or key.endswith(_IGNORED_SUFFIXES) or key.startswith(_IGNORED_PREFIXES):
+            return
+        try:
+            st = os.stat(key)
+        except OSError:
+            return
+        if stat.S_ISREG(st.st_mode):
+            self.files[key] = (st.st_mtime_ns, st.st_size)
+
+    def dependencies(self) -> Optional[List[Tuple[str, int, int]]]:
+        """[(路径, mtime_ns, size)]；写过文件时返回 None"""
+        if self.wrote:
+            return None
+        return [(path, mtime_ns, size) for path, (mtime_ns, size) in sorted(self.files.items())]
+
+
+def _audit_hook(event: str, args: Tuple[Any, ...]) -> None:
+    if event != "open":
+        return
+    reads = getattr(_state, "reads", None)
+    if reads is None or getattr(_state, "busy", False):
+        return
+    path, mode, flags = args
+    if path is None or isinstance(path, int):
+        return
+    _state.busy = True
+    try:
+        if mode is not None:
+            writing = any(c in mode for c in "wax+")
+        else:
+            writing = bool((flags or 0) & _WRITE_FLAGS)
+        if writing:
+            reads.wrote = True
+        else:
+            reads.add(path)
+    finally:
+        _state.busy = False
+
+
+def _install_hook() -> None:
+    """审计钩子安装后无法移除，每个进程只安装一次，未在记录时直接返回"""
+    global _hook_installed
+    with _hook_lock:
+        if not _hook_installed:
+            sys.addaudithook(_audit_hook)
+            _hook_installed = True
+
+
+@contextmanager
+def record_file_reads() -> Iterator[FileReads]:
+    """记录当前线程在上下文中读取的文件"""
+    _install_hook()
+    reads = FileReads()
+    previous = getattr(_state, "reads", None)
+    _state.reads = reads
+    try:
+        yield reads
+    finally:
+        _state.reads = previous
+
+
+def note_file_read(path: Any) -> None:
+    """登记不经过 Python open 的文件读取（如工作簿缓存命中、pyarrow 读取）"""
+    reads = getattr(_state, "reads", None)
+    if reads is not None and isinstance(path, (str, bytes, os.PathLike)):
+        reads.add(path)
@@ -3,8 +3,11 @@
 """
 import tempfile
 from pathlib import Path
-from typing import Any, Dict
-from uuid import uuid4
+from typing import Any, Dict, Optional
+
+from fastapi import UploadFile
+
+from tools.askdata.upload_store import get_upload_store
 
 
 # 上传目录配置
@@ -12,35 +15,33 @@ UPLOAD_DIR = Path(tempfile.gettempdir()) / "profile-page" / "uploads"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def save_uploaded_file(
-    filename: str, content: bytes, suffix: str, subdir: str = "uploads"
+async def save_upload_stream(
+    upload: UploadFile, suffix: str, subdir: str = "uploads"
 ) -> Path:
     """
-    保存上传的文件
+    分块保存上传文件（不把整个文件读入内存，不阻塞事件循环）
+    文件按内容哈希命名，内容相同的重复上传复用已保存的文件
     
     Args:
-        filename: 原始文件名
-        content: 文件内容（字节）
+        upload: FastAPI 上传文件（内容已由框架暂存在临时文件中）
         suffix: 文件后缀（如 .xlsx）
         subdir: 子目录名称（用于区分不同工具）
     
     Returns:
         保存的文件路径
     """
-    tool_dir = UPLOAD_DIR / subdir
-    tool_dir.mkdir(parents=True, exist_ok=True)
-    
-    unique_name = f"{uuid4().hex}{suffix}"
-    stored_path = tool_dir / unique_name
-    stored_path.write_bytes(content)
-    return stored_path
+    return await get_upload_store(UPLOAD_DIR / subdir).save(upload, suffix)
 
 
 def build_response_with_path(
-    result: Dict[str, Any], stored_path: Path
+    result: Dict[str, Any],
+    stored_path: Path,
+    sidecar_paths: Optional[Dict[str, str]] = None,
 ) -> Dict[str, Any]:
-    """在响应中添加文件路径"""
+    """在响应中添加文件路径及各 Sheet 列式副本路径"""
     enriched = dict(result)
     enriched["stored_file_path"] = str(stored_path)
+    if sidecar_paths is not None:
+        enriched["sidecar_paths"] = sidecar_paths
     return enriched
 
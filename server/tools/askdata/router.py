@@ -2,57 +2,136 @@
 智能问数工具路由
 """
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi import APIRouter, BackgroundTasks, File, HTTPException, UploadFile
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 
-from tools.askdata.code_executor import run_generated_code
-from tools.askdata.file_upload import build_response_with_path, save_uploaded_file
+from tools.askdata.code_executor import get_execution_memo
+from tools.askdata.execution_pool import (
+    execute_generated_code,
+    get_execution_pool,
+    use_process_backend,
+)
+from tools.askdata.analyze_jobs import (
+    AnalysisError,
+    get_analyze_job_manager,
+    shutdown_analyze_jobs,
+)
+from tools.askdata.excel_processor import shutdown_profile_pool
+from tools.askdata.example_workbook import (
+    EXAMPLE_FILE_NAME,
+    EXAMPLE_FILE_PATH,
+    get_example_analysis,
+    start_example_precompute,
+)
+from tools.askdata.file_upload import UPLOAD_DIR, save_upload_stream
+from tools.askdata.upload_store import get_upload_store
 from tools.askdata.code_generator import (
     CodeGenerationError,
     generate_python_code,
+    stream_python_code,
+    stream_summary,
     summarize_execution,
 )
-from tools.askdata.excel_processor import main as process_excel
+from tools.askdata.sheet_context import measure_sheet_context
+from tools.shared.sse import prime_stream, sse_event, sse_response
 
 # 创建工具路由
 router = APIRouter(prefix="/api")
 
-EXAMPLE_FILE_NAME = "industrial_production_demo.xlsx"
-EXAMPLE_FILE_PATH = Path(__file__).parent / "resources" / EXAMPLE_FILE_NAME
 
+def _start_execution_pool():
+    """服务启动时预先创建代码执行进程"""
+    if use_process_backend():
+        get_execution_pool().start()
+
+
+def _stop_execution_pool():
+    if use_process_backend():
+        get_execution_pool().shutdown()
+
+
+router.add_event_handler("startup", _start_execution_pool)
+router.add_event_handler("startup", start_example_precompute)
+router.add_event_handler("shutdown", _stop_execution_pool)
+router.add_event_handler("shutdown", shutdown_analyze_jobs)
+router.add_event_handler("shutdown", shutdown_profile_pool)
 
-@router.post("/analyze")
-async def analyze_excel(file: UploadFile = File(...)):
-    """上传并解析 Excel 文件"""
-    suffix = Path(file.filename).suffix or ".xlsx"
 
+def _validate_suffix(file: UploadFile) -> str:
+    suffix = Path(file.filename).suffix or ".xlsx"
     if suffix.lower() not in {".xlsx"}:
         raise HTTPException(status_code=400, detail="仅支持 .xlsx 文件")
+    return suffix
 
-    content = await file.read()
-    stored_path = save_uploaded_file(
-        file.filename, content, suffix, subdir="askdata"
-    )
 
-    result = process_excel(
-        {
-            "file_path": [
-                {
-                    "file_path": str(stored_path),
-                    "file_name": file.filename,
-                    "file_type": suffix.lstrip("."),
-                }
-            ]
-        }
-    )
+@router.post("/analyze")
+async def analyze_excel(
+    background_tasks: BackgroundTasks, file: UploadFile = File(...)
+):
+    """上传并解析 Excel 文件（分块保存，解析在独立进程中进行，不阻塞事件循环）"""
+    suffix = _validate_suffix(file)
+    stored_path = await save_upload_stream(file, suffix, subdir="askdata")
+
+    manager = get_analyze_job_manager()
+    try:
+        response, convert = await manager.analyze(stored_path, file.filename, suffix)
+    except AnalysisError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    # 后台在解析进程中将解析成功的 Sheet 转换为 Feather 列式副本，副本就绪后预加载到代码执行进程
+    background_tasks.add_task(manager.prepare_workbook, stored_path, convert)
+    return response
+
 
-    if "errorMessage" in result:
-        raise HTTPException(status_code=400, detail=result["errorMessage"])
+@router.post("/analyze/jobs", status_code=202)
+async def submit_analyze_job(file: UploadFile = File(...)):
+    """上传 Excel 并提交后台解析任务，立即返回任务 ID；大文件上传不必等待解析完成"""
+    suffix = _validate_suffix(file)
+    stored_path = await save_upload_stream(file, suffix, subdir="askdata")
+    job = get_analyze_job_manager().submit(stored_path, file.filename, suffix)
+    return job.to_dict()
 
-    return build_response_with_path(result, stored_path)
+
+@router.get("/analyze/jobs/{job_id}")
+async def get_analyze_job(job_id: str):
+    """查询解析任务状态；成功时 result 与 /api/analyze 的返回一致"""
+    job = get_analyze_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="解析任务不存在或已过期")
+    return job.to_dict()
+
+
+@router.get("/askdata/example-analysis")
+async def example_analysis():
+    """获取内置示例工作簿的解析结果（启动时已预处理，无需上传），格式与 /api/analyze 一致"""
+    if not EXAMPLE_FILE_PATH.exists():
+        raise HTTPException(status_code=404, detail="示例文件不存在")
+    try:
+        return await get_example_analysis()
+    except AnalysisError as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+
+class ReleaseFileRequest(BaseModel):
+    stored_file_path: str
+
+
+@router.post("/askdata/files/release")
+async def release_uploaded_file(payload: ReleaseFileRequest):
+    """释放一次上传文件的引用（切换或清除文件时调用），无引用的文件可被回收"""
+    store = get_upload_store(UPLOAD_DIR / "askdata")
+    if not store.release(payload.stored_file_path):
+        raise HTTPException(status_code=404, detail="文件不存在或已回收")
+    return {"released": True}
+
+
+@router.get("/askdata/upload-store/stats")
+async def upload_store_stats():
+    """上传文件存储统计（去重命中、解析结果复用、回收情况）"""
+    return get_upload_store(UPLOAD_DIR / "askdata").stats()
 
 
 @router.get("/askdata/example-excel")
@@ -68,10 +147,56 @@ async def download_example_excel():
     )
 
 
+def _to_http_exception(exc: Exception, prefix: str) -> HTTPException:
+    """将模型调用异常转换为 HTTP 错误"""
+    if isinstance(exc, EnvironmentError):
+        # API Key 相关错误
+        return HTTPException(status_code=401, detail=str(exc))
+    if isinstance(exc, CodeGenerationError):
+        # 代码生成错误
+        return HTTPException(status_code=500, detail=str(exc))
+    # 其他未预期的错误（如 openai.AuthenticationError）
+    error_msg = str(exc)
+    if "API key" in error_msg or "401" in error_msg or "authentication" in error_msg.lower():
+        return HTTPException(
+            status_code=401,
+            detail="API Key 认证失败，请检查 DASHSCOPE_API_KEY 配置是否正确"
+        )
+    return HTTPException(status_code=500, detail=f"{prefix}: {error_msg}")
+
+
+async def _text_events(
+    deltas: AsyncIterator[str], result_key: str, empty_message: str
+) -> AsyncIterator[str]:
+    """
+    将增量文本转换为 SSE 事件
+    - {"type": "delta", "content": "..."}：增量文本
+    - {"type": "done", result_key: 全文}：结束事件，与非流式接口的返回字段一致
+    - {"type": "error", "error": "..."}：流式过程中出错
+    客户端断开时关闭增量迭代器，及时释放上游模型连接
+    """
+    parts: List[str] = []
+    try:
+        async for delta in deltas:
+            parts.append(delta)
+            yield sse_event({"type": "delta", "content": delta})
+
+        content = "".join(parts).strip()
+        if content:
+            yield sse_event({"type": "done", result_key: content})
+        else:
+            yield sse_event({"type": "error", "error": empty_message})
+    except Exception as exc:
+        yield sse_event({"type": "error", "error": str(exc)})
+    finally:
+        await deltas.aclose()
+
+
 class CodeGenerationRequest(BaseModel):
     question: str
     file_path: str
     sheets: Optional[Dict[str, Any]] = None
+    sidecar_paths: Optional[Dict[str, str]] = None
     history: Optional[str] = None
     custom_system_prompt: Optional[str] = None
     custom_user_prompt: Optional[str] = None
@@ -81,43 +206,89 @@ class CodeGenerationRequest(BaseModel):
 async def generate_code(payload: CodeGenerationRequest):
     """生成 Python 代码"""
     try:
-        code = generate_python_code(
+        code = await generate_python_code(
             user_question=payload.question,
             sheets=payload.sheets,
             file_path=payload.file_path,
+            sidecar_paths=payload.sidecar_paths,
             history=payload.history,
             custom_system_prompt=payload.custom_system_prompt,
             custom_user_prompt=payload.custom_user_prompt,
         )
         return {"code": code}
-    except EnvironmentError as exc:
-        # API Key 相关错误
-        raise HTTPException(status_code=401, detail=str(exc)) from exc
-    except CodeGenerationError as exc:
-        # 代码生成错误
-        raise HTTPException(status_code=500, detail=str(exc)) from exc
     except Exception as exc:
-        # 其他未预期的错误（如 openai.AuthenticationError）
-        error_msg = str(exc)
-        if "API key" in error_msg or "401" in error_msg or "authentication" in error_msg.lower():
-            raise HTTPException(
-                status_code=401,
-                detail="API Key 认证失败，请检查 DASHSCOPE_API_KEY 配置是否正确"
-            ) from exc
-        raise HTTPException(status_code=500, detail=f"生成代码时出错: {error_msg}") from exc
+        raise _to_http_exception(exc, "生成代码时出错") from exc
+
+
+@router.post("/generate-code/stream")
+async def generate_code_stream(payload: CodeGenerationRequest):
+    """流式生成 Python 代码（SSE），模型输出即时推送，客户端可提前中止"""
+    try:
+        deltas = await prime_stream(
+            stream_python_code(
+                user_question=payload.question,
+                sheets=payload.sheets,
+                file_path=payload.file_path,
+                sidecar_paths=payload.sidecar_paths,
+                history=payload.history,
+                custom_system_prompt=payload.custom_system_prompt,
+                custom_user_prompt=payload.custom_user_prompt,
+            )
+        )
+    except Exception as exc:
+        raise _to_http_exception(exc, "生成代码时出错") from exc
+    return sse_response(_text_events(deltas, "code", "模型返回内容为空"))
+
+
+class PromptSizeRequest(BaseModel):
+    question: str = ""
+    sheets: Optional[Dict[str, Any]] = None
+    budget_tokens: Optional[int] = None
+
+
+@router.post("/askdata/prompt-size")
+async def prompt_size(payload: PromptSizeRequest):
+    """对比表格信息压缩前后的提示词大小（字符数与估算 token 数）"""
+    return measure_sheet_context(payload.sheets, payload.question, payload.budget_tokens)
 
 
 class ExecuteCodeRequest(BaseModel):
     code: str
+    job_id: Optional[str] = None
+    use_cache: bool = True
 
 
 @router.post("/execute-code")
 async def execute_code(payload: ExecuteCodeRequest):
-    """执行生成的代码"""
-    execution = run_generated_code(payload.code)
+    """执行生成的代码（可指定 job_id 以便取消；相同代码与文件的重复执行直接返回缓存结果）"""
+    execution = await execute_generated_code(
+        payload.code, payload.job_id, payload.use_cache
+    )
     return execution
 
 
+@router.get("/askdata/execution-cache/stats")
+async def execution_cache_stats():
+    """执行结果缓存命中统计"""
+    return get_execution_memo().stats()
+
+
+@router.get("/askdata/executor-stats")
+async def executor_stats():
+    """代码执行进程池统计（启动方式、进程启动耗时等）"""
+    if not use_process_backend():
+        return {"backend": "inline"}
+    return {"backend": "process", **get_execution_pool().stats()}
+
+
+@router.post("/execute-code/{job_id}/cancel")
+async def cancel_execute_code(job_id: str):
+    """取消排队中或执行中的代码"""
+    if not use_process_backend() or not get_execution_pool().cancel(job_id):
+        raise HTTPException(status_code=404, detail="任务不存在或已结束")
+    return {"job_id": job_id, "cancelled": True}
+
+
 class SummarizeRequest(BaseModel):
     question: str
     result: Dict[str, Any]
@@ -129,26 +300,29 @@ class SummarizeRequest(BaseModel):
 async def summarize_result(payload: SummarizeRequest):
     """总结执行结果"""
     try:
-        summary = summarize_execution(
+        summary = await summarize_execution(
             user_question=payload.question,
             execution_result=payload.result,
             custom_system_prompt=payload.custom_system_prompt,
             custom_user_prompt=payload.custom_user_prompt,
         )
         return {"markdown": summary}
-    except EnvironmentError as exc:
-        # API Key 相关错误
-        raise HTTPException(status_code=401, detail=str(exc)) from exc
-    except CodeGenerationError as exc:
-        # 代码生成错误
-        raise HTTPException(status_code=500, detail=str(exc)) from exc
     except Exception as exc:
-        # 其他未预期的错误（如 openai.AuthenticationError）
-        error_msg = str(exc)
-        if "API key" in error_msg or "401" in error_msg or "authentication" in error_msg.lower():
-            raise HTTPException(
-                status_code=401,
-                detail="API Key 认证失败，请检查 DASHSCOPE_API_KEY 配置是否正确"
-            ) from exc
-        raise HTTPException(status_code=500, detail=f"总结结果时出错: {error_msg}") from exc
+        raise _to_http_exception(exc, "总结结果时出错") from exc
 
+
+@router.post("/summarize-result/stream")
+async def summarize_result_stream(payload: SummarizeRequest):
+    """流式总结执行结果（SSE），Markdown 即时推送，客户端可提前中止"""
+    try:
+        deltas = await prime_stream(
+            stream_summary(
+                user_question=payload.question,
+                execution_result=payload.result,
+                custom_system_prompt=payload.custom_system_prompt,
+                custom_user_prompt=payload.custom_user_prompt,
+            )
+        )
+    except Exception as exc:
+        raise _to_http_exception(exc, "总结结果时出错") from exc
+    return sse_response(_text_events(deltas, "markdown", "总结内容为空"))
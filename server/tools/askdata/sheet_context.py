@@ -0,0 +1,253 @@
+"""
+生成代码提示词中的表格信息（按预算压缩）
+/api/analyze 返回的 sheets 包含每个 Sheet 的完整 schema、样例值与预览行，多 Sheet 工作簿直接写入提示词会显著增加
+token 数与模型延迟；这里按与用户问题的相关度分配详略，并将结果控制在 token 预算内
+"""
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# 表格信息的 token 预算，0 表示不压缩（输出完整的缩进 JSON）
+SHEET_CONTEXT_BUDGET_ENV = "ASKDATA_SHEET_CONTEXT_TOKENS"
+DEFAULT_SHEET_CONTEXT_BUDGET = 3000
+
+# 单元格与样例值的最大字符数、每列样例值个数、每个 Sheet 的预览行数
+MAX_CELL_CHARS = 40
+MAX_SAMPLE_VALUES = 3
+MAX_PREVIEW_ROWS = 3
+
+# 预算不足以列出全部列时，每个 Sheet 保留的列数（按相关度排序）与预览行数
+MAX_TRUNCATED_COLUMNS = 8
+MAX_TRUNCATED_PREVIEW_ROWS = 1
+
+# 详略级别：完整（schema + 预览行）、schema（含样例值）、仅列名与类型、仅相关度最高的部分列
+LEVEL_FULL = "full"
+LEVEL_SCHEMA = "schema"
+LEVEL_COLUMNS = "columns"
+LEVEL_TRUNCATED = "truncated"
+LEVELS = [LEVEL_TRUNCATED, LEVEL_COLUMNS, LEVEL_SCHEMA, LEVEL_FULL]
+
+TOKEN_ESTIMATE_NOTE = "token 数为启发式估算（中文约 1 token/字，其余约 4 字符/token），并非模型分词器的计数"
+
+_WORD = re.compile(r"[a-z0-9]+|[一-鿿]+")
+_CJK = re.compile(r"[一-鿿]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算 token 数：中文字符约 1 token/字，其余约 4 字符/token
+    仅为启发式估算，与模型分词器的实际计数可能有较大偏差
+    """
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _terms(text: Any) -> set:
+    """
+    提取用于匹配的词：英文/数字按词切分（下划线、驼峰拆开），中文取相邻二字组
+    """
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", str(text)).lower()
+    terms = set()
+    for word in _WORD.findall(text):
+        if _CJK.match(word):
+            if len(word) == 1:
+                terms.add(word)
+            terms.update(word[i:i + 2] for i in range(len(word) - 1))
+        elif len(word) > 1:
+            terms.add(word)
+    return terms
+
+
+def _truncate(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > MAX_CELL_CHARS:
+        return value[:MAX_CELL_CHARS] + "…"
+    return value
+
+
+def _column_score(column: Dict[str, Any], question_terms: set) -> int:
+    """列名匹配权重 3，样例值匹配权重 1"""
+    name_terms = _terms(column.get("column_name", "")) | _terms(column.get("original_header", ""))
+    sample_terms = set()
+    for value in column.get("sample_values") or []:
+        sample_terms |= _terms(value)
+    return 3 * len(question_terms & name_terms) + len(question_terms & sample_terms)
+
+
+def _sheet_score(sheet_name: str, profile: Dict[str, Any], question_terms: set) -> int:
+    score = 3 * len(question_terms & _terms(sheet_name))
+    return score + sum(_column_score(c, question_terms) for c in profile.get("schema") or [])
+
+
+def _compact_column(column: Dict[str, Any], level: str) -> Dict[str, Any]:
+    compact: Dict[str, Any] = {
+        "column_name": column.get("column_name"),
+        "general_type": column.get("general_type"),
+    }
+    if level == LEVEL_COLUMNS:
+        return compact
+    original = column.get("original_header")
+    if original is not None and original != compact["column_name"]:
+        compact["original_header"] = _truncate(original)
+    if column.get("null_ratio"):
+        compact["null_ratio"] = column["null_ratio"]
+    samples = column.get("sample_values") or []
+    if samples:
+        compact["sample_values"] = [_truncate(v) for v in samples[:MAX_SAMPLE_VALUES]]
+    return compact
+
+
+def _rank_columns(schema: List[Dict[str, Any]], question_terms: set) -> List[Dict[str, Any]]:
+    """按相关度保留前 MAX_TRUNCATED_COLUMNS 列，得分相同时保持原始列顺序，输出仍按原始列顺序"""
+    ranked = sorted(range(len(schema)), key=lambda i: -_column_score(schema[i], question_terms))
+    return [schema[i] for i in sorted(ranked[:MAX_TRUNCATED_COLUMNS])]
+
+
+def _compact_sheet(profile: Dict[str, Any], level: str, question_terms: set) -> Dict[str, Any]:
+    compact: Dict[str, Any] = {}
+    summary = profile.get("summary") or {}
+    for key in ("total_rows", "total_columns"):
+        if key in summary:
+            compact[key] = summary[key]
+    schema = profile.get("schema") or []
+    if level == LEVEL_TRUNCATED:
+        if len(schema) <= MAX_TRUNCATED_COLUMNS:
+            return _compact_sheet(profile, LEVEL_COLUMNS, question_terms)
+        kept = _rank_columns(schema, question_terms)
+        names = {c.get("column_name") for c in kept}
+        compact["schema"] = [_compact_column(c, LEVEL_COLUMNS) for c in kept]
+        compact["omitted_columns"] = len(schema) - len(kept)
+        if profile.get("preview"):
+            compact["preview"] = [
+                {k: _truncate(v) for k, v in row.items() if k in names}
+                for row in profile["preview"][:MAX_TRUNCATED_PREVIEW_ROWS]
+            ]
+        return compact
+    compact["schema"] = [_compact_column(c, level) for c in schema]
+    if level == LEVEL_FULL and profile.get("preview"):
+        compact["preview"] = [
+            {k: _truncate(v) for k, v in row.items()}
+            for row in profile["preview"][:MAX_PREVIEW_ROWS]
+        ]
+    return compact
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def resolve_budget(budget_tokens: Optional[int] = None) -> int:
+    if budget_tokens is None:
+        budget_tokens = int(os.getenv(SHEET_CONTEXT_BUDGET_ENV, DEFAULT_SHEET_CONTEXT_BUDGET))
+    return max(int(budget_tokens), 0)
+
+
+def build_sheet_context(
+    sheets: Optional[Dict[str, Any]],
+    question: str = "",
+    budget_tokens: Optional[int] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    构建提示词中的表格信息，返回 (文本, 统计信息)
+    先保证每个 Sheet 至少给出相关度最高的部分列与一行预览（按相关度排序，超出预算的 Sheet 只列出名称），
+    再按相关度依次升级为全部列名与类型、含样例值的 schema、含预览行的完整信息
+    token 数按 estimate_tokens 启发式估算，预算并非精确上限
+    """
+    if not sheets:
+        return "（无解析到的表格信息）", {
+            "budget_tokens": 0,
+            "sheets_total": 0,
+            "levels": {},
+            "token_estimate": TOKEN_ESTIMATE_NOTE,
+        }
+
+    # (文件键, Sheet 名, profile)，保持原始顺序用于输出
+    items: List[Tuple[str, str, Dict[str, Any]]] = []
+    for file_key, file_info in sheets.items():
+        for sheet_name, profile in (file_info.get("sheets") or {}).items():
+            items.append((file_key, sheet_name, profile or {}))
+
+    budget = resolve_budget(budget_tokens)
+    if budget == 0:
+        text = json.dumps(sheets, ensure_ascii=False, indent=2)
+        return text, {
+            "budget_tokens": 0,
+            "sheets_total": len(items),
+            "levels": {},
+            "token_estimate": TOKEN_ESTIMATE_NOTE,
+        }
+
+    question_terms = _terms(question or "")
+    scores = [_sheet_score(name, profile, question_terms) for _, name, profile in items]
+    ranked = sorted(range(len(items)), key=lambda i: -scores[i])
+
+    # 每个 Sheet 各级别的压缩结果与 token 数
+    rendered: List[Dict[str, Tuple[Dict[str, Any], int]]] = []
+    for _, sheet_name, profile in items:
+        by_level = {}
+        for level in LEVELS:
+            compact = _compact_sheet(profile, level, question_terms)
+            by_level[level] = (compact, estimate_tokens(_dumps({sheet_name: compact})))
+        rendered.append(by_level)
+
+    # 文件名、路径等外层结构与未纳入 Sheet 名单的开销（按全部未纳入预留）
+    used = sum(
+        estimate_tokens(_dumps({k: v for k, v in info.items() if k != "sheets"}))
+        for info in sheets.values()
+    )
+    used += estimate_tokens(_dumps({"omitted_sheets": [name for _, name, _ in items]}))
+    levels: Dict[int, str] = {}
+    for target in LEVELS:
+        for i in ranked:
+            if target != LEVEL_TRUNCATED and i not in levels:
+                continue
+            current = rendered[i][levels[i]][1] if i in levels else 0
+            extra = rendered[i][target][1] - current
+            if used + extra <= budget:
+                levels[i] = target
+                used += extra
+
+    context: Dict[str, Any] = {}
+    omitted: List[str] = []
+    for i, (file_key, sheet_name, _) in enumerate(items):
+        if file_key not in context:
+            context[file_key] = {k: v for k, v in sheets[file_key].items() if k != "sheets"}
+            context[file_key]["sheets"] = {}
+        if i in levels:
+            context[file_key]["sheets"][sheet_name] = rendered[i][levels[i]][0]
+        else:
+            omitted.append(sheet_name)
+    if omitted:
+        context["omitted_sheets"] = omitted
+
+    text = _dumps(context)
+    stats = {
+        "budget_tokens": budget,
+        "sheets_total": len(items),
+        "sheets_included": len(levels),
+        "omitted_sheets": omitted,
+        "token_estimate": TOKEN_ESTIMATE_NOTE,
+        "levels": {
+            f"{items[i][0]}/{items[i][1]}": {"level": levels.get(i), "score": scores[i]}
+            for i in ranked
+        },
+    }
+    return text, stats
+
+
+def measure_sheet_context(
+    sheets: Optional[Dict[str, Any]],
+    question: str = "",
+    budget_tokens: Optional[int] = None,
+) -> Dict[str, Any]:
+    """对比完整缩进 JSON 与按预算压缩后的表格信息大小"""
+    before = json.dumps(sheets, ensure_ascii=False, indent=2) if sheets else ""
+    after, stats = build_sheet_context(sheets, question, budget_tokens)
+    before_tokens = estimate_tokens(before)
+    after_tokens = estimate_tokens(after)
+    return {
+        "before": {"chars": len(before), "tokens": before_tokens},
+        "after": {"chars": len(after), "tokens": after_tokens},
+        "reduction": round(1 - after_tokens / before_tokens, 4) if before_tokens else None,
+        **stats,
+    }
@@ -0,0 +1,222 @@
+"""
+上传 Excel 的列式副本（Feather）
+/api/analyze 成功后在后台把每个 Sheet 转换为 Feather 文件，生成代码可用 pd.read_feather 快速读取
+"""
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+from uuid import uuid4
+
+import pandas as pd
+
+from tools.askdata.file_access import note_file_read
+
+SIDECAR_SUFFIX = ".feather"
+MANIFEST_NAME = "manifest.json"
+
+# 与代码模板中 pd.read_excel 的参数保持一致，保证副本与直接读取 Excel 的结果相同
+SIDECAR_READ_KWARGS = {"keep_default_na": False, "na_filter": False}
+
+# 读取尚未转换完成的副本时最多等待的秒数，超时后回退为读取 Excel
+SIDECAR_WAIT_SECONDS = 30
+SIDECAR_POLL_INTERVAL = 0.2
+
+STATUS_PENDING = "pending"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+
+def sidecar_dir(stored_path: Any) -> Path:
+    """副本目录：与上传文件同级的 <文件名>.sidecars/"""
+    stored_path = Path(stored_path)
+    return stored_path.with_name(stored_path.name + ".sidecars")
+
+
+def _safe_sheet_file_name(index: int, sheet_name: str) -> str:
+    """Sheet 名可能包含文件系统不允许的字符，使用序号前缀保证唯一"""
+    safe = re.sub(r"[^\w\-]+", "_", sheet_name, flags=re.UNICODE).strip("_")
+    return f"{index:02d}_{safe or 'sheet'}{SIDECAR_SUFFIX}"
+
+
+def _tmp_name(target: Path) -> Path:
+    """每个写入方使用不同的临时文件，多个进程同时转换同一文件时互不覆盖"""
+    return target.with_name(f"{target.name}.{uuid4().hex}.tmp")
+
+
+def _write_manifest(directory: Path, manifest: Dict[str, Any]) -> None:
+    tmp_path = _tmp_name(directory / MANIFEST_NAME)
+    tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp_path, directory / MANIFEST_NAME)
+
+
+def _read_manifest(directory: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads((directory / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def plan_sidecars(stored_path: Any, sheet_names: Iterable[str]) -> Dict[str, str]:
+    """
+    登记需要转换的 Sheet 并写入清单，返回 {Sheet 名: 副本路径}
+    实际转换由 convert_sidecars 在后台完成；
+    已有相同 Sheet 的清单（已就绪或正在转换）时直接沿用，不再重置为待转换
+    """
+    directory = sidecar_dir(stored_path)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    sheet_names = [str(name) for name in sheet_names]
+    existing = _read_manifest(directory)
+    if existing and list(existing.get("sheets", {})) == sheet_names:
+        return {name: info["path"] for name, info in existing["sheets"].items()}
+
+    sheets = {}
+    for index, sheet_name in enumerate(sheet_names, start=1):
+        sheets[sheet_name] = {
+            "path": str(directory / _safe_sheet_file_name(index, sheet_name)),
+            "status": STATUS_PENDING,
+        }
+    _write_manifest(directory, {"source": str(stored_path), "sheets": sheets})
+    return {name: info["path"] for name, info in sheets.items()}
+
+
+def needs_conversion(stored_path: Any) -> bool:
+    """清单中仍有待转换的 Sheet（新登记，或上次转换被中断）"""
+    manifest = _read_manifest(sidecar_dir(stored_path))
+    return bool(manifest) and any(
+        info.get("status") == STATUS_PENDING for info in manifest.get("sheets", {}).values()
+    )
+
+
+def convert_sidecars(stored_path: Any) -> Dict[str, Any]:
+    """
+    按清单把待转换的 Sheet 写为 Feather 副本（先写临时文件再原子替换），返回更新后的清单
+    已就绪或已失败的 Sheet 跳过
+    """
+    directory = sidecar_dir(stored_path)
+    manifest = _read_manifest(directory)
+    try:
+        if manifest is None:
+            return {}
+
+        pending = {
+            sheet_name: info
+            for sheet_name, info in manifest["sheets"].items()
+            if info["status"] == STATUS_PENDING
+        }
+        if not pending:
+            return manifest
+
+        excel = pd.ExcelFile(stored_path)
+        try:
+            for sheet_name, info in pending.items():
+                target = Path(info["path"])
+                tmp_path = _tmp_name(target)
+                try:
+                    df = pd.read_excel(excel, sheet_name=sheet_name, **SIDECAR_READ_KWARGS)
+                    # 混合类型列、非字符串列名等无法写入 Feather 时该 Sheet 保持读取 Excel
+                    df.to_feather(tmp_path)
+                    os.replace(tmp_path, target)
+                    info["status"] = STATUS_READY
+                except Exception as e:
+                    info["status"] = STATUS_FAILED
+                    info["error"] = str(e).strip()[:200]
+                    if tmp_path.exists():
+                        tmp_path.unlink()
+        finally:
+            excel.close()
+
+        _write_manifest(directory, manifest)
+        return manifest
+    except Exception as e:
+        print(f"⚠️  [Sidecar] 转换失败: {stored_path}: {e}")
+        if manifest:
+            # 标记未完成的 Sheet，避免读取方继续等待
+            for info in manifest["sheets"].values():
+                if info["status"] == STATUS_PENDING:
+                    info["status"] = STATUS_FAILED
+            try:
+                _write_manifest(directory, manifest)
+            except OSError:
+                pass
+        return manifest or {}
+
+
+def _find_sheet(manifest: Optional[Dict[str, Any]], target: Path) -> Optional[str]:
+    """在清单中查找副本路径对应的 Sheet 名"""
+    if not manifest:
+        return None
+    for sheet_name, info in manifest.get("sheets", {}).items():
+        if Path(info.get("path", "")) == target:
+            return sheet_name
+    return None
+
+
+def read_sidecar(path: Any, columns: Any = None, **kwargs: Any) -> pd.DataFrame:
+    """
+    与 pd.read_feather 参数一致
+    副本仍在转换时等待其完成（可跨进程，依据清单状态）；
+    副本缺失或转换失败时按清单回退为读取原 Excel 对应 Sheet
+    """
+    target = Path(path)
+    manifest = None
+    deadline = time.monotonic() + SIDECAR_WAIT_SECONDS
+    while not target.exists():
+        manifest = _read_manifest(target.parent)
+        sheet_name = _find_sheet(manifest, target)
+        if sheet_name is None:
+            break
+        if manifest["sheets"][sheet_name]["status"] != STATUS_PENDING:
+            break
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(SIDECAR_POLL_INTERVAL)
+
+    if manifest is None:
+        manifest = _read_manifest(target.parent)
+    sheet_name = _find_sheet(manifest, target)
+    if sheet_name is None or kwargs or not os.path.isfile(manifest["source"]):
+        # 非副本路径、带额外读取参数或原文件已删除时交给 pandas 处理（包括抛出文件不存在错误）
+        note_file_read(target)
+        return pd.read_feather(target, columns=columns, **kwargs)
+
+    # 副本与 read_excel(source, sheet_name, **SIDECAR_READ_KWARGS) 结果相同，共用同一缓存项
+    from tools.askdata.workbook_cache import get_workbook_cache
+
+    source = manifest["source"]
+    if target.exists():
+        loader = lambda: pd.read_feather(target)  # noqa: E731
+    else:
+        loader = lambda: pd.read_excel(  # noqa: E731
+            source, sheet_name=sheet_name, **SIDECAR_READ_KWARGS
+        )
+    df = get_workbook_cache().get_or_load(source, sheet_name, SIDECAR_READ_KWARGS, loader)
+    return df[columns] if columns is not None else df
+
+
+def preload_sidecars(stored_path: Any) -> int:
+    """将已就绪的副本加载进当前进程的工作簿缓存，返回加载的 Sheet 数"""
+    from tools.askdata.workbook_cache import get_workbook_cache
+
+    manifest = _read_manifest(sidecar_dir(stored_path))
+    if not manifest:
+        return 0
+
+    cache = get_workbook_cache()
+    loaded = 0
+    for sheet_name, info in manifest.get("sheets", {}).items():
+        if info.get("status") != STATUS_READY:
+            continue
+        target = Path(info["path"])
+        cache.get_or_load(
+            manifest["source"],
+            sheet_name,
+            SIDECAR_READ_KWARGS,
+            lambda: pd.read_feather(target),
+            copy=False,
+        )
+        loaded += 1
+    return loaded
@@ -0,0 +1,245 @@
+"""
+内容寻址的上传文件存储
+上传文件按内容哈希命名，相同内容只保存、解析一次：重复上传复用已保存的文件、列式副本与 /api/analyze 解析结果；
+按引用计数与最近访问时间回收，目录总大小超出预算时按最近最少使用顺序清理
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional
+from uuid import uuid4
+
+from fastapi import UploadFile
+
+from tools.askdata.workbook_cache import HASH_CHUNK_SIZE
+
+# 存储目录大小预算（MB）与引用的空闲有效期（秒）
+# 浏览器不一定会主动释放引用，超过空闲有效期的文件即使仍有引用也可被回收
+UPLOAD_STORE_BUDGET_ENV = "ASKDATA_UPLOAD_STORE_MB"
+UPLOAD_IDLE_TTL_ENV = "ASKDATA_UPLOAD_IDLE_TTL"
+DEFAULT_UPLOAD_STORE_BUDGET_MB = 2048
+DEFAULT_UPLOAD_IDLE_TTL = 24 * 3600.0
+
+PART_SUFFIX = ".part"
+ANALYSIS_SUFFIX = ".analysis.json"
+SIDECAR_DIR_SUFFIX = ".sidecars"
+
+
+def copy_to_disk(source: BinaryIO, target: Path) -> str:
+    """分块复制并计算内容哈希，返回哈希"""
+    digest = hashlib.sha256()
+    with open(target, "wb") as f:
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+
+def _path_bytes(path: Path) -> int:
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return path.stat().st_size if path.exists() else 0
+
+
+class _Entry:
+    def __init__(self, refcount: int = 0, last_access: Optional[float] = None):
+        self.refcount = refcount
+        self.last_access = last_access or time.time()
+        # 常驻文件（如内置示例）不参与回收
+        self.pinned = False
+
+
+class UploadStore:
+    """
+    单个目录下的上传文件存储
+    引用计数只保存在当前进程内，服务重启后按文件修改时间视为无引用的旧文件
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        budget_bytes: Optional[int] = None,
+        idle_ttl: Optional[float] = None,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if budget_bytes is None:
+            budget_mb = float(os.getenv(UPLOAD_STORE_BUDGET_ENV, DEFAULT_UPLOAD_STORE_BUDGET_MB))
+            budget_bytes = int(budget_mb * 1024 * 1024)
+        self.budget_bytes = budget_bytes
+        self.idle_ttl = idle_ttl or float(os.getenv(UPLOAD_IDLE_TTL_ENV, DEFAULT_UPLOAD_IDLE_TTL))
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.dedup_hits = 0
+        self.analysis_hits = 0
+        self.collected = 0
+        self.collected_bytes = 0
+        self._scan()
+
+    def _scan(self) -> None:
+        """登记目录中已有的上传文件（包括旧版本按随机名保存的文件），便于统一回收"""
+        for path in self.directory.iterdir():
+            if path.is_file() and path.suffix and not path.name.endswith(
+                (PART_SUFFIX, ANALYSIS_SUFFIX)
+            ):
+                self._entries[path.name] = _Entry(last_access=path.stat().st_mtime)
+
+    async def save(self, upload: UploadFile, suffix: str) -> Path:
+        """分块保存上传文件（在线程中进行），内容相同时复用已有文件；返回文件路径并增加一次引用"""
+        await upload.seek(0)
+        return await asyncio.to_thread(self._save, upload.file, suffix)
+
+    def add_file(self, path: Path, pinned: bool = False) -> Path:
+        """保存本地文件（如内置示例），pinned 为 True 时该文件常驻、不会被回收"""
+        with open(path, "rb") as source:
+            return self._save(source, Path(path).suffix, pinned)
+
+    def _save(self, source: BinaryIO, suffix: str, pinned: bool = False) -> Path:
+        tmp_path = self.directory / f"{uuid4().hex}{PART_SUFFIX}"
+        try:
+            digest = copy_to_disk(source, tmp_path)
+            stored_path = self.directory / f"{digest}{suffix.lower()}"
+            with self._lock:
+                self.uploads += 1
+                if stored_path.exists():
+                    self.dedup_hits += 1
+                else:
+                    os.replace(tmp_path, stored_path)
+                entry = self._entries.setdefault(stored_path.name, _Entry())
+                entry.refcount += 1
+                entry.last_access = time.time()
+                entry.pinned = entry.pinned or pinned
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+        self.collect()
+        return stored_path
+
+    def touch(self, stored_path: Any) -> None:
+        with self._lock:
+            entry = self._entries.get(Path(stored_path).name)
+            if entry is not None:
+                entry.last_access = time.time()
+
+    def release(self, stored_path: Any) -> bool:
+        """释放一次引用，返回是否找到该文件"""
+        with self._lock:
+            entry = self._entries.get(Path(stored_path).name)
+            if entry is None:
+                return False
+            entry.refcount = max(entry.refcount - 1, 0)
+            return True
+
+    def _analysis_path(self, stored_path: Path, file_name: str) -> Path:
+        # 解析结果中包含原始文件名，按文件名分别缓存
+        name_key = hashlib.sha1(file_name.encode("utf-8")).hexdigest()[:12]
+        return stored_path.with_name(f"{stored_path.name}.{name_key}{ANALYSIS_SUFFIX}")
+
+    def load_analysis(self, stored_path: Path, file_name: str) -> Optional[Dict[str, Any]]:
+        """读取已缓存的 /api/analyze 结果"""
+        try:
+            text = self._analysis_path(stored_path, file_name).read_text(encoding="utf-8")
+            result = json.loads(text)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self.analysis_hits += 1
+        self.touch(stored_path)
+        return result
+
+    def save_analysis(self, stored_path: Path, file_name: str, result: Dict[str, Any]) -> None:
+        target = self._analysis_path(stored_path, file_name)
+        tmp_path = target.with_name(target.name + PART_SUFFIX)
+        tmp_path.write_text(json.dumps(result, ensure_ascii=False, default=str), encoding="utf-8")
+        os.replace(tmp_path, target)
+
+    def _related_paths(self, name: str) -> List[Path]:
+        """上传文件及其列式副本目录、解析结果缓存"""
+        paths = [self.directory / name, self.directory / (name + SIDECAR_DIR_SUFFIX)]
+        paths.extend(self.directory.glob(f"{name}.*{ANALYSIS_SUFFIX}"))
+        return paths
+
+    def collect(self) -> Dict[str, int]:
+        """
+        目录总大小超出预算时回收：无引用或空闲超过有效期的文件按最近访问时间从早到晚删除，直到低于预算
+        """
+        with self._lock:
+            names = list(self._entries)
+        sizes = {name: sum(_path_bytes(p) for p in self._related_paths(name)) for name in names}
+        total = sum(sizes.values())
+
+        removed = 0
+        freed = 0
+        if total > self.budget_bytes:
+            now = time.time()
+            with self._lock:
+                candidates = sorted(
+                    (
+                        (entry.last_access, name)
+                        for name, entry in self._entries.items()
+                        if not entry.pinned
+                        and (entry.refcount == 0 or now - entry.last_access > self.idle_ttl)
+                    )
+                )
+            for _, name in candidates:
+                if total <= self.budget_bytes:
+                    break
+                with self._lock:
+                    self._entries.pop(name, None)
+                for path in self._related_paths(name):
+                    if path.is_dir():
+                        shutil.rmtree(path, ignore_errors=True)
+                    elif path.exists():
+                        path.unlink()
+                total -= sizes.get(name, 0)
+                freed += sizes.get(name, 0)
+                removed += 1
+
+        with self._lock:
+            self.collected += removed
+            self.collected_bytes += freed
+        return {"removed": removed, "freed_bytes": freed, "total_bytes": total}
+
+    def stats(self) -> Dict[str, Any]:
+        """存储统计信息"""
+        with self._lock:
+            names = list(self._entries)
+            referenced = sum(1 for entry in self._entries.values() if entry.refcount > 0)
+            data = {
+                "files": len(names),
+                "referenced_files": referenced,
+                "budget_bytes": self.budget_bytes,
+                "idle_ttl_seconds": self.idle_ttl,
+                "uploads": self.uploads,
+                "dedup_hits": self.dedup_hits,
+                "dedup_ratio": round(self.dedup_hits / self.uploads, 4) if self.uploads else None,
+                "analysis_hits": self.analysis_hits,
+                "collected": self.collected,
+                "collected_bytes": self.collected_bytes,
+            }
+        data["total_bytes"] = sum(
+            _path_bytes(p) for name in names for p in self._related_paths(name)
+        )
+        return data
+
+
+# 全局实例（按目录）
+_upload_stores: Dict[str, UploadStore] = {}
+_upload_stores_lock = threading.Lock()
+
+
+def get_upload_store(directory: Any) -> UploadStore:
+    """获取指定目录的上传文件存储单例"""
+    key = str(Path(directory).resolve())
+    with _upload_stores_lock:
+        store = _upload_stores.get(key)
+        if store is None:
+            store = _upload_stores[key] = UploadStore(Path(directory))
+        return store
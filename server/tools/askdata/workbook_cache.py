@@ -0,0 +1,226 @@
+"""
+已解析工作簿缓存
+按文件内容哈希缓存 pd.read_excel 的解析结果，供生成代码在多次执行间复用
+"""
+import functools
+import hashlib
+import os
+import re
+import threading
+import types
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from tools.askdata.file_access import note_file_read
+from tools.askdata.sidecar import read_sidecar
+
+# 缓存内存预算（MB），超出后按最近最少使用顺序淘汰
+CACHE_BUDGET_ENV = "WORKBOOK_CACHE_BUDGET_MB"
+DEFAULT_CACHE_BUDGET_MB = 512
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 内容寻址存储中的文件名：<内容哈希><后缀>（见 upload_store），写入后不再修改
+_CONTENT_ADDRESSED_NAME = re.compile(r"^([0-9a-f]{64})\.[^.]+$")
+
+
+def hash_file(path: str) -> str:
+    """分块计算文件内容哈希"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _frame_nbytes(value: Any) -> int:
+    """估算解析结果（DataFrame 或 {sheet: DataFrame}）占用的内存"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sum(_frame_nbytes(v) for v in value.values())
+    return 0
+
+
+def _copy_frames(value: Any) -> Any:
+    """返回副本，避免生成代码原地修改污染缓存"""
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, dict):
+        return {k: _copy_frames(v) for k, v in value.items()}
+    return value
+
+
+def _is_cacheable_arg(value: Any) -> bool:
+    """含可调用对象（如 converters、date_parser）的参数无法稳定生成缓存键"""
+    if callable(value):
+        return False
+    if isinstance(value, dict):
+        return all(_is_cacheable_arg(v) for v in value.values())
+    if isinstance(value, (list, tuple, set)):
+        return all(_is_cacheable_arg(v) for v in value)
+    return True
+
+
+class WorkbookCache:
+    """
+    工作簿解析结果缓存
+    缓存键为 (文件内容哈希, sheet_name, 读取参数)，按内存预算 LRU 淘汰
+    """
+
+    def __init__(self, budget_bytes: Optional[int] = None):
+        if budget_bytes is None:
+            budget_mb = float(os.getenv(CACHE_BUDGET_ENV, DEFAULT_CACHE_BUDGET_MB))
+            budget_bytes = int(budget_mb * 1024 * 1024)
+        self.budget_bytes = budget_bytes
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[Any, int]]" = OrderedDict()
+        self._total_bytes = 0
+        # 文件路径 -> (内容哈希, mtime_ns, size)，文件变化后重新计算哈希
+        self._path_digests: Dict[str, Tuple[str, int, int]] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.pandas_module = CachedPandasModule(self)
+
+    def digest_for(self, path: Any) -> str:
+        """
+        获取文件内容哈希，文件未变化时直接使用已记录的值
+        按内容哈希命名的上传文件首次遇到时直接取文件名中的哈希，不读取文件
+        （缓存属于各个代码执行进程，哈希在使用缓存的进程内得到，无需由上传接口登记）
+        """
+        key = str(path)
+        st = os.stat(key)
+        with self._lock:
+            known = self._path_digests.get(key)
+        if known and known[1] == st.st_mtime_ns and known[2] == st.st_size:
+            return known[0]
+        match = None if known else _CONTENT_ADDRESSED_NAME.match(Path(key).name)
+        digest = match.group(1) if match else hash_file(key)
+        with self._lock:
+            self._path_digests[key] = (digest, st.st_mtime_ns, st.st_size)
+        return digest
+
+    def read_excel(self, io: Any, sheet_name: Any = 0, **kwargs: Any) -> Any:
+        """
+        与 pd.read_excel 参数一致
+        io 为本地文件路径且参数可缓存时从缓存返回结果副本，否则直接调用 pd.read_excel
+        """
+        cacheable = (
+            isinstance(io, (str, Path))
+            and os.path.isfile(io)
+            and _is_cacheable_arg(sheet_name)
+            and _is_cacheable_arg(kwargs)
+        )
+        if not cacheable:
+            return pd.read_excel(io, sheet_name=sheet_name, **kwargs)
+
+        return self.get_or_load(
+            io,
+            sheet_name,
+            kwargs,
+            lambda: pd.read_excel(io, sheet_name=sheet_name, **kwargs),
+        )
+
+    def get_or_load(
+        self,
+        path: Any,
+        sheet_name: Any,
+        read_kwargs: Dict[str, Any],
+        loader: Callable[[], Any],
+        copy: bool = True,
+    ) -> Any:
+        """
+        按 (文件内容哈希, sheet_name, 读取参数) 查找缓存，未命中时调用 loader 加载并缓存
+        loader 可以从等价的数据源（如 Feather 副本）加载，只要结果与 read_excel 相同
+        """
+        key = (self.digest_for(path), repr(sheet_name), repr(sorted(read_kwargs.items())))
+        note_file_read(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _copy_frames(entry[0]) if copy else entry[0]
+            self.misses += 1
+
+        value = loader()
+        self._store(key, value)
+        return _copy_frames(value) if copy else value
+
+    def _store(self, key: Tuple[str, str, str], value: Any) -> None:
+        nbytes = _frame_nbytes(value)
+        if nbytes > self.budget_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self._total_bytes += nbytes
+            while self._total_bytes > self.budget_bytes and self._entries:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def _noting_reads(func: Callable[..., Any]) -> Callable[..., Any]:
+    """包装 pandas 的 read_* 函数，登记读取的文件（pyarrow 等读取不经过 Python open）"""
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        for value in args[:1] + tuple(kwargs.values()):
+            note_file_read(value)
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+class CachedPandasModule(types.ModuleType):
+    """
+    pandas 模块代理：read_excel 走工作簿缓存，read_feather 支持尚未就绪的列式副本，
+    其余 read_* 函数登记读取的文件后透传，其他属性直接透传给 pandas
+    """
+
+    def __init__(self, cache: WorkbookCache):
+        super().__init__(pd.__name__, pd.__doc__)
+        self.read_excel = cache.read_excel
+        self.read_feather = read_sidecar
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(pd, name)
+        if name.startswith("read_") and callable(value):
+            return _noting_reads(value)
+        return value
+
+
+# 全局实例
+_workbook_cache: Optional[WorkbookCache] = None
+
+
+def get_workbook_cache() -> WorkbookCache:
+    """获取工作簿缓存单例"""
+    global _workbook_cache
+    if _workbook_cache is None:
+        _workbook_cache = WorkbookCache()
+    return _workbook_cache
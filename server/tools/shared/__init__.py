@@ -0,0 +1,3 @@
+"""
+各工具共用的基础模块
+"""
@@ -0,0 +1,141 @@
+"""
+DashScope（OpenAI 兼容模式）异步客户端
+进程内共享同一个 AsyncOpenAI 客户端：复用 HTTP keep-alive 连接池，并限制并发请求数与超时；
+内容相同的进行中请求合并为一次上游调用
+"""
+import asyncio
+import os
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from tools.shared.single_flight import SingleFlight, canonical_hash
+
+DASHSCOPE_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+
+# 并发与超时配置（可通过环境变量覆盖）
+LLM_MAX_CONCURRENCY_ENV = "LLM_MAX_CONCURRENCY"
+LLM_MAX_CONNECTIONS_ENV = "LLM_MAX_CONNECTIONS"
+LLM_TIMEOUT_ENV = "LLM_TIMEOUT"
+LLM_MAX_RETRIES_ENV = "LLM_MAX_RETRIES"
+
+DEFAULT_LLM_MAX_CONCURRENCY = 16
+DEFAULT_LLM_MAX_CONNECTIONS = 32
+DEFAULT_LLM_TIMEOUT = 120.0
+DEFAULT_LLM_CONNECT_TIMEOUT = 10.0
+DEFAULT_LLM_MAX_RETRIES = 2
+# 空闲连接保持时间（秒）
+LLM_KEEPALIVE_EXPIRY = 60.0
+
+
+class LLMClient:
+    """共享的异步 LLM 客户端，首次使用时创建"""
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        max_connections: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+    ):
+        self.max_concurrency = max_concurrency or int(
+            os.getenv(LLM_MAX_CONCURRENCY_ENV, DEFAULT_LLM_MAX_CONCURRENCY)
+        )
+        self.max_connections = max_connections or int(
+            os.getenv(LLM_MAX_CONNECTIONS_ENV, DEFAULT_LLM_MAX_CONNECTIONS)
+        )
+        self.timeout = timeout or float(os.getenv(LLM_TIMEOUT_ENV, DEFAULT_LLM_TIMEOUT))
+        self.max_retries = (
+            max_retries
+            if max_retries is not None
+            else int(os.getenv(LLM_MAX_RETRIES_ENV, DEFAULT_LLM_MAX_RETRIES))
+        )
+        self._client: Optional[AsyncOpenAI] = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._single_flight = SingleFlight()
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """获取底层 AsyncOpenAI 客户端，未配置 API Key 时抛出 EnvironmentError"""
+        if self._client is None:
+            api_key = os.getenv("DASHSCOPE_API_KEY")
+            if not api_key:
+                raise EnvironmentError("DASHSCOPE_API_KEY 未配置，无法调用模型接口")
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=DEFAULT_LLM_CONNECT_TIMEOUT),
+            )
+            self._client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=DASHSCOPE_BASE_URL,
+                http_client=http_client,
+                max_retries=self.max_retries,
+                timeout=self.timeout,
+            )
+        return self._client
+
+    async def chat_completion(self, coalesce: bool = True, **kwargs: Any) -> Any:
+        """
+        调用 chat.completions.create，超出并发上限时排队等待
+        coalesce 为 True 时参数完全相同的进行中请求共享同一次上游调用与同一结果对象（调用方不应修改）
+        """
+        client = self.client
+
+        async def call() -> Any:
+            async with self._semaphore:
+                return await client.chat.completions.create(**kwargs)
+
+        if not coalesce:
+            return await call()
+        return await self._single_flight.do(canonical_hash(kwargs), call)
+
+    async def stream_chat_completion(self, **kwargs: Any) -> AsyncIterator[Any]:
+        """
+        流式调用 chat.completions.create，逐块产出 ChatCompletionChunk
+        整个流式过程占用一个并发名额，迭代结束或中途关闭时释放并关闭底层连接
+        """
+        client = self.client
+        async with self._semaphore:
+            stream = await client.chat.completions.create(stream=True, **kwargs)
+            try:
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await stream.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """并发与请求合并统计"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "available_slots": self._semaphore._value,
+            "single_flight": self._single_flight.stats(),
+        }
+
+    async def aclose(self) -> None:
+        """关闭连接池（服务关闭时调用）"""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+# 全局实例
+_llm_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    """获取共享 LLM 客户端单例"""
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = LLMClient()
+    return _llm_client
+
+
+async def close_llm_client() -> None:
+    """关闭共享 LLM 客户端"""
+    if _llm_client is not None:
+        await _llm_client.aclose()
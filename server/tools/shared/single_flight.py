@@ -0,0 +1,81 @@
+"""
+相同请求合并（single-flight）
+同一时刻内容完全相同的请求只执行一次，所有等待者共享同一结果（或同一异常）
+"""
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict
+
+
+def canonical_hash(payload: Any) -> str:
+    """请求内容的规范化哈希（键顺序无关）"""
+    canonical = json.dumps(
+        payload,
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    进行中请求的合并器（仅在同一事件循环内使用）
+    实际调用在独立任务中执行：个别等待者取消不影响其他等待者，全部取消时才取消实际调用
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.requests = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """key 相同的进行中调用只执行一次 fn，返回共享结果"""
+        self.requests += 1
+        call = self._calls.get(key)
+        if call is None:
+            self.executions += 1
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._finish(key, task))
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _finish(self, key: str, task: "asyncio.Task[Any]") -> None:
+        call = self._calls.get(key)
+        if call is not None and call.task is task:
+            del self._calls[key]
+        # 等待者已全部离开时避免“异常未被读取”的警告
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """合并统计：coalescing_ratio 为被合并（未发起实际调用）的请求占比"""
+        return {
+            "requests": self.requests,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "coalescing_ratio": (
+                round(self.coalesced / self.requests, 4) if self.requests else None
+            ),
+            "in_flight": len(self._calls),
+        }
@@ -0,0 +1,50 @@
+"""
+Server-Sent Events 通用功能
+"""
+import json
+from typing import Any, AsyncIterator, Dict, TypeVar
+
+from fastapi.responses import StreamingResponse
+
+T = TypeVar("T")
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",  # 禁用 Nginx 缓冲
+}
+
+
+def sse_event(data: Dict[str, Any]) -> str:
+    """SSE 格式: "data: {json}\\n\\n" """
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+async def prime_stream(stream: AsyncIterator[T]) -> AsyncIterator[T]:
+    """
+    预先取出流的首个元素，使上游错误（如认证失败）在返回响应前抛出，从而仍以 HTTP 状态码返回
+    返回包含首个元素的完整迭代器；迭代结束或客户端断开时关闭原始流（释放上游连接）
+    """
+    try:
+        first = await stream.__anext__()
+        exhausted = False
+    except StopAsyncIteration:
+        first, exhausted = None, True
+    except BaseException:
+        await stream.aclose()
+        raise
+
+    async def chained() -> AsyncIterator[T]:
+        try:
+            if not exhausted:
+                yield first
+                async for item in stream:
+                    yield item
+        finally:
+            await stream.aclose()
+
+    return chained()
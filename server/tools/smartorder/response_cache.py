@@ -0,0 +1,145 @@
+"""
+智能点单推荐结果缓存
+点单终端高峰期会发送大量完全相同的提示词（相同菜单、相同偏好），结果可确定时直接返回缓存
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# 缓存条目数、内存预算（MB）与有效期（秒）
+CACHE_SIZE_ENV = "SMARTORDER_CACHE_SIZE"
+CACHE_BUDGET_ENV = "SMARTORDER_CACHE_BUDGET_MB"
+CACHE_TTL_ENV = "SMARTORDER_CACHE_TTL"
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_CACHE_BUDGET_MB = 32
+DEFAULT_CACHE_TTL = 300.0
+
+
+def is_deterministic(parameters: Dict[str, Any]) -> bool:
+    """
+    temperature 为 0 时结果可复现，才允许缓存
+    seed 不在 OpenAI 兼容模式转发的参数中，不会发送给模型，不能作为可复现的依据
+    """
+    temperature = parameters.get("temperature")
+    try:
+        return temperature is not None and float(temperature) == 0
+    except (TypeError, ValueError):
+        return False
+
+
+def make_key(
+    model: str,
+    messages: List[Dict[str, Any]],
+    openai_params: Dict[str, Any],
+) -> str:
+    """按 model、messages 与过滤后的参数（即实际发送给模型的内容）计算规范化哈希（键顺序无关）"""
+    canonical = json.dumps(
+        {"model": model, "messages": messages, "params": openai_params},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    推荐结果缓存
+    缓存 (完整内容, finish_reason)，按 TTL、条目数与内存预算 LRU 淘汰
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        budget_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ):
+        self.max_entries = max_entries or int(os.getenv(CACHE_SIZE_ENV, DEFAULT_CACHE_SIZE))
+        if budget_bytes is None:
+            budget_mb = float(os.getenv(CACHE_BUDGET_ENV, DEFAULT_CACHE_BUDGET_MB))
+            budget_bytes = int(budget_mb * 1024 * 1024)
+        self.budget_bytes = budget_bytes
+        self.ttl = ttl or float(os.getenv(CACHE_TTL_ENV, DEFAULT_CACHE_TTL))
+        # key -> (写入时间, 内容, finish_reason, 字节数)
+        self._entries: "OrderedDict[str, Tuple[float, str, Any, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Tuple[str, Any]]:
+        """返回 (内容, finish_reason)，未命中或已过期时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                self._remove(key)
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key: str, content: str, finish_reason: Any = None) -> None:
+        """空内容与被截断（finish_reason=length）的结果不缓存"""
+        if not content or finish_reason == "length":
+            return
+        nbytes = len(content.encode("utf-8"))
+        if nbytes > self.budget_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic(), content, finish_reason, nbytes)
+            self._total_bytes += nbytes
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._total_bytes > self.budget_bytes
+            ):
+                _, (_, _, _, evicted_bytes) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[3]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._total_bytes,
+                "budget_bytes": self.budget_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+                "evictions": self.evictions,
+            }
+
+
+# 全局实例
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """获取推荐结果缓存单例"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
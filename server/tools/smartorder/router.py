@@ -3,25 +3,131 @@
 代理DashScope API请求
 """
 import os
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from openai import OpenAI
+
+from tools.shared.llm_client import get_llm_client
+from tools.smartorder.response_cache import get_response_cache, is_deterministic, make_key
+from tools.shared.sse import prime_stream, sse_event, sse_response
 
 # 创建工具路由
 router = APIRouter(prefix="/api")
 
+# 过滤掉 OpenAI 兼容模式不支持的参数
+# DashScope 特有参数：result_format, top_k, seed, repetition_penalty, think_content
+# 只保留 OpenAI 兼容的参数
+SUPPORTED_PARAMS = ['temperature', 'top_p', 'max_tokens', 'stream', 'stop', 'presence_penalty', 'frequency_penalty']
+
 
 class RecommendRequest(BaseModel):
     model: str
     input: Dict[str, Any]
     parameters: Dict[str, Any]
+    # 为 false 时跳过结果缓存（强制请求模型）
+    use_cache: bool = True
+
+
+def _normalize_content(content: Any) -> str:
+    """处理content可能是字符串或None的情况"""
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content.strip()
+    # 如果content是其他类型（如数组），转换为字符串
+    return str(content)
+
+
+def _build_output(content: str, finish_reason: Any = None) -> Dict[str, Any]:
+    """构建响应格式（与DashScope兼容）"""
+    choice: Dict[str, Any] = {"message": {"content": content}}
+    if finish_reason is not None:
+        choice["finish_reason"] = finish_reason
+    return {"output": {"choices": [choice]}}
+
+
+def _to_http_exception(exc: Exception) -> HTTPException:
+    error_msg = str(exc)
+    if "API key" in error_msg or "401" in error_msg or "authentication" in error_msg.lower():
+        return HTTPException(
+            status_code=401,
+            detail="API Key 认证失败，请检查 DASHSCOPE_API_KEY 配置是否正确"
+        )
+    return HTTPException(
+        status_code=500,
+        detail=f"推荐服务出错: {error_msg}"
+    )
+
+
+def _stream_cached(content: str, finish_reason: Any) -> StreamingResponse:
+    """缓存命中时以与流式代理相同的事件格式一次性返回"""
+    async def event_generator() -> AsyncIterator[str]:
+        yield sse_event({"type": "delta", "content": content})
+        yield sse_event({"type": "done", **_build_output(content, finish_reason)})
+
+    return sse_response(event_generator())
+
+
+async def _stream_recommendation(
+    model: str,
+    messages: List[Dict[str, Any]],
+    openai_params: Dict[str, Any],
+    cache_key: Optional[str] = None,
+) -> StreamingResponse:
+    """
+    流式代理：逐块转发模型增量内容
+    - {"type": "delta", "content": "..."}：增量文本
+    - {"type": "done", "output": {"choices": [{"message": {"content": 全文}}]}}：结束事件，与非流式响应格式一致
+    - {"type": "error", "error": "..."}：流式过程中出错
+    """
+    # 先取得首个分块，认证失败等错误仍以 HTTP 状态码返回
+    try:
+        chunks = await prime_stream(
+            get_llm_client().stream_chat_completion(
+                model=model,
+                messages=messages,
+                **openai_params
+            )
+        )
+    except Exception as exc:
+        raise _to_http_exception(exc) from exc
+
+    async def event_generator() -> AsyncIterator[str]:
+        parts: List[str] = []
+        finish_reason = None
+        try:
+            async for chunk in chunks:
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+                delta = choice.delta.content if choice.delta else None
+                if delta:
+                    parts.append(delta)
+                    yield sse_event({"type": "delta", "content": delta})
+
+            content = _normalize_content("".join(parts))
+            if cache_key is not None:
+                get_response_cache().put(cache_key, content, finish_reason)
+            yield sse_event({"type": "done", **_build_output(content, finish_reason)})
+        except Exception as exc:
+            yield sse_event({"type": "error", "error": str(exc)})
+        finally:
+            await chunks.aclose()
+
+    return sse_response(event_generator())
 
 
 @router.post("/smartorder/recommend")
 async def recommend(payload: RecommendRequest):
-    """代理DashScope API请求"""
+    """
+    代理DashScope API请求
+    parameters.stream 为 true 时以 SSE 流式返回增量内容，最后一个事件携带与非流式一致的完整响应
+    temperature 为 0 时结果按请求内容缓存，use_cache=false 可跳过缓存
+    """
     api_key = os.getenv("DASHSCOPE_API_KEY")
     if not api_key:
         raise HTTPException(
@@ -29,26 +135,28 @@ async def recommend(payload: RecommendRequest):
             detail="Missing DASHSCOPE_API_KEY in server environment"
         )
 
-    try:
-        client = OpenAI(
-            api_key=api_key,
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-        )
+    # 构建请求
+    messages = payload.input.get("messages", [])
+    openai_params = {
+        key: value
+        for key, value in payload.parameters.items()
+        if key in SUPPORTED_PARAMS
+    }
+    stream = bool(openai_params.pop("stream", False))
+
+    cache_key = None
+    if payload.use_cache and is_deterministic(payload.parameters):
+        cache_key = make_key(payload.model, messages, openai_params)
+        cached = get_response_cache().get(cache_key)
+        if cached is not None:
+            content, finish_reason = cached
+            return _stream_cached(content, finish_reason) if stream else _build_output(content)
+
+    if stream:
+        return await _stream_recommendation(payload.model, messages, openai_params, cache_key)
 
-        # 构建请求
-        messages = payload.input.get("messages", [])
-        
-        # 过滤掉 OpenAI 兼容模式不支持的参数
-        # DashScope 特有参数：result_format, top_k, seed, repetition_penalty, think_content
-        # 只保留 OpenAI 兼容的参数
-        openai_params = {}
-        supported_params = ['temperature', 'top_p', 'max_tokens', 'stream', 'stop', 'presence_penalty', 'frequency_penalty']
-        
-        for key, value in payload.parameters.items():
-            if key in supported_params:
-                openai_params[key] = value
-        
-        completion = client.chat.completions.create(
+    try:
+        completion = await get_llm_client().chat_completion(
             model=payload.model,
             messages=messages,
             **openai_params
@@ -60,45 +168,19 @@ async def recommend(payload: RecommendRequest):
                 detail="模型未返回任何结果"
             )
 
-        message = completion.choices[0].message
-        content = message.content
-
-        # 处理content可能是字符串或None的情况
-        if content is None:
-            content = ""
-        elif isinstance(content, str):
-            content = content.strip()
-        else:
-            # 如果content是其他类型（如数组），转换为字符串
-            content = str(content)
-
-        # 构建响应格式（与DashScope兼容）
-        return {
-            "output": {
-                "choices": [
-                    {
-                        "message": {
-                            "content": content
-                        }
-                    }
-                ]
-            }
-        }
+        choice = completion.choices[0]
+        content = _normalize_content(choice.message.content)
+        if cache_key is not None:
+            get_response_cache().put(cache_key, content, choice.finish_reason)
+        return _build_output(content)
 
+    except HTTPException:
+        raise
     except Exception as exc:
-        error_msg = str(exc)
-        if "API key" in error_msg or "401" in error_msg or "authentication" in error_msg.lower():
-            raise HTTPException(
-                status_code=401,
-                detail="API Key 认证失败，请检查 DASHSCOPE_API_KEY 配置是否正确"
-            ) from exc
-        raise HTTPException(
-            status_code=500,
-            detail=f"推荐服务出错: {error_msg}"
-        ) from exc
-
-
-
-
+        raise _to_http_exception(exc) from exc
 
 
+@router.get("/smartorder/cache/stats")
+async def cache_stats():
+    """推荐结果缓存命中统计"""
+    return get_response_cache().stats()
@@ -343,10 +343,19 @@ def prepare_section_node(state: WorkflowState) -> WorkflowState:
         step_start_time = time.time()
         report_progress(4, 6, "🔍 并行检索（知识库 + 联网）...")
         print(f"\n⏱️  [步骤4开始] 并行检索（知识库 + 联网）- {time.strftime('%H:%M:%S')}")
-        for query in search_queries:
+        # 所有查询一次批量嵌入并检索知识库；批量检索失败时逐条检索，单个查询失败不影响其他查询
+        try:
+            kb_results_per_query = main_kb.search_many(search_queries, k=5)  # 多取一些以便过滤
+        except Exception as e:
+            print(f"  知识库批量检索失败，改为逐条检索: {e}")
+            kb_results_per_query = None
+        for query_index, query in enumerate(search_queries):
             # 检索知识库（取前3结果，过滤已入库的）
             try:
-                kb_results = main_kb.search(query, k=5)  # 多取一些以便过滤
+                if kb_results_per_query is None:
+                    kb_results = main_kb.search(query, k=5)
+                else:
+                    kb_results = kb_results_per_query[query_index]
                 kb_filtered = []
                 for result in kb_results:
                     result_id = get_result_id(result)
@@ -612,10 +621,19 @@ def collect_info_node(state: WorkflowState) -> WorkflowState:
     step_start_time = time.time()
     report_progress(2, 4, "🔍 补充检索（知识库 + 联网）...")
     print(f"\n⏱️  [步骤5开始] 并行检索（知识库 + 联网）- {time.strftime('%H:%M:%S')}")
-    for query in additional_queries:
+    # 所有查询一次批量嵌入并检索知识库；批量检索失败时逐条检索，单个查询失败不影响其他查询
+    try:
+        kb_results_per_query = main_kb.search_many(additional_queries, k=5)  # 多取一些以便过滤
+    except Exception as e:
+        print(f"  知识库批量检索失败，改为逐条检索: {e}")
+        kb_results_per_query = None
+    for query_index, query in enumerate(additional_queries):
         # 检索知识库（取前3结果，过滤已入库的）
         try:
-            kb_results = main_kb.search(query, k=5)  # 多取一些以便过滤
+            if kb_results_per_query is None:
+                kb_results = main_kb.search(query, k=5)
+            else:
+                kb_results = kb_results_per_query[query_index]
             kb_filtered = []
             for result in kb_results:
                 result_id = get_result_id(result)
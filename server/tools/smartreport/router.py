@@ -1,6 +1,7 @@
 """
 智能报告工具路由
 """
+import asyncio
 import json
 import shutil
 from pathlib import Path
@@ -11,7 +12,11 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from .api import get_deep_research_api, WorkflowError
-from .services.knowledge_base import get_knowledge_base_manager, DOCUMENTS_DIR
+from .services.knowledge_base import (
+    get_knowledge_base_manager,
+    DOCUMENTS_DIR,
+    embedding_cache_stats as get_embedding_cache_stats,
+)
 from .services.web_search import get_web_search_manager
 
 # 创建工具路由
@@ -354,11 +359,14 @@ class InitializeKnowledgeBaseRequest(BaseModel):
 async def initialize_knowledge_base(payload: InitializeKnowledgeBaseRequest):
     """
     初始化知识库（从 documents 目录加载文档）
+    默认增量构建：只向量化新增或变化的文件，并删除已删除或已变化文件的旧向量
     """
     try:
         kb_manager = get_knowledge_base_manager()
-        docs_loaded, chunks_loaded, errors, stats = kb_manager.initialize_from_documents_dir(
-            force_rebuild=payload.force_rebuild
+        # 文档解析与向量化耗时较长，在线程中执行以免阻塞事件循环
+        docs_loaded, chunks_loaded, errors, stats = await asyncio.to_thread(
+            kb_manager.initialize_from_documents_dir,
+            force_rebuild=payload.force_rebuild,
         )
         
         return {
@@ -366,12 +374,27 @@ async def initialize_knowledge_base(payload: InitializeKnowledgeBaseRequest):
             "documents_loaded": docs_loaded,
             "chunks_loaded": chunks_loaded,
             "documents_dir": str(DOCUMENTS_DIR),
+            "added": stats.get("added", []),
+            "updated": stats.get("updated", []),
+            "removed": stats.get("removed", []),
+            "skipped": stats.get("skipped", []),
+            "chunks_removed": stats.get("chunks_removed", 0),
+            "file_timings": stats.get("file_timings", {}),
+            "elapsed_ms": stats.get("elapsed_ms"),
             "errors": errors if errors else None,
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"初始化知识库失败: {str(e)}")
 
 
+@router.get("/smartreport/knowledge-base/embedding-cache/stats")
+async def embedding_cache_stats():
+    """
+    嵌入向量缓存统计：片段向量磁盘缓存与查询向量 LRU 缓存的条目数与命中率
+    """
+    return get_embedding_cache_stats()
+
+
 class GeneratePDFRequest(BaseModel):
     content: str  # Markdown 内容
     title: str = "报告"  # 报告标题
@@ -2,9 +2,13 @@
 知识库管理模块
 使用 LangChain + FAISS 实现文档向量化、存储与检索
 """
+import multiprocessing
 import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import Callable, Iterator, List, Dict, Any, Optional, Tuple
 from uuid import uuid4
 
 from langchain_community.document_loaders import (
@@ -18,15 +22,29 @@ try:
     from langchain_dashscope import DashScopeEmbeddings
 except ImportError:
     from langchain_community.embeddings import DashScopeEmbeddings
+try:
+    from langchain_community.embeddings.dashscope import embed_with_retry as dashscope_embed_with_retry
+except ImportError:
+    dashscope_embed_with_retry = None
 from langchain_community.vectorstores import FAISS
 try:
     from langchain_text_splitters import RecursiveCharacterTextSplitter
 except ImportError:
     from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+import faiss
+import numpy as np
 import tempfile
 from pathlib import Path
 
+from .embedding_cache import (
+    CachedEmbeddings,
+    embed_queries,
+    get_embedding_store,
+    get_query_cache,
+)
+from .manifest import DocumentManifest
+
 # 上传目录配置
 # 优先使用环境变量指定的持久化路径，否则使用临时目录
 STORAGE_BASE = os.getenv("STORAGE_PATH", tempfile.gettempdir())
@@ -52,6 +70,30 @@ KNOWLEDGE_BASE_DIR.mkdir(parents=True, exist_ok=True)
 # 向量存储目录（使用持久化路径）
 VECTOR_STORE_DIR = UPLOAD_DIR / "smartreport" / "vector_store"
 VECTOR_STORE_DIR.mkdir(parents=True, exist_ok=True)
+FAISS_INDEX_DIR = VECTOR_STORE_DIR / "faiss_index"
+# 已入库文件清单（增量构建用）
+MANIFEST_FILE = VECTOR_STORE_DIR / "manifest.json"
+
+# 片段向量磁盘缓存目录；设置 KB_EMBEDDING_CACHE=0 时关闭
+EMBEDDING_CACHE_DIR = UPLOAD_DIR / "smartreport" / "embedding_cache"
+EMBEDDING_CACHE_ENV = "KB_EMBEDDING_CACHE"
+# 查询向量 LRU 缓存条目上限；设为 0 时关闭
+QUERY_CACHE_SIZE_ENV = "KB_QUERY_CACHE_SIZE"
+DEFAULT_QUERY_CACHE_SIZE = 1024
+
+EMBEDDING_MODEL = "text-embedding-v1"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# 支持的文件扩展名
+SUPPORTED_EXTENSIONS = {".txt", ".md", ".pdf", ".docx", ".csv"}
+
+# 文档加载进程数（0 表示 min(4, CPU 数)）与每批向量化的片段数
+LOAD_WORKERS_ENV = "KB_LOAD_WORKERS"
+DEFAULT_LOAD_WORKERS = 4
+EMBED_BATCH_CHUNKS = 100
+# DashScope 文本向量接口单次请求的文本条数上限（未列出的模型按 10 条）
+EMBED_API_BATCH_SIZES = {"text-embedding-v1": 25, "text-embedding-v2": 25}
+DEFAULT_EMBED_API_BATCH_SIZE = 10
 
 
 class KnowledgeBaseError(Exception):
@@ -59,6 +101,168 @@ class KnowledgeBaseError(Exception):
     pass
 
 
+def create_embeddings(api_key: str, model: str = EMBEDDING_MODEL):
+    """
+    创建 DashScope 嵌入模型，默认外加片段向量磁盘缓存与查询向量 LRU 缓存（主知识库与临时知识库共用），
+    并支持多条查询批量嵌入
+    """
+    embeddings = DashScopeEmbeddings(model=model, dashscope_api_key=api_key)
+    store = None
+    if os.getenv(EMBEDDING_CACHE_ENV, "1") != "0":
+        store = get_embedding_store(EMBEDDING_CACHE_DIR, model)
+    query_cache = None
+    if _query_cache_size() > 0:
+        query_cache = get_query_cache(model, _query_cache_size())
+    return CachedEmbeddings(embeddings, store, query_cache, _query_batch_embedder(embeddings, api_key))
+
+
+def _query_batch_embedder(embeddings, api_key: str) -> Optional[Callable[[List[str]], List[List[float]]]]:
+    """
+    多条查询一次请求嵌入（text_type=query，与 embed_query 结果一致）
+    - langchain_community 的实现：embed_with_retry 按接口上限自动分批并重试
+    - langchain_dashscope 等以 dashscope.TextEmbedding 为 client 的实现：按接口上限分批直接调用
+    两者都不适用时返回 None，由调用方逐条嵌入
+    """
+    if dashscope_embed_with_retry is not None and type(embeddings).__module__.startswith("langchain_community"):
+        def embed_with_retry(texts: List[str]) -> List[List[float]]:
+            result = dashscope_embed_with_retry(
+                embeddings, input=texts, text_type="query", model=embeddings.model
+            )
+            return [item["embedding"] for item in result]
+        
+        return embed_with_retry
+    
+    client = getattr(embeddings, "client", None)
+    if client is None or not callable(getattr(client, "call", None)):
+        print(f"⚠️  [Embedding] {type(embeddings).__name__} 不支持批量嵌入，多条查询将逐条请求")
+        return None
+    
+    model = embeddings.model
+    batch_size = EMBED_API_BATCH_SIZES.get(model, DEFAULT_EMBED_API_BATCH_SIZE)
+    
+    def embed(texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            response = client.call(model=model, input=batch, text_type="query", api_key=api_key)
+            if response.status_code != 200:
+                raise KnowledgeBaseError(
+                    f"批量嵌入失败: request_id={response.request_id}, "
+                    f"code={response.code}, message={response.message}"
+                )
+            items = sorted(response.output["embeddings"], key=lambda item: item["text_index"])
+            vectors.extend(item["embedding"] for item in items)
+        return vectors
+    
+    return embed
+
+
+def _query_cache_size() -> int:
+    return int(os.getenv(QUERY_CACHE_SIZE_ENV, DEFAULT_QUERY_CACHE_SIZE))
+
+
+def embedding_cache_stats(model: str = EMBEDDING_MODEL) -> Dict[str, Any]:
+    """片段向量磁盘缓存与查询向量缓存统计"""
+    return {
+        "chunks": get_embedding_store(EMBEDDING_CACHE_DIR, model).stats(),
+        "queries": get_query_cache(model, max(_query_cache_size(), 0)).stats(),
+    }
+
+
+def get_loader(file_path: Path):
+    """根据文件类型获取对应的文档加载器"""
+    suffix = file_path.suffix.lower()
+    
+    loader_map = {
+        ".txt": TextLoader,
+        ".md": UnstructuredMarkdownLoader if hasattr(UnstructuredMarkdownLoader, '__call__') else TextLoader,
+        ".pdf": PyPDFLoader,
+        ".docx": Docx2txtLoader if Docx2txtLoader else None,
+        ".csv": CSVLoader,
+    }
+    
+    loader_class = loader_map.get(suffix)
+    if not loader_class:
+        raise KnowledgeBaseError(f"不支持的文件类型: {suffix}")
+    
+    return loader_class(str(file_path))
+
+
+def load_document_file(file_path: Path) -> List[Document]:
+    """加载单个文件并添加来源元数据，内容为空时抛出 KnowledgeBaseError"""
+    docs = get_loader(file_path).load()
+    if not docs:
+        raise KnowledgeBaseError(f"文档内容为空: {file_path.name}")
+    for doc in docs:
+        doc.metadata.update({
+            "source": str(file_path),
+            "filename": file_path.name,
+        })
+    return docs
+
+
+def split_documents(documents: List[Document]) -> List[Document]:
+    """文本分割"""
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len,
+    )
+    return text_splitter.split_documents(documents)
+
+
+def _load_file_task(file_path: str, split: bool) -> Tuple[List[Document], Dict[str, float]]:
+    """加载（并分割）单个文件，返回 (文档列表, 各阶段耗时)；在加载进程中运行"""
+    start = time.perf_counter()
+    docs = load_document_file(Path(file_path))
+    timings = {"parse_ms": round((time.perf_counter() - start) * 1000, 1)}
+    if split:
+        start = time.perf_counter()
+        docs = split_documents(docs)
+        timings["split_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return docs, timings
+
+
+def resolve_load_workers(file_count: int) -> int:
+    """加载进程数：环境变量 KB_LOAD_WORKERS（默认 min(4, CPU 数)），不超过文件数"""
+    workers = int(os.getenv(LOAD_WORKERS_ENV, 0)) or min(DEFAULT_LOAD_WORKERS, os.cpu_count() or 1)
+    return max(1, min(workers, file_count))
+
+
+def iter_load_files(
+    file_paths: List[Path], split: bool = True
+) -> Iterator[Tuple[Path, Optional[List[Document]], Optional[Exception], Dict[str, float]]]:
+    """
+    并行加载（并分割）文件，按完成顺序逐个产出 (文件路径, 文档列表, 异常, 各阶段耗时)
+    调用方可边接收边向量化，解析与向量化流水线进行；只有一个加载进程时在当前进程中顺序加载
+    """
+    workers = resolve_load_workers(len(file_paths))
+    if workers <= 1:
+        for file_path in file_paths:
+            try:
+                docs, timings = _load_file_task(str(file_path), split)
+            except Exception as e:
+                yield file_path, None, e, {}
+                continue
+            yield file_path, docs, None, timings
+        return
+    
+    # 服务进程含多个线程，使用 spawn 避免 fork 复制锁状态
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = {pool.submit(_load_file_task, str(path), split): path for path in file_paths}
+        for future in as_completed(futures):
+            try:
+                docs, timings = future.result()
+            except Exception as e:
+                yield futures[future], None, e, {}
+                continue
+            yield futures[future], docs, None, timings
+    finally:
+        # 调用方提前结束（如向量化失败）时不再等待尚未开始的文件
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
 class KnowledgeBaseManager:
     """知识库管理器 - 使用 LangChain + FAISS"""
     
@@ -66,6 +270,8 @@ class KnowledgeBaseManager:
         """初始化知识库管理器"""
         self.embeddings = None
         self.vector_store = None
+        # 初始化在线程中执行时，与检索互斥地修改 FAISS 索引
+        self._index_lock = threading.RLock()
         self._init_embeddings()
         self._load_or_create_vector_store()
     
@@ -75,14 +281,11 @@ class KnowledgeBaseManager:
         if not api_key:
             raise KnowledgeBaseError("DASHSCOPE_API_KEY 未配置")
         
-        self.embeddings = DashScopeEmbeddings(
-            model="text-embedding-v1",
-            dashscope_api_key=api_key,
-        )
+        self.embeddings = create_embeddings(api_key)
     
     def _load_or_create_vector_store(self):
         """加载或创建向量存储"""
-        vector_store_path = VECTOR_STORE_DIR / "faiss_index"
+        vector_store_path = FAISS_INDEX_DIR
         
         if vector_store_path.exists():
             try:
@@ -102,29 +305,23 @@ class KnowledgeBaseManager:
     def _save_vector_store(self):
         """保存向量存储"""
         if self.vector_store:
-            vector_store_path = VECTOR_STORE_DIR / "faiss_index"
+            vector_store_path = FAISS_INDEX_DIR
             self.vector_store.save_local(str(vector_store_path))
             print(f"向量存储已保存: {vector_store_path}")
     
     def _get_loader(self, file_path: Path):
         """根据文件类型获取对应的文档加载器"""
-        suffix = file_path.suffix.lower()
-        
-        loader_map = {
-            ".txt": TextLoader,
-            ".md": UnstructuredMarkdownLoader if hasattr(UnstructuredMarkdownLoader, '__call__') else TextLoader,
-            ".pdf": PyPDFLoader,
-            ".docx": Docx2txtLoader if Docx2txtLoader else None,
-            ".csv": CSVLoader,
-        }
-        
-        loader_class = loader_map.get(suffix)
-        if not loader_class:
-            raise KnowledgeBaseError(f"不支持的文件类型: {suffix}")
-        
-        return loader_class(str(file_path))
+        return get_loader(file_path)
+    
+    def load_file(self, file_path: Path) -> List[Document]:
+        """加载单个文件并添加来源元数据，内容为空时抛出 KnowledgeBaseError"""
+        return load_document_file(file_path)
+    
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """文本分割"""
+        return split_documents(documents)
     
-    def load_documents_from_directory(self, directory: Path) -> Tuple[List[Document], List[str], Dict[str, int]]:
+    def load_documents_from_directory(self, directory: Path) -> Tuple[List[Document], List[str], Dict[str, Any]]:
         """
         从目录加载所有文档
         
@@ -140,7 +337,8 @@ class KnowledgeBaseManager:
             "total_files": 0,
             "loaded_files": 0,
             "total_chunks": 0,
-            "file_chunks": {}  # 文件名 -> 片段数
+            "file_chunks": {},  # 文件名 -> 片段数
+            "file_timings": {},  # 文件名 -> 各阶段耗时（毫秒）
         }
         
         if not directory.exists():
@@ -149,47 +347,31 @@ class KnowledgeBaseManager:
             errors.append(error_msg)
             return documents, errors, stats
         
-        # 支持的文件扩展名
-        supported_extensions = {".txt", ".md", ".pdf", ".docx", ".csv"}
-        
         # 遍历目录中的所有文件
+        file_paths = []
         for file_path in directory.iterdir():
             if file_path.is_file():
                 stats["total_files"] += 1
                 file_ext = file_path.suffix.lower()
                 
-                if file_ext not in supported_extensions:
+                if file_ext not in SUPPORTED_EXTENSIONS:
                     print(f"跳过不支持的文件类型: {file_path.name} ({file_ext})")
                     continue
-                
-                try:
-                    loader = self._get_loader(file_path)
-                    docs = loader.load()
-                    
-                    if not docs:
-                        error_msg = f"文档内容为空: {file_path.name}"
-                        print(error_msg)
-                        errors.append(error_msg)
-                        continue
-                    
-                    # 添加元数据
-                    for doc in docs:
-                        doc.metadata.update({
-                            "source": str(file_path),
-                            "filename": file_path.name,
-                        })
-                    
-                    documents.extend(docs)
-                    stats["loaded_files"] += 1
-                    stats["total_chunks"] += len(docs)
-                    stats["file_chunks"][file_path.name] = len(docs)
-                    print(f"✅ 已加载文档: {file_path.name} ({len(docs)} 个片段)")
-                except Exception as e:
-                    error_msg = f"加载文档失败 {file_path.name}: {str(e)}"
-                    print(error_msg)
-                    errors.append(error_msg)
-                    import traceback
-                    print(traceback.format_exc())
+                file_paths.append(file_path)
+        
+        # 多个文件由加载进程并行解析
+        for file_path, docs, error, timings in iter_load_files(file_paths, split=False):
+            if error is not None:
+                error_msg = f"加载文档失败 {file_path.name}: {str(error)}"
+                print(error_msg)
+                errors.append(error_msg)
+                continue
+            documents.extend(docs)
+            stats["loaded_files"] += 1
+            stats["total_chunks"] += len(docs)
+            stats["file_chunks"][file_path.name] = len(docs)
+            stats["file_timings"][file_path.name] = timings
+            print(f"✅ 已加载文档: {file_path.name} ({len(docs)} 个片段, 解析 {timings['parse_ms']:.0f} ms)")
         
         print(f"文档加载统计: 总计 {stats['total_files']} 个文件, 成功加载 {stats['loaded_files']} 个文件 ({stats['total_chunks']} 个片段), 失败 {len(errors)} 个")
         return documents, errors, stats
@@ -205,13 +387,7 @@ class KnowledgeBaseManager:
         if not documents:
             raise KnowledgeBaseError("文档列表为空")
         
-        # 文本分割
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-        )
-        splits = text_splitter.split_documents(documents)
+        splits = self.split_documents(documents)
         
         print(f"文档已分割为 {len(splits)} 个片段")
         
@@ -224,18 +400,100 @@ class KnowledgeBaseManager:
             self.vector_store.add_documents(splits)
             print(f"已添加 {len(splits)} 个片段到现有向量存储")
         
-        # 保存向量存储
+        # 保存向量存储；片段不再与文件清单对应，删除清单使下次增量构建时从 docstore 重新推断
         self._save_vector_store()
+        MANIFEST_FILE.unlink(missing_ok=True)
     
-    def initialize_from_documents_dir(self, force_rebuild: bool = False) -> Tuple[int, int, List[str], Dict[str, int]]:
+    def _manifest_settings(self) -> Dict[str, Any]:
+        return {
+            "embedding_model": EMBEDDING_MODEL,
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+        }
+    
+    def _load_manifest(self) -> DocumentManifest:
+        """
+        读取文件清单
+        向量存储不存在时清单作废；旧版向量存储没有清单时从 docstore 推断各文件的片段
         """
-        从 documents 目录初始化知识库
+        settings = self._manifest_settings()
+        if self.vector_store is None:
+            return DocumentManifest(MANIFEST_FILE, settings)
+        manifest = DocumentManifest.load(MANIFEST_FILE, settings)
+        if manifest is not None:
+            return manifest
+        if MANIFEST_FILE.exists():
+            # 清单损坏或嵌入模型/分割参数已变化，已有向量不再可用
+            print("文件清单与当前参数不一致，将重建向量存储")
+            self.clear()
+            return DocumentManifest(MANIFEST_FILE, settings)
+        return DocumentManifest.from_docstore(
+            MANIFEST_FILE, settings, self.vector_store.docstore._dict
+        )
+    
+    def _delete_chunks(self, chunk_ids: List[str]) -> int:
+        """从向量存储删除片段，忽略已不存在的 ID，返回删除数量"""
+        if not chunk_ids or self.vector_store is None:
+            return 0
+        with self._index_lock:
+            existing = set(self.vector_store.index_to_docstore_id.values())
+            chunk_ids = [chunk_id for chunk_id in chunk_ids if chunk_id in existing]
+            if chunk_ids:
+                self.vector_store.delete(chunk_ids)
+        return len(chunk_ids)
+    
+    def _add_chunks(self, splits: List[Document], chunk_ids: List[str]):
+        if self.vector_store is None:
+            self.vector_store = FAISS.from_documents(splits, self.embeddings, ids=chunk_ids)
+            return
+        # 先在锁外向量化，只在写入索引时持有锁
+        vectors = self.embeddings.embed_documents([split.page_content for split in splits])
+        with self._index_lock:
+            self.vector_store.add_embeddings(
+                list(zip([split.page_content for split in splits], vectors)),
+                metadatas=[split.metadata for split in splits],
+                ids=chunk_ids,
+            )
+    
+    def _embed_batch(
+        self,
+        batch: List[Tuple[str, List[Document]]],
+        paths: Dict[str, Path],
+        manifest: DocumentManifest,
+        stats: Dict[str, Any],
+    ):
+        """向量化一批文件的片段并登记到清单，批次耗时按片段数分摊到各文件"""
+        splits = [split for _, file_splits in batch for split in file_splits]
+        if not splits:
+            return
+        file_ids = {name: [str(uuid4()) for _ in file_splits] for name, file_splits in batch}
+        start = time.perf_counter()
+        self._add_chunks(splits, [chunk_id for ids in file_ids.values() for chunk_id in ids])
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        for name, ids in file_ids.items():
+            manifest.record(name, paths[name], ids)
+            stats["file_timings"][name]["embed_ms"] = round(elapsed_ms * len(ids) / len(splits), 1)
+        stats["chunks_added"] += len(splits)
+        stats["embed_batches"].append({
+            "files": len(batch),
+            "chunks": len(splits),
+            "ms": round(elapsed_ms, 1),
+        })
+        print(f"已向量化 {len(splits)} 个片段（{len(batch)} 个文件）- 耗时 {elapsed_ms / 1000:.2f}秒")
+    
+    def initialize_from_documents_dir(self, force_rebuild: bool = False) -> Tuple[int, int, List[str], Dict[str, Any]]:
+        """
+        从 documents 目录初始化知识库（按文件清单增量构建）
+        只向量化新增或内容变化的文件，删除已删除或已变化文件的旧向量，未变化的文件直接跳过
         
         Args:
-            force_rebuild: 是否强制重建
+            force_rebuild: 是否强制重建（清空向量存储后全部重新向量化）
         
         Returns:
-            (原始文件数量, 文档片段数量, 错误信息列表, 统计信息)
+            (本次向量化的文件数量, 新增片段数量, 错误信息列表, 统计信息)
+            统计信息中 added/updated/removed/skipped 为对应的文件名列表，
+            file_timings 为各文件的解析、分割、向量化耗时（毫秒）
         """
         print(f"开始从目录加载文档: {DOCUMENTS_DIR}")
         print(f"目录绝对路径: {DOCUMENTS_DIR.resolve()}")
@@ -246,17 +504,108 @@ class KnowledgeBaseManager:
             print(error_msg)
             return 0, 0, [error_msg], {}
         
-        documents, errors, stats = self.load_documents_from_directory(DOCUMENTS_DIR)
+        if force_rebuild:
+            self.clear()
+        manifest = self._load_manifest()
         
-        if not documents:
+        paths = {}
+        unsupported = 0
+        for file_path in DOCUMENTS_DIR.iterdir():
+            if not file_path.is_file():
+                continue
+            if file_path.suffix.lower() in SUPPORTED_EXTENSIONS:
+                paths[file_path.name] = file_path
+            else:
+                unsupported += 1
+                print(f"跳过不支持的文件类型: {file_path.name}")
+        
+        errors: List[str] = []
+        if not paths and not manifest.files:
             print("未找到任何文档")
-            if not errors:
-                errors.append("目录中没有找到支持的文档文件（支持 .txt, .md, .pdf, .docx, .csv）")
-            return 0, 0, errors, stats
+            errors.append("目录中没有找到支持的文档文件（支持 .txt, .md, .pdf, .docx, .csv）")
+            return 0, 0, errors, {}
+        
+        start = time.perf_counter()
+        plan = manifest.plan(paths)
+        stats: Dict[str, Any] = {
+            "total_files": len(paths) + unsupported,
+            "loaded_files": 0,
+            "total_chunks": 0,
+            "file_chunks": {},  # 文件名 -> 片段数
+            "file_timings": {},  # 文件名 -> {parse_ms, split_ms, embed_ms}
+            "embed_batches": [],  # 每批向量化的 {files, chunks, ms}
+            **plan,
+            "chunks_added": 0,
+            "chunks_removed": 0,
+        }
         
-        self.build_vector_store_from_documents(documents, force_rebuild=force_rebuild)
-        print(f"知识库初始化完成: {stats['loaded_files']} 个原始文件, {len(documents)} 个文档片段")
-        return stats['loaded_files'], len(documents), errors, stats
+        try:
+            # 删除已删除或已变化文件的旧向量
+            stale = plan["removed"] + plan["updated"]
+            stats["chunks_removed"] = self._delete_chunks(manifest.chunk_ids(stale))
+            for name in stale:
+                manifest.forget(name)
+            
+            # 只加载、分割并向量化新增或变化的文件：加载进程并行解析与分割，
+            # 已完成的文件按批次向量化，同时其余文件继续解析
+            batch: List[Tuple[str, List[Document]]] = []
+            batch_chunks = 0
+            to_load = [paths[name] for name in plan["added"] + plan["updated"]]
+            for file_path, file_splits, error, timings in iter_load_files(to_load, split=True):
+                name = file_path.name
+                if error is not None:
+                    error_msg = f"加载文档失败 {name}: {str(error)}"
+                    print(error_msg)
+                    errors.append(error_msg)
+                    continue
+                batch.append((name, file_splits))
+                batch_chunks += len(file_splits)
+                stats["loaded_files"] += 1
+                stats["file_chunks"][name] = len(file_splits)
+                stats["file_timings"][name] = timings
+                print(
+                    f"✅ 已加载文档: {name} ({len(file_splits)} 个片段, "
+                    f"解析 {timings['parse_ms']:.0f} ms, 分割 {timings['split_ms']:.0f} ms)"
+                )
+                if batch_chunks >= EMBED_BATCH_CHUNKS:
+                    self._embed_batch(batch, paths, manifest, stats)
+                    batch, batch_chunks = [], 0
+            self._embed_batch(batch, paths, manifest, stats)
+        except Exception:
+            # 向量化失败时丢弃内存中的部分修改，保持与磁盘上的向量存储和清单一致
+            self._load_or_create_vector_store()
+            raise
+        
+        stats["total_chunks"] = stats["chunks_added"]
+        stats["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        
+        if self.vector_store is not None and self.vector_store.index.ntotal == 0:
+            # 所有文件均已删除
+            self.clear()
+        elif self.vector_store is not None:
+            with self._index_lock:
+                self._save_vector_store()
+            manifest.save()
+        
+        print(
+            f"知识库增量构建完成: 新增 {len(plan['added'])} 个文件, 更新 {len(plan['updated'])} 个, "
+            f"删除 {len(plan['removed'])} 个, 跳过 {len(plan['skipped'])} 个; "
+            f"新增 {stats['chunks_added']} 个片段, 删除 {stats['chunks_removed']} 个片段"
+        )
+        return stats["loaded_files"], stats["chunks_added"], errors, stats
+    
+    @staticmethod
+    def _format_result(doc: Document, score: float) -> Dict[str, Any]:
+        # 将距离转换为相关性分数（距离越小，相关性越高）
+        # FAISS 返回的是 L2 距离，需要转换为相似度分数
+        relevance = max(0, 1.0 - score / 2.0)  # 简单的归一化
+        return {
+            "content": doc.page_content,
+            "source": doc.metadata.get("source", "未知来源"),
+            "filename": doc.metadata.get("filename", "未知文件"),
+            "relevance": round(relevance, 3),
+            "score": round(float(score), 4),
+        }
     
     def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
         """
@@ -273,26 +622,53 @@ class KnowledgeBaseManager:
             return []
         
         try:
-            # 使用相似度搜索
-            docs_with_scores = self.vector_store.similarity_search_with_score(query, k=k)
-            
-            results = []
-            for doc, score in docs_with_scores:
-                # 将距离转换为相关性分数（距离越小，相关性越高）
-                # FAISS 返回的是 L2 距离，需要转换为相似度分数
-                relevance = max(0, 1.0 - score / 2.0)  # 简单的归一化
+            # 先在锁外嵌入查询（远程请求），只在读取索引时加锁
+            vector = self.embeddings.embed_query(query)
+            with self._index_lock:
+                docs_with_scores = self.vector_store.similarity_search_with_score_by_vector(vector, k=k)
+            return [self._format_result(doc, score) for doc, score in docs_with_scores]
+        except Exception as e:
+            raise KnowledgeBaseError(f"检索失败: {e}") from e
+    
+    def search_many(self, queries: List[str], k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        批量检索：所有查询一次批量嵌入，再对查询矩阵执行一次 FAISS 检索
+        
+        Args:
+            queries: 搜索查询列表
+            k: 每个查询返回结果数量
+        
+        Returns:
+            与 queries 顺序对应的检索结果列表，每项格式与 search 相同
+        """
+        if not queries:
+            return []
+        if not self.vector_store:
+            return [[] for _ in queries]
+        
+        try:
+            vectors = np.asarray(embed_queries(self.embeddings, queries), dtype=np.float32)
+            if getattr(self.vector_store, "_normalize_L2", False):
+                faiss.normalize_L2(vectors)
+            with self._index_lock:
+                scores, indices = self.vector_store.index.search(vectors, k)
                 
-                results.append({
-                    "content": doc.page_content,
-                    "source": doc.metadata.get("source", "未知来源"),
-                    "filename": doc.metadata.get("filename", "未知文件"),
-                    "relevance": round(relevance, 3),
-                    "score": round(float(score), 4),
-                })
-            
+                docstore = self.vector_store.docstore
+                index_to_id = self.vector_store.index_to_docstore_id
+                results = []
+                for row_scores, row_indices in zip(scores, indices):
+                    row = []
+                    for score, i in zip(row_scores, row_indices):
+                        if i == -1:
+                            # 片段数不足 k 时 FAISS 以 -1 填充
+                            continue
+                        doc = docstore.search(index_to_id[i])
+                        if isinstance(doc, Document):
+                            row.append(self._format_result(doc, float(score)))
+                    results.append(row)
             return results
         except Exception as e:
-            raise KnowledgeBaseError(f"检索失败: {e}") from e
+            raise KnowledgeBaseError(f"批量检索失败: {e}") from e
     
     def list_documents(self) -> List[Dict[str, Any]]:
         """列出知识库中的所有文档（从向量存储中提取）"""
@@ -305,7 +681,7 @@ class KnowledgeBaseManager:
         # 这里返回一个简单的状态信息
         return [{
             "message": "知识库已加载",
-            "vector_store_path": str(VECTOR_STORE_DIR / "faiss_index"),
+            "vector_store_path": str(FAISS_INDEX_DIR),
             "documents_dir": str(DOCUMENTS_DIR),
         }]
     
@@ -339,12 +715,13 @@ class KnowledgeBaseManager:
     def clear(self):
         """清空知识库"""
         self.vector_store = None
-        # 删除向量存储文件
-        vector_store_path = VECTOR_STORE_DIR / "faiss_index"
+        # 删除向量存储文件与文件清单
+        vector_store_path = FAISS_INDEX_DIR
         if vector_store_path.exists():
             import shutil
             shutil.rmtree(vector_store_path)
             print(f"已删除向量存储: {vector_store_path}")
+        MANIFEST_FILE.unlink(missing_ok=True)
 
 
 # 全局知识库管理器实例
@@ -0,0 +1,299 @@
+"""
+嵌入向量缓存
+- 片段向量磁盘缓存：按 (嵌入模型, 片段文本 SHA-256) 缓存嵌入向量，向量以 float32 矩阵追加写入并以内存映射方式读取，
+  另有一份按行号排列的键索引。重建索引、调整分割参数后只有新出现的文本需要调用嵌入接口
+- 查询向量缓存：进程内 LRU，重复的检索查询不再请求嵌入接口
+"""
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+VECTORS_FILE = "vectors.f32"
+KEYS_FILE = "keys.txt"
+META_FILE = "meta.json"
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    单个嵌入模型的向量缓存（一个目录）
+    keys.txt 第 i 行对应 vectors.f32 第 i 行；先写向量再写键，中途中断时多出的向量行在下次加载时截掉
+    仅在当前进程内加锁，不支持多个进程同时写入同一目录
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dim: Optional[int] = None
+        self._rows: Dict[str, int] = {}
+        self._matrix: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.directory / VECTORS_FILE
+
+    @property
+    def _keys_path(self) -> Path:
+        return self.directory / KEYS_FILE
+
+    def _load(self) -> None:
+        meta_path = self.directory / META_FILE
+        if not meta_path.exists():
+            return
+        try:
+            self.dim = int(json.loads(meta_path.read_text(encoding="utf-8"))["dim"])
+            keys = self._keys_path.read_text(encoding="utf-8").split() if self._keys_path.exists() else []
+        except (OSError, ValueError, KeyError):
+            print("向量缓存索引损坏，将重新创建")
+            self._reset()
+            return
+
+        row_bytes = self.dim * np.dtype(np.float32).itemsize
+        size = self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        # 键多于向量行说明文件不完整，只保留有向量的部分
+        keys = keys[: size // row_bytes]
+        if size != len(keys) * row_bytes:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(len(keys) * row_bytes)
+            self._keys_path.write_text("".join(f"{key}\n" for key in keys), encoding="utf-8")
+        self._rows = {key: row for row, key in enumerate(keys)}
+
+    def _reset(self) -> None:
+        for name in (VECTORS_FILE, KEYS_FILE, META_FILE):
+            (self.directory / name).unlink(missing_ok=True)
+        self.dim = None
+        self._rows = {}
+        self._matrix = None
+
+    def _mapped(self) -> np.memmap:
+        if self._matrix is None or len(self._matrix) < len(self._rows):
+            self._matrix = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r", shape=(len(self._rows), self.dim)
+            )
+        return self._matrix
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        with self._lock:
+            found = [self._rows.get(key) for key in keys]
+            matrix = self._mapped() if any(row is not None for row in found) else None
+            vectors = [None if row is None else np.array(matrix[row]) for row in found]
+            hits = sum(vector is not None for vector in vectors)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return vectors
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]) -> None:
+        """追加新向量（已存在的键忽略）"""
+        if not keys:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(matrix.shape[1])
+                (self.directory / META_FILE).write_text(
+                    json.dumps({"dim": self.dim}), encoding="utf-8"
+                )
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(f"向量维度不一致: {matrix.shape[1]} != {self.dim}")
+
+            new_rows = []
+            seen = set()
+            for i, key in enumerate(keys):
+                if key not in self._rows and key not in seen:
+                    seen.add(key)
+                    new_rows.append(i)
+            if not new_rows:
+                return
+
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.ascontiguousarray(matrix[new_rows]).tobytes())
+            with open(self._keys_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{keys[i]}\n" for i in new_rows))
+            for i in new_rows:
+                self._rows[keys[i]] = len(self._rows)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits, misses, entries = self.hits, self.misses, len(self._rows)
+        total = hits + misses
+        return {
+            "entries": entries,
+            "dim": self.dim,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 3) if total else None,
+        }
+
+
+def normalize_query(text: str) -> str:
+    """查询缓存键：合并空白字符，使仅有空白差异的查询命中同一缓存（嵌入时仍使用原文）"""
+    return " ".join(text.split())
+
+
+class QueryEmbeddingCache:
+    """查询文本 -> 向量的 LRU 缓存（进程内，线程安全）"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, query: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._entries.get(query)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(query)
+            self.hits += 1
+            return list(vector)
+
+    def put(self, query: str, vector: List[float]) -> None:
+        with self._lock:
+            self._entries[query] = tuple(vector)
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 3) if total else None,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    在嵌入模型外层加缓存
+    - embed_documents 只对片段向量缓存中没有的文本调用嵌入接口（store 为 None 时不缓存）
+    - embed_query 命中查询向量缓存时直接返回（query_cache 为 None 时不缓存）；
+      缓存键为规范化后的查询，未命中时嵌入原文，结果与不加缓存时一致
+    - embed_queries 对未命中的查询一次批量嵌入（query_batch 为 None 时逐条调用 embed_query）
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        store: Optional[EmbeddingStore] = None,
+        query_cache: Optional[QueryEmbeddingCache] = None,
+        query_batch: Optional[Callable[[List[str]], List[List[float]]]] = None,
+    ):
+        self.embeddings = embeddings
+        self.store = store
+        self.query_cache = query_cache
+        self.query_batch = query_batch
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.store is None:
+            return self.embeddings.embed_documents(texts)
+        keys = [text_key(text) for text in texts]
+        cached = self.store.get_many(keys)
+
+        # 未命中的文本去重后一次性请求
+        missing: Dict[str, str] = {}
+        for key, text, vector in zip(keys, texts, cached):
+            if vector is None:
+                missing.setdefault(key, text)
+        computed: Dict[str, List[float]] = {}
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.store.put_many(list(computed.keys()), list(computed.values()))
+
+        return [
+            vector.tolist() if vector is not None else list(computed[key])
+            for key, vector in zip(keys, cached)
+        ]
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.query_cache is None:
+            return self.embeddings.embed_query(text)
+        key = normalize_query(text)
+        vector = self.query_cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.query_cache.put(key, vector)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        # 不加缓存时按原文去重，与逐条调用 embed_query 一致
+        keys = [normalize_query(text) if self.query_cache is not None else text for text in texts]
+        vectors: Dict[str, List[float]] = {}
+        # 规范化键 -> 首次出现的原文
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key in vectors or key in missing:
+                continue
+            vector = self.query_cache.get(key) if self.query_cache is not None else None
+            if vector is None:
+                missing[key] = text
+            else:
+                vectors[key] = vector
+
+        if missing:
+            originals = list(missing.values())
+            if self.query_batch is not None:
+                computed = self.query_batch(originals)
+            else:
+                computed = [self.embeddings.embed_query(text) for text in originals]
+            for key, vector in zip(missing, computed):
+                vectors[key] = vector
+                if self.query_cache is not None:
+                    self.query_cache.put(key, vector)
+        return [vectors[key] for key in keys]
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """批量嵌入查询文本；不是 CachedEmbeddings 时逐条嵌入"""
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings.embed_queries(texts)
+    return [embeddings.embed_query(text) for text in texts]
+
+
+# 全局实例（按目录与模型；查询缓存按模型）
+_stores: Dict[str, EmbeddingStore] = {}
+_query_caches: Dict[str, QueryEmbeddingCache] = {}
+_stores_lock = threading.Lock()
+
+
+def get_embedding_store(directory: Path, model: str) -> EmbeddingStore:
+    """获取指定模型的向量缓存单例，每个模型一个子目录"""
+    path = Path(directory) / re.sub(r"[^\w.-]", "_", model)
+    key = str(path.resolve())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = EmbeddingStore(path)
+        return store
+
+
+def get_query_cache(model: str, max_size: int) -> QueryEmbeddingCache:
+    """获取指定模型的查询向量缓存单例（主知识库与临时知识库共用）"""
+    with _stores_lock:
+        cache = _query_caches.get(model)
+        if cache is None:
+            cache = _query_caches[model] = QueryEmbeddingCache(max_size)
+        return cache
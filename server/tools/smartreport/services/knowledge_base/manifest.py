@@ -0,0 +1,124 @@
+"""
+知识库文档清单
+记录已入库文件的大小、修改时间、内容哈希及其片段 ID，用于增量构建：
+只向量化新增或内容变化的文件，并删除已删除或已变化文件的旧向量
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+MANIFEST_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: Path) -> str:
+    """分块计算文件内容哈希"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DocumentManifest:
+    """
+    文件名 -> {size, mtime_ns, sha256, chunk_ids}
+    settings 记录嵌入模型与分割参数，参数变化后已有向量不再可用，需整体重建
+    """
+
+    def __init__(self, path: Path, settings: Dict[str, Any]):
+        self.path = Path(path)
+        self.settings = dict(settings)
+        self.files: Dict[str, Dict[str, Any]] = {}
+        # 本次扫描中计算出的内容哈希，入库时写入清单
+        self._digests: Dict[str, str] = {}
+
+    @classmethod
+    def load(cls, path: Path, settings: Dict[str, Any]) -> Optional["DocumentManifest"]:
+        """读取清单；文件不存在、损坏或参数不一致时返回 None"""
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != MANIFEST_VERSION or data.get("settings") != settings:
+            return None
+        manifest = cls(path, settings)
+        manifest.files = data.get("files", {})
+        return manifest
+
+    @classmethod
+    def from_docstore(
+        cls, path: Path, settings: Dict[str, Any], docstore: Dict[str, Any]
+    ) -> "DocumentManifest":
+        """
+        从没有清单的旧向量存储推断各文件的片段 ID
+        推断出的条目没有内容哈希，首次增量构建时视为已变化：删除旧向量（包括重复添加的片段）后重新向量化
+        """
+        manifest = cls(path, settings)
+        for chunk_id, doc in docstore.items():
+            filename = doc.metadata.get("filename")
+            if filename:
+                entry = manifest.files.setdefault(filename, {"chunk_ids": []})
+                entry["chunk_ids"].append(str(chunk_id))
+        return manifest
+
+    def save(self) -> None:
+        data = {
+            "version": MANIFEST_VERSION,
+            "settings": self.settings,
+            "files": self.files,
+        }
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def plan(self, paths: Dict[str, Path]) -> Dict[str, List[str]]:
+        """
+        对比目录中的文件与清单
+        大小与修改时间均未变化的文件直接跳过；否则计算内容哈希，哈希相同（如仅被 touch）时只更新清单中的修改时间
+        返回 {"added", "updated", "removed", "skipped"}，各为文件名列表
+        """
+        plan: Dict[str, List[str]] = {"added": [], "updated": [], "removed": [], "skipped": []}
+        for name in sorted(paths):
+            st = paths[name].stat()
+            entry = self.files.get(name)
+            if entry is None:
+                self._digests[name] = hash_file(paths[name])
+                plan["added"].append(name)
+                continue
+            if entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+                plan["skipped"].append(name)
+                continue
+            digest = hash_file(paths[name])
+            if entry.get("sha256") == digest:
+                entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+                plan["skipped"].append(name)
+                continue
+            self._digests[name] = digest
+            plan["updated"].append(name)
+        plan["removed"] = sorted(name for name in self.files if name not in paths)
+        return plan
+
+    def chunk_ids(self, names: Iterable[str]) -> List[str]:
+        return [
+            chunk_id
+            for name in names
+            for chunk_id in self.files.get(name, {}).get("chunk_ids", [])
+        ]
+
+    def record(self, name: str, path: Path, chunk_ids: List[str]) -> None:
+        """登记已入库的文件及其片段 ID"""
+        st = path.stat()
+        digest = self._digests.pop(name, None) or hash_file(path)
+        self.files[name] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": digest,
+            "chunk_ids": chunk_ids,
+        }
+
+    def forget(self, name: str) -> None:
+        self.files.pop(name, None)
+        self._digests.pop(name, None)
@@ -7,10 +7,6 @@ from pathlib import Path
 from typing import List, Dict, Any, Optional
 from uuid import uuid4
 
-try:
-    from langchain_dashscope import DashScopeEmbeddings
-except ImportError:
-    from langchain_community.embeddings import DashScopeEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 try:
@@ -21,6 +17,8 @@ except ImportError:
 import tempfile
 from pathlib import Path
 
+from ..services.knowledge_base import create_embeddings
+
 # 上传目录配置
 UPLOAD_DIR = Path(tempfile.gettempdir()) / "profile-page" / "uploads"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
@@ -62,10 +60,7 @@ class TemporaryKnowledgeBase:
         if not api_key:
             raise TemporaryKnowledgeBaseError("DASHSCOPE_API_KEY 未配置")
         
-        self.embeddings = DashScopeEmbeddings(
-            model="text-embedding-v1",
-            dashscope_api_key=api_key,
-        )
+        self.embeddings = create_embeddings(api_key)
     
     def _load_or_create_vector_store(self):
         """加载或创建向量存储"""
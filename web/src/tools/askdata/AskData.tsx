@@ -13,11 +13,13 @@ import { getCurrentPrompts } from './prompts'
 import { formatDuration, stringifyResult, truncate } from '../../shared/utils/format'
 import { HomeButton } from '../../shared/components'
 import {
+  analyzeExampleExcel,
   analyzeExcel,
   downloadExampleExcel,
   executeCode,
-  generateCode,
-  summarizeResult,
+  generateCodeStream,
+  releaseUploadedFile,
+  summarizeResultStream,
   type AnalysisResult,
 } from './api'
 import './AskData.css'
@@ -30,7 +32,8 @@ type Message = {
 
 type UploadedExcelMeta = {
   name: string
-  size: number
+  // 内置示例免上传，没有文件大小
+  size?: number
   uploadedAt: number
 }
 
@@ -73,6 +76,24 @@ const buildFailureMessage = (reason: string) =>
 
 请重新描述问题或重新上传表格后再试。`
 
+/**
+ * 等待流式接口结束：逐块回调内容片段，返回完整结果；abortRef 保存中止函数，供组件卸载时中止
+ */
+const awaitStream = (
+  start: (
+    onDelta: (content: string) => void,
+    onDone: (text: string) => void,
+    onError: (error: Error) => void
+  ) => () => void,
+  abortRef: { current: (() => void) | null },
+  onDelta: (content: string) => void = () => {}
+) =>
+  new Promise<string>((resolve, reject) => {
+    abortRef.current = start(onDelta, resolve, reject)
+  }).finally(() => {
+    abortRef.current = null
+  })
+
 type LoadingPhase = 'querying' | 'summarizing' | 'completed' | null
 type LoadingRecord = { label: string; duration: number }
 
@@ -157,6 +178,11 @@ function App() {
   const audioRef = useRef<HTMLAudioElement | null>(null)
   const isMusicPlayingRef = useRef(isMusicPlaying)
   const interactionHandlerRef = useRef<(() => void) | null>(null)
+  const abortStreamRef = useRef<(() => void) | null>(null)
+
+  useEffect(() => {
+    return () => abortStreamRef.current?.()
+  }, [])
 
   useEffect(() => {
     if (loadingPhase === null || loadingPhase === 'completed') {
@@ -308,16 +334,26 @@ function App() {
 
     try {
       for (let attempt = 1; attempt <= MAX_ATTEMPTS; attempt++) {
-        const codeData = await generateCode({
-          question,
-          file_path: storedFilePath,
-          sheets: analysisResult.sheets,
-          history: historyText,
-          custom_system_prompt: currentPrompts.codeGeneration.system,
-          custom_user_prompt: userPrompt,
-        })
+        const code = await awaitStream(
+          (onDelta, onDone, onError) =>
+            generateCodeStream(
+              {
+                question,
+                file_path: storedFilePath,
+                sheets: analysisResult.sheets,
+                sidecar_paths: analysisResult.sidecar_paths,
+                history: historyText,
+                custom_system_prompt: currentPrompts.codeGeneration.system,
+                custom_user_prompt: userPrompt,
+              },
+              onDelta,
+              onDone,
+              onError
+            ),
+          abortStreamRef
+        )
 
-        const execData = await executeCode({ code: codeData.code })
+        const execData = await executeCode({ code })
 
         const innerErrorMessage =
           execData?.result &&
@@ -334,7 +370,7 @@ function App() {
 
         const logEntry: ExecutionLog = {
           attempt: absoluteAttempt,
-          code: successThisRound ? codeData.code : '',
+          code: successThisRound ? code : '',
           success: successThisRound,
           result: successThisRound ? execData.result : undefined,
           stdout: successThisRound ? execData.stdout : undefined,
@@ -380,19 +416,42 @@ function App() {
       if (executionResult) {
         const summarizeStartTime = Date.now()
         try {
-          const summaryData = await summarizeResult({
-            question,
-            result: executionResult,
-            custom_system_prompt: currentPrompts.summarization.system,
-            custom_user_prompt: currentPrompts.summarization.user,
-          })
-          if (!summaryData.markdown) {
+          // 总结逐块写入最后一条回答，边生成边展示
+          let streamedContent = ''
+          const markdown = await awaitStream(
+            (onDelta, onDone, onError) =>
+              summarizeResultStream(
+                {
+                  question,
+                  result: executionResult,
+                  custom_system_prompt: currentPrompts.summarization.system,
+                  custom_user_prompt: currentPrompts.summarization.user,
+                },
+                onDelta,
+                onDone,
+                onError
+              ),
+            abortStreamRef,
+            (content) => {
+              streamedContent += content
+              const partialContent = streamedContent
+              setMessages((prev) => {
+                const updated = [...prev]
+                const lastIndex = updated.length - 1
+                if (lastIndex >= 0 && updated[lastIndex].role === 'assistant') {
+                  updated[lastIndex] = { ...updated[lastIndex], content: partialContent }
+                }
+                return updated
+              })
+            }
+          )
+          if (!markdown) {
             throw new Error('生成总结失败')
           }
           const summarizeDuration = Math.floor(
             (Date.now() - summarizeStartTime) / 1000
           )
-          successContent = summaryData.markdown
+          successContent = markdown
           addHistoryRecord('数据整理完毕', summarizeDuration)
           setLoadingDuration(summarizeDuration)
           setLoadingMessage('数据整理完毕')
@@ -547,6 +606,9 @@ function App() {
   }
 
   const clearFile = () => {
+    if (storedFilePath) {
+      void releaseUploadedFile(storedFilePath)
+    }
     localStorage.removeItem('excel_file')
     setExcelMeta(null)
     setAnalysisResult(null)
@@ -562,6 +624,9 @@ function App() {
     setDownloadError(null)
     setCanAsk(false)
     setAnalysisResult(null)
+    if (storedFilePath) {
+      void releaseUploadedFile(storedFilePath)
+    }
     setStoredFilePath('')
     try {
       await saveFileToStorage(file)
@@ -602,6 +667,45 @@ function App() {
     event.target.value = ''
   }
 
+  const handleUseExample = async () => {
+    setIsUploading(true)
+    setUploadError(null)
+    setDownloadError(null)
+    setCanAsk(false)
+    setAnalysisResult(null)
+    if (storedFilePath) {
+      void releaseUploadedFile(storedFilePath)
+    }
+    setStoredFilePath('')
+    // 示例由服务端预处理，不保存到本地，刷新后不再恢复之前上传的文件
+    localStorage.removeItem('excel_file')
+    try {
+      const data = await analyzeExampleExcel()
+
+      if (data.errorMessage) {
+        setUploadError('解析失败，请重新上传文件。')
+        setAnalysisResult(null)
+        setCanAsk(false)
+      } else {
+        setAnalysisResult(data)
+        setUploadError(null)
+        setStoredFilePath(data.stored_file_path ?? '')
+        setCanAsk(Boolean(data.sheets && data.stored_file_path))
+      }
+
+      setExcelMeta({
+        name: SAMPLE_FILE_NAME,
+        uploadedAt: Date.now(),
+      })
+    } catch (error) {
+      setUploadError('解析失败，请重新上传文件。')
+      setCanAsk(false)
+      setStoredFilePath('')
+    } finally {
+      setIsUploading(false)
+    }
+  }
+
   const handleDownloadExample = async () => {
     if (isDownloadingExample) return
     setDownloadError(null)
@@ -833,6 +937,14 @@ function App() {
                   清除文件
                 </button>
               )}
+              <button
+                type="button"
+                className="download-trigger"
+                onClick={handleUseExample}
+                disabled={isUploading}
+              >
+                使用示例
+              </button>
               <button
                 type="button"
                 className="download-trigger"
@@ -845,7 +957,9 @@ function App() {
             {excelMeta && (
               <div className="upload-meta">
                 <span>{excelMeta.name}</span>
-                <span>{formatBytes(excelMeta.size)}</span>
+                {excelMeta.size !== undefined && (
+                  <span>{formatBytes(excelMeta.size)}</span>
+                )}
               </div>
             )}
             {uploadError && <p className="upload-error">{uploadError}</p>}
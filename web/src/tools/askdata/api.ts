@@ -3,12 +3,13 @@
  * 封装该工具的所有 API 调用
  */
 
-import { apiPost, apiPostFormData, buildApiUrl } from '../../shared/api/client'
+import { apiGet, apiPost, apiPostFormData, buildApiUrl } from '../../shared/api/client'
 
 export interface AnalysisResult {
   note?: string
   errorMessage?: string
   stored_file_path?: string
+  sidecar_paths?: Record<string, string>
   sheets?: Record<
     string,
     {
@@ -24,19 +25,27 @@ export interface AnalysisResult {
   >
 }
 
+export interface AnalyzeJob {
+  job_id: string
+  status: 'queued' | 'running' | 'succeeded' | 'failed'
+  file_name: string
+  created_at: number
+  elapsed_ms: number
+  profile_ms?: number
+  result?: AnalysisResult
+  error?: string
+}
+
 export interface CodeGenerationRequest {
   question: string
   file_path: string
   sheets?: AnalysisResult['sheets']
+  sidecar_paths?: AnalysisResult['sidecar_paths']
   history?: string
   custom_system_prompt?: string
   custom_user_prompt?: string
 }
 
-export interface CodeGenerationResponse {
-  code: string
-}
-
 export interface CodeExecutionRequest {
   code: string
 }
@@ -54,10 +63,6 @@ export interface SummarizationRequest {
   custom_user_prompt?: string
 }
 
-export interface SummarizationResponse {
-  markdown: string
-}
-
 /**
  * 分析 Excel 文件
  */
@@ -68,12 +73,32 @@ export async function analyzeExcel(file: File): Promise<AnalysisResult> {
 }
 
 /**
- * 生成代码
+ * 提交后台解析任务（立即返回任务 ID，适合大文件）
+ */
+export async function submitAnalyzeJob(file: File): Promise<AnalyzeJob> {
+  const formData = new FormData()
+  formData.append('file', file)
+  return apiPostFormData<AnalyzeJob>('/api/analyze/jobs', formData)
+}
+
+/**
+ * 查询解析任务状态
+ */
+export async function getAnalyzeJob(jobId: string): Promise<AnalyzeJob> {
+  return apiGet<AnalyzeJob>(`/api/analyze/jobs/${jobId}`)
+}
+
+/**
+ * 释放已上传文件的引用（切换或清除文件时调用），失败时忽略
  */
-export async function generateCode(
-  request: CodeGenerationRequest
-): Promise<CodeGenerationResponse> {
-  return apiPost<CodeGenerationResponse>('/api/generate-code', request)
+export async function releaseUploadedFile(storedFilePath: string): Promise<void> {
+  try {
+    await apiPost<{ released: boolean }>('/api/askdata/files/release', {
+      stored_file_path: storedFilePath,
+    })
+  } catch {
+    // 文件可能已被回收
+  }
 }
 
 /**
@@ -86,12 +111,132 @@ export async function executeCode(
 }
 
 /**
- * 总结结果
+ * 流式接口事件（SSE）
+ */
+export type TextStreamEvent =
+  | { type: 'delta'; content: string }
+  | { type: 'done'; code?: string; markdown?: string }
+  | { type: 'error'; error: string }
+
+/**
+ * 读取文本流式接口，返回中止函数（中止后服务端同时关闭上游模型连接）
+ */
+function streamText(
+  endpoint: string,
+  request: unknown,
+  onDelta: (content: string) => void,
+  onDone: (event: Extract<TextStreamEvent, { type: 'done' }>) => void,
+  onError?: (error: Error) => void
+): () => void {
+  const controller = new AbortController()
+
+  fetch(buildApiUrl(endpoint), {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify(request),
+    signal: controller.signal,
+  })
+    .then(async (response) => {
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}))
+        throw new Error(errorData.detail || `HTTP error! status: ${response.status}`)
+      }
+
+      const reader = response.body?.getReader()
+      if (!reader) {
+        throw new Error('Response body is not readable')
+      }
+
+      const decoder = new TextDecoder()
+      let buffer = ''
+
+      const handleLine = (line: string): boolean => {
+        if (!line.startsWith('data: ')) return false
+        const data = line.slice(6).trim()
+        if (!data) return false
+
+        const event: TextStreamEvent = JSON.parse(data)
+        if (event.type === 'delta') {
+          onDelta(event.content)
+          return false
+        }
+        if (event.type === 'done') {
+          onDone(event)
+        } else {
+          onError?.(new Error(event.error || 'Unknown error'))
+        }
+        return true
+      }
+
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+
+        buffer += decoder.decode(value, { stream: true })
+        const lines = buffer.split('\n')
+        buffer = lines.pop() || ''
+
+        for (const line of lines) {
+          if (handleLine(line)) return
+        }
+      }
+
+      if (!handleLine(buffer.trim())) {
+        onError?.(new Error('流式响应意外结束'))
+      }
+    })
+    .catch((error) => {
+      if (error.name !== 'AbortError') {
+        onError?.(error)
+      }
+    })
+
+  return () => controller.abort()
+}
+
+/**
+ * 流式生成代码：逐块回调代码片段，结束时回调完整代码
+ */
+export function generateCodeStream(
+  request: CodeGenerationRequest,
+  onDelta: (content: string) => void,
+  onDone: (code: string) => void,
+  onError?: (error: Error) => void
+): () => void {
+  return streamText(
+    '/api/generate-code/stream',
+    request,
+    onDelta,
+    (event) => onDone(event.code || ''),
+    onError
+  )
+}
+
+/**
+ * 流式总结结果：逐块回调 Markdown 片段，结束时回调完整总结
+ */
+export function summarizeResultStream(
+  request: SummarizationRequest,
+  onDelta: (content: string) => void,
+  onDone: (markdown: string) => void,
+  onError?: (error: Error) => void
+): () => void {
+  return streamText(
+    '/api/summarize-result/stream',
+    request,
+    onDelta,
+    (event) => onDone(event.markdown || ''),
+    onError
+  )
+}
+
+/**
+ * 获取内置示例 Excel 的解析结果（服务启动时已预处理，无需上传）
  */
-export async function summarizeResult(
-  request: SummarizationRequest
-): Promise<SummarizationResponse> {
-  return apiPost<SummarizationResponse>('/api/summarize-result', request)
+export async function analyzeExampleExcel(): Promise<AnalysisResult> {
+  return apiGet<AnalysisResult>('/api/askdata/example-analysis')
 }
 
 /**
@@ -32,6 +32,7 @@ export const DEFAULT_PROMPTS: PromptTemplates = {
 - "用户问题"：{{user_question}}
 - 针对每个数据表的每个Sheet页的 "表格信息-表结构（字段名、数据类型）"、"表格信息-数据预览（前5行示例）":   {{sheets}}
 - "Excel文件路径"：{{file_path}}
+- "各Sheet页列式副本路径（Feather）"：{{sidecar_paths}}
 
 === 四、输出限制 ===
 直接输出代码时，从 import pandas as pd 开始直接输出，严禁从 \`\`\`python 开始，或将代码嵌套入代码块中输出
@@ -56,6 +57,7 @@ df_safe = df.replace([np.inf, -np.inf], np.nan).where(pd.notnull(df), None)
 7.应该避免的常见错误：
      "name 'XXX' is not defined"
      "module 'pandas' has no attribute 'isinf'"
+8.如"各Sheet页列式副本路径"中提供了所需Sheet页的路径，使用 pd.read_feather(副本路径) 读取该Sheet页（结果与 pd.read_excel 一致且更快），否则使用 pd.read_excel
 
 === 六、代码模版 ===
 import pandas as pd
@@ -109,9 +109,16 @@ export interface InitializeKnowledgeBaseRequest {
 
 export interface InitializeKnowledgeBaseResponse {
   message: string
-  documents_loaded: number  // 原始文件数量
-  chunks_loaded?: number    // 文档片段数量
+  documents_loaded: number  // 本次向量化的文件数量
+  chunks_loaded?: number    // 本次新增的片段数量
   documents_dir: string
+  added?: string[]          // 新增文件
+  updated?: string[]        // 内容变化后重新向量化的文件
+  removed?: string[]        // 已删除（向量已移除）的文件
+  skipped?: string[]        // 未变化而跳过的文件
+  chunks_removed?: number   // 移除的片段数量
+  file_timings?: Record<string, { parse_ms: number; split_ms?: number; embed_ms?: number }>  // 各文件耗时（毫秒）
+  elapsed_ms?: number       // 总耗时（毫秒）
   errors?: string[]
 }
 